@@ -1,6 +1,15 @@
 """Minimal launcher for ImBridge GUI (keeps startup logic only)."""
 
+import sys
+
+
 def main():
+    if len(sys.argv) > 1:
+        # Headless commands, e.g. `python main.py watch <in_dir> -o <out_dir>`
+        from src.cli import main as cli_main
+
+        sys.exit(cli_main(sys.argv[1:]))
+
     # Import here to keep startup lightweight for non-GUI operations
     from src.app import App
 
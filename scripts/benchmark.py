@@ -0,0 +1,545 @@
+"""
+Benchmark the ImBridge conversion paths on a synthetic corpus.
+
+Usage:
+    python scripts/benchmark.py [-o results.json] [--repeat 3] [--quick] [--filter REGEX]
+    python scripts/benchmark.py --compare old.json new.json
+    python scripts/benchmark.py --trace traces/ --filter svg
+
+With --trace, per-stage timings (decode, render, encode, subprocess, ...) of the
+timed runs are added to each result and a Chrome trace is written per case.
+
+Every converter, transformer, cropper, raster and vector entry point is timed on
+generated PNG/JPEG/TIFF/BMP/HEIC rasters, SVGs, PDFs and EPS/PS files. Each case
+runs in its own process so that peak RSS is attributable to it; the first call
+is a warm-up and is not counted. Cases whose tools are not installed are
+reported as skipped.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import base64
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from functools import lru_cache
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from PIL import Image
+
+from src.utils.commons import check_tool, get_tool_version, set_interactive
+
+# Sizes of the raster corpus; --quick drops the large one
+RASTER_SIZES = {"s": (256, 256), "m": (1024, 768), "l": (3000, 2000)}
+# Page / canvas size of the vector corpus, in pt (PDF, EPS) or px (SVG)
+PAGE_SIZE = (400, 300)
+
+# Tools that are Python packages are probed by importing them, since a package
+# can be installed while its native library is missing (e.g. cairosvg)
+python_tools = {
+    "pillow": "PIL",
+    "pillow-heif": "pillow_heif",
+    "pymupdf": "fitz",
+    "cairosvg": "cairosvg",
+    "reportlab": "reportlab",
+}
+
+
+@lru_cache(maxsize=None)
+def tool_available(tool_key: str) -> bool:
+    if tool_key in python_tools:
+        try:
+            __import__(python_tools[tool_key])
+            return True
+        except Exception:
+            return False
+    return check_tool(tool_key)
+
+
+# ---------------------------------------------------------------- corpus
+
+def synthetic_image(size, alpha=False) -> Image.Image:
+    """Deterministic gradient + noise image, so that codecs have real work to do."""
+    w, h = size
+    rnd = random.Random(w * h)
+    # Same bytes as rnd.randbytes(w * h), which needs Python 3.9
+    noise = Image.frombytes("L", size, rnd.getrandbits(8 * w * h).to_bytes(w * h, "little"))
+    linear = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    img = Image.merge("RGB", (linear, radial, Image.blend(linear, noise, 0.3)))
+    if alpha:
+        img.putalpha(radial.point(lambda v: 255 - v // 2))
+    return img
+
+
+def random_path(rnd: random.Random) -> str:
+    w, h = PAGE_SIZE
+    pts = [f"{rnd.uniform(0, w):.2f},{rnd.uniform(0, h):.2f}" for _ in range(7)]
+    return f"M {pts[0]} C {pts[1]} {pts[2]} {pts[3]} S {pts[4]} {pts[5]} Z"
+
+
+def write_svg(path: str, n_paths: int, embed: bool = False):
+    rnd = random.Random(n_paths)
+    w, h = PAGE_SIZE
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+             f'width="{w}" height="{h}" viewBox="0 0 {w} {h}">']
+    if embed:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            png_path = os.path.join(tmp_dir, "embed.png")
+            synthetic_image((512, 512)).save(png_path)
+            with open(png_path, "rb") as f:
+                data = base64.b64encode(f.read()).decode("ascii")
+        parts.append(f'<image x="0" y="0" width="{w}" height="{h}" xlink:href="data:image/png;base64,{data}"/>')
+    parts.append('<g fill="none" stroke="#336699" stroke-width="0.8">')
+    parts.extend(f'<path d="{random_path(rnd)}"/>' for _ in range(n_paths))
+    parts.append("</g></svg>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+def write_pdf(path: str, n_pages: int, n_paths: int = 200):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+
+    rnd = random.Random(n_pages)
+    w, h = PAGE_SIZE
+    c = canvas.Canvas(path, pagesize=PAGE_SIZE)
+    image = ImageReader(synthetic_image((256, 192)))
+    for _ in range(n_pages):
+        c.drawImage(image, w / 4, h / 4, width=w / 2, height=h / 2)
+        for _ in range(n_paths):
+            c.line(rnd.uniform(0, w), rnd.uniform(0, h), rnd.uniform(0, w), rnd.uniform(0, h))
+        c.showPage()
+    c.save()
+
+
+def postscript_page(rnd: random.Random, n_paths: int) -> str:
+    w, h = PAGE_SIZE
+    lines = ["gsave", "[1 0 0 1 0 0] concat", "0.5 setlinewidth"]
+    for _ in range(n_paths):
+        lines.append(
+            f"{rnd.uniform(0, w):.2f} {rnd.uniform(0, h):.2f} moveto "
+            f"{rnd.uniform(0, w):.2f} {rnd.uniform(0, h):.2f} lineto stroke"
+        )
+    lines.extend(["grestore", "showpage"])
+    return "\n".join(lines)
+
+
+def write_eps(path: str, n_paths: int = 500):
+    w, h = PAGE_SIZE
+    header = [
+        "%!PS-Adobe-3.0 EPSF-3.0",
+        f"%%BoundingBox: 0 0 {w} {h}",
+        f"%%HiResBoundingBox: 0.0 0.0 {w:.1f} {h:.1f}",
+        "%%EndComments",
+    ]
+    with open(path, "w", encoding="ascii") as f:
+        f.write("\n".join(header + [postscript_page(random.Random(1), n_paths), "%%EOF\n"]))
+
+
+def write_ps(path: str, n_pages: int, n_paths: int = 500):
+    w, h = PAGE_SIZE
+    rnd = random.Random(n_pages)
+    lines = ["%!PS-Adobe-3.0", f"%%BoundingBox: 0 0 {w} {h}", f"%%Pages: {n_pages}", "%%EndComments"]
+    for page in range(1, n_pages + 1):
+        lines.append(f"%%Page: {page} {page}")
+        lines.append(postscript_page(rnd, n_paths))
+    lines.append("%%EOF\n")
+    with open(path, "w", encoding="ascii") as f:
+        f.write("\n".join(lines))
+
+
+def build_corpus(corpus_dir: str, sizes, create: bool = True) -> dict:
+    """Generate the corpus (once per directory) and return {label: path}."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = {}
+
+    def make(label, file_name, writer):
+        path = os.path.join(corpus_dir, file_name)
+        if not os.path.exists(path):
+            if not create:
+                return
+            try:
+                writer(path)
+            except Exception as e:
+                print(f"[corpus] cannot create {file_name}: {e}", file=sys.stderr)
+                return
+        corpus[label] = path
+
+    for key in sizes:
+        size = RASTER_SIZES[key]
+        make(f"png_{key}", f"raster_{key}.png", lambda p, s=size: synthetic_image(s, alpha=True).save(p))
+        make(f"jpg_{key}", f"raster_{key}.jpg", lambda p, s=size: synthetic_image(s).save(p, quality=90))
+        make(f"tiff_{key}", f"raster_{key}.tiff", lambda p, s=size: synthetic_image(s).save(p))
+        make(f"bmp_{key}", f"raster_{key}.bmp", lambda p, s=size: synthetic_image(s).save(p))
+        if tool_available("pillow-heif"):
+            def save_heic(p, s=size):
+                from pillow_heif import register_heif_opener
+                register_heif_opener()
+                synthetic_image(s).save(p, format="HEIF", quality=90)
+            make(f"heic_{key}", f"raster_{key}.heic", save_heic)
+    # Inputs whose data the PDF writer can embed without re-encoding
+    make("rgbpng_m", "opaque_m.png", lambda p: synthetic_image(RASTER_SIZES["m"]).save(p))
+    # A single strip per file; the writer re-encodes multi-strip TIFFs
+    def save_tiff(p, mode, compression):
+        img = synthetic_image(RASTER_SIZES["m"]).convert(mode)
+        img.save(p, compression=compression, tiffinfo={278: img.height})
+    make("g4tiff_m", "bilevel_g4_m.tiff", lambda p: save_tiff(p, "1", "group4"))
+    make("lzwtiff_m", "raster_lzw_m.tiff", lambda p: save_tiff(p, "RGB", "tiff_lzw"))
+    make("deflatetiff_m", "raster_deflate_m.tiff", lambda p: save_tiff(p, "RGB", "tiff_adobe_deflate"))
+    make("bw_m", "bilevel_m.bmp", lambda p: synthetic_image(RASTER_SIZES["m"]).convert("L").point(lambda v: 255 if v > 127 else 0).convert("1").save(p))
+    make("svg_10", "paths_10.svg", lambda p: write_svg(p, 10))
+    make("svg_1000", "paths_1000.svg", lambda p: write_svg(p, 1000))
+    make("svg_embedded", "embedded.svg", lambda p: write_svg(p, 50, embed=True))
+    make("pdf_single", "single.pdf", lambda p: write_pdf(p, 1))
+    make("pdf_multi", "multi.pdf", lambda p: write_pdf(p, 10))
+    make("eps_single", "single.eps", write_eps)
+    make("ps_multi", "multi.ps", lambda p: write_ps(p, 5))
+    return corpus
+
+
+# ---------------------------------------------------------------- cases
+
+# Target format tried first when a converter supports several
+out_fmt_preference = [".pdf", ".png", ".jpg", ".svg", ".eps", ".ps", ".tiff"]
+
+
+def reportlab_pdf(in_paths, out_path: str, dpi: int = 300) -> str:
+    """The reportlab path raster2script used for PDF, one page per image; the baseline of the pdf_writer cases."""
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(out_path)
+    for in_path in in_paths:
+        w, h = Image.open(in_path).size
+        w_pt, h_pt = w / dpi * 72, h / dpi * 72
+        c.setPageSize((w_pt, h_pt))
+        c.drawImage(in_path, 0, 0, width=w_pt, height=h_pt)
+        c.showPage()
+    c.save()
+    return out_path
+
+
+def build_cases(corpus: dict) -> list:
+    """
+    Every case is a dict: name, group, input label, run(in_path, out_dir, logger),
+    tool keys, and whether the call must produce an output file.
+    """
+    import src.utils.converter as cv
+    import src.utils.transformer as sc
+    import src.utils.cropper as cr
+    import src.utils.raster as rst
+    import src.utils.vector as vec
+    import src.utils.pdf_writer as pw
+
+    cases = []
+
+    def add(group, name, label, run, tools=(), output=True):
+        if label in corpus:
+            cases.append(dict(name=f"{group}.{name}[{label}]", group=group, input=label, run=run, tools=tuple(tools), output=output))
+
+    raster_labels = [l for l in corpus if l.split("_")[0] in ("png", "jpg", "tiff", "bmp")]
+    medium_rasters = [l for l in raster_labels if l.endswith("_m")] + [l for l in raster_labels if l.startswith("png_")]
+    vector_labels = ["svg_10", "svg_1000", "svg_embedded", "pdf_single", "pdf_multi", "eps_single", "ps_multi"]
+
+    # converter: every row of the conversion table, plus HEIC decoding and same-format copies
+    for in_fmts, out_fmts, func, params, _, tools in cv.conversion_table:
+        labels = sorted(set(medium_rasters)) if set(cv.bitmap_formats) <= set(in_fmts) else vector_labels
+        for label in labels:
+            in_fmt = os.path.splitext(corpus.get(label, ""))[1].lower()
+            if in_fmt not in in_fmts:
+                continue
+            out_fmt = next(f for f in out_fmt_preference + out_fmts if f in out_fmts and f != in_fmt)
+            kwargs = cv.get_converter_params(params, out_fmt)
+            add("converter", f"{func.__name__}->{out_fmt[1:]}", label,
+                lambda p, o, lg, f=func, kw=kwargs: f(in_path=p, out_dir=o, logger=lg, **kw), tools)
+    for label in [l for l in corpus if l.startswith("heic_")]:
+        add("converter", "raster_convert->jpg", label,
+            lambda p, o, lg: cv.raster_convert(p, o, out_fmt=".jpg", logger=lg), ("pillow-heif",))
+        add("converter", "raster2script->pdf", label,
+            lambda p, o, lg: cv.raster2script(p, o, out_fmt=".pdf", dpi=300, logger=lg), ("pillow-heif",))
+    add("converter", "copy_script", "pdf_multi", lambda p, o, lg: cv.copy_script(p, o, logger=lg))
+
+    # transformer
+    scale = dict(scale_x=0.5, scale_y=0.5)
+    for label in sorted(set(medium_rasters)):
+        add("transformer", "transform_image", label, lambda p, o, lg: sc.transform_image(p, o, logger=lg, **scale))
+    for label in ("svg_10", "svg_1000", "svg_embedded"):
+        add("transformer", "transform_svg", label, lambda p, o, lg: sc.transform_svg(p, o, logger=lg, **scale), ("cairosvg",))
+    add("transformer", "transform_pdf", "pdf_single", lambda p, o, lg: sc.transform_pdf(p, o, logger=lg, **scale), ("pymupdf", "ghostscript"))
+    add("transformer", "transform_script", "eps_single", lambda p, o, lg: sc.transform_script(p, o, logger=lg, **scale), ("ghostscript",))
+
+    # cropper: keep the central half
+    w, h = PAGE_SIZE
+    page_box = (w // 4, h // 4, 3 * w // 4, 3 * h // 4)
+    for label in sorted(set(medium_rasters)):
+        iw, ih = RASTER_SIZES[label.split("_")[1]]
+        box = (iw // 4, ih // 4, 3 * iw // 4, 3 * ih // 4)
+        add("cropper", "crop_image", label, lambda p, o, lg, b=box: cr.crop_image(p, o, b, logger=lg))
+    for label in ("svg_1000", "svg_embedded"):
+        add("cropper", "crop_svg", label, lambda p, o, lg: cr.crop_svg(p, o, page_box, logger=lg), ("cairosvg",))
+    add("cropper", "crop_pdf", "pdf_single", lambda p, o, lg: cr.crop_pdf(p, o, page_box, logger=lg), ("pymupdf", "ghostscript"))
+    add("cropper", "crop_script", "eps_single", lambda p, o, lg: cr.crop_script(p, o, page_box, logger=lg), ("ghostscript",))
+
+    # raster
+    for label in sorted(set(medium_rasters)):
+        add("raster", "grayscale_image", label, lambda p, o, lg: rst.grayscale_image(p, o, logger=lg))
+        add("raster", "get_raster_size", label, lambda p, o, lg: rst.get_raster_size(p), output=False)
+    add("raster", "grayscale_image_binarize", "png_m", lambda p, o, lg: rst.grayscale_image(p, o, binarize=True, logger=lg))
+
+    # vector
+    for label in ("svg_10", "svg_1000", "svg_embedded"):
+        add("vector", "svg_analyzer", label, lambda p, o, lg: vec.svg_analyzer(p), output=False)
+        add("vector", "SvgDocument", label,
+            lambda p, o, lg: vec.SvgDocument(p).save(os.path.join(o, "doc.svg")), output=False)
+        add("vector", "show_svg", label, lambda p, o, lg: vec.show_svg(p, dpi=96), ("cairosvg",), output=False)
+    for label in ("pdf_single", "pdf_multi"):
+        add("vector", "pdf_analyzer", label, lambda p, o, lg: vec.pdf_analyzer(p), ("pymupdf",), output=False)
+        add("vector", "get_pdf_size", label, lambda p, o, lg: vec.get_pdf_size(p), ("pymupdf",), output=False)
+        add("vector", "show_script", label, lambda p, o, lg: vec.show_script(p, dpi=96), ("ghostscript",), output=False)
+    add("vector", "vector_analyzer", "eps_single", lambda p, o, lg: vec.vector_analyzer(p), ("pstoedit", "ghostscript"), output=False)
+    add("vector", "get_script_size", "eps_single", lambda p, o, lg: vec.get_script_size(p), output=False)
+    add("vector", "update_matrix", "eps_single",
+        lambda p, o, lg: vec.update_matrix(p, os.path.join(o, "scaled.eps"), scale=(0.5, 0.5)), output=False)
+    add("vector", "trace_bmp_to_svg", "bw_m", lambda p, o, lg: vec.trace_bmp_to_svg(p, o, logger=lg), ("potrace",))
+
+    # pdf_writer: embedding bitmaps in PDF against reportlab, one document per input
+    # and one of all medium rasters. A case fails if the writer falls back to re-encoding.
+    pdf_methods = {
+        "jpg_m": "dct", "jpg_l": "dct", "png_m": "flate", "rgbpng_m": "png", "tiff_m": "flate",
+        "g4tiff_m": "tiff", "lzwtiff_m": "tiff", "deflatetiff_m": "tiff", "bmp_m": "flate",
+    }
+
+    def write_pdf_checked(p, out, method):
+        methods = pw.write_images_pdf([p], out)
+        if methods != [method]:
+            raise RuntimeError(f"Expected the {method} method, the writer used {methods[0]}")
+        return out
+
+    pdf_labels = [l for l in pdf_methods if l in corpus]
+    for label in pdf_labels:
+        add("pdf_writer", "reportlab", label,
+            lambda p, o, lg: reportlab_pdf([p], os.path.join(o, "out.pdf")), ("reportlab",))
+        add("pdf_writer", "write_images_pdf", label,
+            lambda p, o, lg, m=pdf_methods[label]: write_pdf_checked(p, os.path.join(o, "out.pdf"), m))
+    # One page per medium raster; the input label only names the case
+    pages = [corpus[l] for l in pdf_labels if l.endswith("_m")]
+    add("pdf_writer", "reportlab_pages", "jpg_m",
+        lambda p, o, lg: reportlab_pdf(pages, os.path.join(o, "out.pdf")), ("reportlab",))
+    add("pdf_writer", "write_images_pdf_pages", "jpg_m",
+        lambda p, o, lg: pw.write_images_pdf(pages, os.path.join(o, "out.pdf")) and os.path.join(o, "out.pdf"))
+    return cases
+
+
+# ---------------------------------------------------------------- measurement
+
+def peak_rss_mb():
+    """(own peak RSS, peak RSS of waited-for child processes) in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20, None
+        except Exception:
+            return None, None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20
+    return own, children
+
+
+def run_case(case: dict, in_path: str, work_dir: str, repeat: int, trace_dir: str = None) -> dict:
+    """Time one case in this process. The first call is a warm-up."""
+    from src.utils import tracing
+    from src.utils.logger import Logger
+
+    logger = Logger("ImBridgeBenchmark", level=logging.WARNING)
+    rss_base, _ = peak_rss_mb()
+    times = []
+    out_bytes = None
+    for i in range(repeat + 1):
+        out_dir = os.path.join(work_dir, f"run{i}")
+        os.makedirs(out_dir, exist_ok=True)
+        start = time.perf_counter()
+        result = case["run"](in_path, out_dir, logger)
+        elapsed = time.perf_counter() - start
+        if case["output"] and not result:
+            raise RuntimeError("no output was produced")
+        if isinstance(result, str) and os.path.isfile(result):
+            out_bytes = os.path.getsize(result)
+        if i:
+            times.append(elapsed)
+        elif trace_dir:
+            tracing.reset()
+    rss_peak, rss_children = peak_rss_mb()
+    median = statistics.median(times)
+    size = os.path.getsize(in_path)
+    result = {
+        "status": "ok",
+        "runs": len(times),
+        "ms_per_file": round(median * 1000, 3),
+        "ms_min": round(min(times) * 1000, 3),
+        "ms_mean": round(statistics.mean(times) * 1000, 3),
+        "input_bytes": size,
+        "output_bytes": out_bytes,
+        "mb_per_s": round(size / 2 ** 20 / median, 3) if median > 0 else None,
+        "rss_base_mb": None if rss_base is None else round(rss_base, 1),
+        "rss_peak_mb": None if rss_peak is None else round(rss_peak, 1),
+        "rss_children_peak_mb": None if rss_children is None else round(rss_children, 1),
+    }
+    if trace_dir:
+        stages = tracing.aggregate()
+        for s in stages.values():
+            for key in ("total_ms", "self_ms", "mean_ms", "max_ms"):
+                s[key] = round(s[key], 3)
+        result["stages"] = sorted(stages.values(), key=lambda s: s["self_ms"], reverse=True)
+        tracing.export_chrome_trace(os.path.join(trace_dir, re.sub(r"[^\w.-]+", "_", case["name"]) + ".json"))
+    return result
+
+
+def child_main(args) -> int:
+    set_interactive(False)
+    if args.trace:
+        from src.utils import tracing
+        tracing.enable()
+    corpus = build_corpus(args.corpus, list(RASTER_SIZES), create=False)
+    case = next(c for c in build_cases(corpus) if c["name"] == args.run_case)
+    with tempfile.TemporaryDirectory() as work_dir:
+        try:
+            result = run_case(case, corpus[case["input"]], work_dir, args.repeat, args.trace)
+        except Exception as e:
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    with open(args.result_file, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    return 0
+
+
+def run_isolated(case: dict, corpus_dir: str, repeat: int, timeout: float, trace_dir: str = None) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_file = os.path.join(tmp_dir, "result.json")
+        cmd = [
+            sys.executable, os.path.abspath(__file__),
+            "--run-case", case["name"], "--corpus", corpus_dir,
+            "--repeat", str(repeat), "--result-file", result_file,
+        ]
+        if trace_dir:
+            cmd += ["--trace", trace_dir]
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"status": "error", "error": f"timed out after {timeout:.0f} s"}
+        if os.path.exists(result_file):
+            with open(result_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        stderr = proc.stderr.decode("utf-8", "ignore").strip().splitlines()
+        return {"status": "error", "error": stderr[-1] if stderr else f"exit code {proc.returncode}"}
+
+
+def environment_info(tools) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=5,
+        ).stdout.decode().strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tools": {t: get_tool_version(t) for t in sorted(tools)},
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print per-case changes of ms/file; returns 1 if any case got slower than threshold."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        a, b = old[name], new[name]
+        if a["status"] != "ok" or b["status"] != "ok":
+            continue
+        ratio = b["ms_per_file"] / a["ms_per_file"] if a["ms_per_file"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:60s} {a['ms_per_file']:10.2f} -> {b['ms_per_file']:10.2f} ms  x{ratio:5.2f}{flag}")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ImBridge conversion paths")
+    parser.add_argument("-o", "--output", help="JSON result file (default: benchmark-<commit>.json)")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "imbridge-bench-corpus"))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, after one warm-up")
+    parser.add_argument("--quick", action="store_true", help="Skip the large rasters")
+    parser.add_argument("--filter", help="Only run cases whose name matches this regex")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per case")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--trace", metavar="DIR", help="Record per-stage timings and Chrome traces into DIR")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Slowdown ratio reported as regression")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+    if args.run_case:
+        return child_main(args)
+
+    set_interactive(False)
+    sizes = [k for k in RASTER_SIZES if not (args.quick and k == "l")]
+    corpus = build_corpus(args.corpus, list(RASTER_SIZES) if not args.quick else sizes)
+    cases = [c for c in build_cases(corpus) if not args.quick or not c["input"].endswith("_l")]
+    if args.filter:
+        cases = [c for c in cases if re.search(args.filter, c["name"])]
+
+    if args.trace:
+        args.trace = os.path.abspath(args.trace)
+        os.makedirs(args.trace, exist_ok=True)
+    results = []
+    used_tools = set()
+    for case in cases:
+        missing = [t for t in case["tools"] if not tool_available(t)]
+        used_tools.update(case["tools"])
+        if missing:
+            result = {"status": "skipped", "missing_tools": missing}
+            print(f"{case['name']:60s} skipped (missing {', '.join(missing)})")
+        else:
+            result = run_isolated(case, args.corpus, args.repeat, args.timeout, args.trace)
+            if result["status"] == "ok":
+                out_kb = f" {result['output_bytes'] / 1024:10.1f} KB out" if result.get("output_bytes") else ""
+                print(f"{case['name']:60s} {result['ms_per_file']:10.2f} ms/file "
+                      f"{result['mb_per_s'] or 0:8.2f} MB/s {result['rss_peak_mb'] or 0:8.1f} MB{out_kb}")
+            else:
+                print(f"{case['name']:60s} error: {result['error']}")
+        results.append(dict(name=case["name"], group=case["group"], input=case["input"], tools=list(case["tools"]), **result))
+
+    report = {"environment": environment_info(used_tools), "repeat": args.repeat, "results": results}
+    output = args.output or f"benchmark-{report['environment']['commit'] or 'local'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    counts = {s: sum(r["status"] == s for r in results) for s in ("ok", "skipped", "error")}
+    print(f"{counts['ok']} ok, {counts['skipped']} skipped, {counts['error']} errors -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
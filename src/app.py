@@ -2,9 +2,12 @@ import tkinter as tk
 from tkinter import ttk
 import tkinter.font as tkfont
 import os
+import queue
 import tempfile
+from concurrent.futures import Future
 
 from src.utils.logger import Logger
+from src.utils.commons import set_ui_dispatcher
 
 from src.frames.preview_frame import PreviewFrame
 from src.frames.log_frame import LogFrame
@@ -53,6 +56,11 @@ class App(tk.Tk):
         # 确保目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # Dialogs requested by background workers are shown from the Tk thread
+        self._ui_calls = queue.Queue()
+        set_ui_dispatcher(self.call_in_ui)
+        self.after(50, self._poll_ui_calls)
+
         self.build_content()
 
 
@@ -114,3 +122,21 @@ class App(tk.Tk):
 
     def hide_list_window(self):
         self.list_window.withdraw()
+
+    def call_in_ui(self, func):
+        """Run func on the Tk thread and wait for its result; called from worker threads."""
+        future = Future()
+        self._ui_calls.put((func, future))
+        return future.result()
+
+    def _poll_ui_calls(self):
+        while True:
+            try:
+                func, future = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+        self.after(50, self._poll_ui_calls)
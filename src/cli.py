@@ -0,0 +1,177 @@
+"""Command line entry points for running ImBridge without the GUI."""
+
+import argparse
+import os
+import queue
+import signal
+
+from src.utils.commons import set_interactive
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="imbridge", description="ImBridge headless tools")
+    parser.add_argument("--trace", metavar="FILE", help="Record stage timings and write a Chrome trace to FILE")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    watch = sub.add_parser("watch", help="Watch folders and process new or changed files")
+    watch.add_argument("in_dirs", nargs="+", help="Input directories to watch")
+    watch.add_argument("-o", "--out-dir", required=True, help="Output directory; subfolders are mirrored")
+    watch.add_argument("--pipeline", choices=["convert", "transform", "ink"], default="convert")
+    watch.add_argument("--to", dest="out_fmt", default=".png", help="Target format for convert, e.g. .pdf")
+    watch.add_argument("--dpi", type=int, default=300)
+    watch.add_argument("--quality", type=int, default=95)
+    watch.add_argument("--scale", type=float, default=1.0, help="Scale factor for transform")
+    watch.add_argument("--binarize", action="store_true", help="Binarize output of ink")
+    watch.add_argument("--workers", type=int, default=4)
+    watch.add_argument("--settle", type=float, default=2.0, help="Seconds a file must stay unchanged")
+    watch.add_argument("--poll", action="store_true", help="Scan periodically instead of using inotify")
+    watch.add_argument("--no-existing", action="store_true", help="Ignore files already present at start")
+    watch.add_argument("--no-cache", action="store_true", help="Do not reuse cached conversion results")
+
+    convert = sub.add_parser("convert", help="Convert files once; an interrupted run resumes where it stopped")
+    convert.add_argument("inputs", nargs="+", help="Input files or directories (searched recursively)")
+    convert.add_argument("-o", "--out-dir", required=True)
+    convert.add_argument("--to", dest="out_fmt", default=".png", help="Target format, e.g. .pdf")
+    convert.add_argument("--dpi", type=int, default=300)
+    convert.add_argument("--quality", type=int, default=95)
+    convert.add_argument("--workers", type=int, default=4)
+    convert.add_argument("--max-retries", type=int, default=2, help="Retries of a failed file across resumed runs")
+    convert.add_argument("--restart", action="store_true", help="Convert everything, even if an earlier run was interrupted")
+    convert.add_argument("--no-cache", action="store_true", help="Do not reuse cached conversion results")
+
+    pdf = sub.add_parser("pdf", help="Write bitmaps as the pages of one PDF")
+    pdf.add_argument("inputs", nargs="+", help="Input files or directories (searched recursively), in page order")
+    pdf.add_argument("-o", "--out", required=True, help="Output PDF file")
+    pdf.add_argument("--dpi", type=int, default=300, help="Resolution the pages are sized at")
+    return parser
+
+
+def collect_inputs(inputs, formats) -> list:
+    formats = tuple(formats)
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(formats))
+        else:
+            files.append(item)
+    return files
+
+
+def run_watch(args) -> int:
+    from src.utils.logger import Logger
+    from src.utils.watcher import FolderWatcher, pipelines
+
+    logger = Logger()
+    if args.pipeline == "convert":
+        out_fmt = args.out_fmt if args.out_fmt.startswith(".") else "." + args.out_fmt
+        params = dict(out_fmt=out_fmt.lower(), dpi=args.dpi, quality=args.quality)
+        if not args.no_cache:
+            from src.utils.result_cache import ResultCache
+            params["cache"] = ResultCache()
+    elif args.pipeline == "transform":
+        params = dict(scale_x=args.scale, scale_y=args.scale)
+    else:
+        params = dict(binarize=args.binarize)
+
+    watcher = FolderWatcher(
+        args.in_dirs,
+        args.out_dir,
+        pipeline=pipelines[args.pipeline],
+        logger=logger,
+        workers=args.workers,
+        settle=args.settle,
+        polling=args.poll,
+        process_existing=not args.no_existing,
+        **params,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+def run_convert(args) -> int:
+    from src.utils.commons import bitmap_formats, vector_formats, heif_formats
+    from src.utils.logger import Logger
+    from src.utils.batch import BatchRunner
+    from src.utils.journal import BatchJournal
+    from src.utils.watcher import convert_pipeline
+
+    logger = Logger()
+    out_fmt = (args.out_fmt if args.out_fmt.startswith(".") else "." + args.out_fmt).lower()
+    files = collect_inputs(args.inputs, bitmap_formats + vector_formats + heif_formats)
+    params = dict(out_fmt=out_fmt, dpi=args.dpi, quality=args.quality)
+    journal = BatchJournal.for_batch(files, args.out_dir, params)
+    todo, done, given_up = journal.start(files, restart=args.restart, max_retries=args.max_retries)
+    if done or given_up:
+        logger.info(
+            f"Resuming: {len(done)} already done, {len(given_up)} given up, {len(todo)} to convert."
+        )
+    cache = None
+    if not args.no_cache:
+        from src.utils.result_cache import ResultCache
+        cache = ResultCache()
+
+    runner = BatchRunner(
+        lambda f: convert_pipeline(f, args.out_dir, logger=logger, cache=cache, **params),
+        workers=args.workers,
+        journal=journal,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: runner.cancel())
+    runner.start(todo)
+    while True:
+        try:
+            event = runner.events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        except KeyboardInterrupt:
+            logger.info("Cancelling after the running files; run again to resume.")
+            runner.cancel()
+            continue
+        if event.kind == "failed" and event.error:
+            logger.error(f"Conversion of {os.path.basename(event.path)} failed: {event.error}")
+        elif event.kind == "end":
+            break
+    if cache is not None:
+        cache.prune()
+    journal.close()
+    print(journal.format_summary())
+    return 0 if journal.finished and not journal.summary()["failed"] else 1
+
+
+def run_pdf(args) -> int:
+    from src.utils.commons import bitmap_formats
+    from src.utils.converter import rasters2pdf
+    from src.utils.logger import Logger
+
+    logger = Logger()
+    files = collect_inputs(args.inputs, bitmap_formats)
+    if not files:
+        logger.error("No images to write.")
+        return 1
+    return 0 if rasters2pdf(files, args.out, dpi=args.dpi, logger=logger) else 1
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    # No one is there to answer dialogs
+    set_interactive(False)
+    if args.trace:
+        from src.utils import tracing
+        tracing.enable()
+    try:
+        if args.command == "watch":
+            return run_watch(args)
+        if args.command == "convert":
+            return run_convert(args)
+        if args.command == "pdf":
+            return run_pdf(args)
+        return 1
+    finally:
+        if args.trace:
+            tracing.export_chrome_trace(args.trace)
+            print(tracing.format_aggregate())
@@ -0,0 +1,236 @@
+import tkinter as tk
+from tkinter import ttk
+from PIL import ImageTk
+from collections import OrderedDict
+import os
+
+from src.frames.base_frame import BaseFrame
+import src.utils.vector as vec
+import src.utils.raster as rst
+from src.utils.commons import script_formats
+from src.utils.scheduler import get_scheduler, INTERACTIVE
+
+
+def render_base(path, box):
+    """Preview of path fitting box, rendered once for an interactive crop."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in script_formats:
+        img = vec.show_script(path, box=box)
+    elif ext == ".svg":
+        img = vec.show_svg(path, box=box)
+    else:
+        img, _ = rst.open_preview(path, box)
+        img = rst.remove_alpha_channel(img)
+        img.thumbnail(box)
+    img.load()
+    return img
+
+
+class CropFrame(BaseFrame):
+    """
+    Interactive crop on a preview rendered once. The crop box and the shade
+    around it are canvas items moved on every drag event, nothing is rendered
+    again; the box is written back to the x/y/w/h variables in source units.
+    Drag inside the box to move it, near its edges to resize it and outside it
+    to draw a new one.
+    """
+
+    # Rendered previews, keyed on (path, mtime, box); a few files at most
+    _bases = OrderedDict()
+    max_bases = 4
+    # Distance in pixels within which a press grabs an edge
+    grab = 6
+
+    def __init__(self, parent, path, box_vars, source_size, flip_y=False, box=(640, 640), *args, **kwargs):
+        """
+        box_vars: the (x, y, w, h) variables of the crop box, in source units.
+        source_size: width and height of the source in the same units.
+        flip_y: y counts from the bottom, as in EPS/PS coordinates.
+        """
+        super().__init__(parent, *args, **kwargs)
+        self.path = path
+        self.box_vars = box_vars
+        self.source_size = source_size
+        self.flip_y = flip_y
+        self.box = box
+        self.scale = None
+        self.rect = None
+        self._drag = None
+        self._syncing = False
+        self._traces = []
+        self.build_contents()
+        for var in self.box_vars:
+            self._traces.append((var, var.trace_add("write", self._on_var_changed)))
+        self.bind("<Destroy>", self._on_destroy)
+        self.request_base()
+
+    def build_contents(self):
+        self.canvas = tk.Canvas(self, width=self.box[0], height=self.box[1], bg="#808080", highlightthickness=0)
+        self.canvas.pack(side="top", fill="both", expand=True)
+        self.status_label = ttk.Label(self, text="Rendering preview...", anchor="w")
+        self.status_label.pack(side="bottom", fill="x", padx=6, pady=(0, 2))
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", lambda e: setattr(self, "_drag", None))
+
+    @property
+    def job_key(self):
+        return f"crop-base-{id(self)}"
+
+    def request_base(self):
+        key = (self.path, os.stat(self.path).st_mtime_ns, self.box)
+        img = self._bases.get(key)
+        if img is not None:
+            self._bases.move_to_end(key)
+            self.show_base(img)
+            return
+        scheduler = get_scheduler()
+        future = scheduler.submit(render_base, self.path, self.box, priority=INTERACTIVE, key=self.job_key)
+        scheduler.watch(self, future, lambda img: self._store_base(key, img), on_error=self._on_render_error, key=self.job_key)
+
+    def _store_base(self, key, img):
+        self._bases[key] = img
+        while len(self._bases) > self.max_bases:
+            self._bases.popitem(last=False)
+        self.show_base(img)
+
+    def _on_render_error(self, error):
+        self.status_label.config(text=f"Preview failed: {error}")
+        self.logger.error(f"Crop preview failed: {error}") if self.logger else None
+
+    def show_base(self, img):
+        self.photo = ImageTk.PhotoImage(img)
+        self.canvas.config(width=img.width, height=img.height)
+        self.canvas.delete("all")
+        self.canvas.create_image(0, 0, image=self.photo, anchor="nw")
+        # Display pixels per source unit
+        self.scale = (img.width / self.source_size[0], img.height / self.source_size[1])
+        self.image_size = (img.width, img.height)
+        # Tk has no alpha, a stippled fill shades the area outside the box
+        self.shades = [
+            self.canvas.create_rectangle(0, 0, 0, 0, fill="black", stipple="gray50", outline="")
+            for _ in range(4)
+        ]
+        self.outline = self.canvas.create_rectangle(0, 0, 0, 0, outline="white", width=2)
+        self.status_label.config(text="Drag to move or resize the crop box")
+        self.rect = self._rect_from_vars()
+        self._draw()
+
+    def _rect_from_vars(self):
+        """Crop box in display pixels (left, top, right, bottom) from the variables."""
+        try:
+            x, y, w, h = (var.get() for var in self.box_vars)
+        except tk.TclError:
+            return self.rect
+        if self.flip_y:
+            y = self.source_size[1] - y - h
+        sx, sy = self.scale
+        return [x * sx, y * sy, (x + w) * sx, (y + h) * sy]
+
+    def _write_vars(self):
+        sx, sy = self.scale
+        left, top, right, bottom = self.rect
+        x, w = round(left / sx), max(1, round((right - left) / sx))
+        y, h = round(top / sy), max(1, round((bottom - top) / sy))
+        if self.flip_y:
+            y = max(0, round(self.source_size[1]) - y - h)
+        self._syncing = True
+        try:
+            for var, value in zip(self.box_vars, (x, y, w, h)):
+                if var.get() != value:
+                    var.set(value)
+        finally:
+            self._syncing = False
+
+    def _on_var_changed(self, *args):
+        if self._syncing or self.scale is None:
+            return
+        self.rect = self._rect_from_vars()
+        self._draw()
+
+    def _draw(self):
+        width, height = self.image_size
+        left, top, right, bottom = self.rect
+        coords = [
+            (0, 0, width, top),
+            (0, bottom, width, height),
+            (0, top, left, bottom),
+            (right, top, width, bottom),
+        ]
+        for item, xy in zip(self.shades, coords):
+            self.canvas.coords(item, *xy)
+        self.canvas.coords(self.outline, left, top, right, bottom)
+
+    def _on_press(self, event):
+        if self.rect is None:
+            return
+        left, top, right, bottom = self.rect
+        x, y = event.x, event.y
+        near = lambda a, b: abs(a - b) <= self.grab
+        inside_y = top - self.grab <= y <= bottom + self.grab
+        inside_x = left - self.grab <= x <= right + self.grab
+        edges = set()
+        if inside_y and near(x, left):
+            edges.add("left")
+        elif inside_y and near(x, right):
+            edges.add("right")
+        if inside_x and near(y, top):
+            edges.add("top")
+        elif inside_x and near(y, bottom):
+            edges.add("bottom")
+        if edges:
+            mode = edges
+        elif left < x < right and top < y < bottom:
+            mode = "move"
+        else:
+            # Start a new box at the press
+            self.rect = [x, y, x, y]
+            mode = {"right", "bottom"}
+        self._drag = (mode, x, y, list(self.rect))
+
+    def _on_drag(self, event):
+        if self._drag is None:
+            return
+        mode, x0, y0, rect = self._drag
+        width, height = self.image_size
+        dx, dy = event.x - x0, event.y - y0
+        left, top, right, bottom = rect
+        if mode == "move":
+            dx = min(max(dx, -left), width - right)
+            dy = min(max(dy, -top), height - bottom)
+            left, top, right, bottom = left + dx, top + dy, right + dx, bottom + dy
+        else:
+            clamp = lambda v, hi: min(max(v, 0), hi)
+            if "left" in mode:
+                left = clamp(left + dx, right - 1)
+            if "right" in mode:
+                right = clamp(right + dx, width)
+                right = max(right, left + 1)
+            if "top" in mode:
+                top = clamp(top + dy, bottom - 1)
+            if "bottom" in mode:
+                bottom = clamp(bottom + dy, height)
+                bottom = max(bottom, top + 1)
+        self.rect = [left, top, right, bottom]
+        self._draw()
+        self._write_vars()
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        get_scheduler().discard(self.job_key)
+        for var, trace in self._traces:
+            try:
+                var.trace_remove("write", trace)
+            except tk.TclError:
+                pass
+        self._traces = []
+
+
+def open_crop_window(parent, path, box_vars, source_size, flip_y=False):
+    """Open an interactive crop of path in its own window."""
+    window = tk.Toplevel(parent)
+    window.title(f"Crop - {os.path.basename(path)}")
+    frame = CropFrame(window, path, box_vars, source_size, flip_y=flip_y)
+    frame.pack(fill="both", expand=True)
+    return window
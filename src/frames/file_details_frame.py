@@ -2,8 +2,11 @@ from tkinter import ttk
 from PIL import Image
 import time
 import os
+import queue
 
 import src.utils.vector as vec
+from src.utils.meta_index import MetaIndex
+from src.utils.scheduler import INTERACTIVE, get_scheduler
 
 from src.frames.base_frame import BaseFrame
 from src.frames.preview_frame import PreviewFrame
@@ -13,7 +16,19 @@ class FileDetailsFrame(BaseFrame):
         super().__init__(parent, *args, **kwargs)
         self.list_window = parent
         self._file_meta_cache = {}
+        try:
+            self.meta_index = MetaIndex()
+        except Exception as e:
+            self.meta_index = None
+            self.logger.error(f"Metadata index unavailable: {e}") if self.logger else None
+        # Rows refreshed by the background indexer, drained on the Tk thread
+        self._refreshed = queue.Queue()
+        self._current_path = None
+        self._polling = False
+        # Metadata read on the scheduler for a file the background refresh does not cover
+        self._reading = None
         self.build_contents()
+        self.bind("<Destroy>", self._on_destroy)
 
     def build_contents(self):
         # Main frame
@@ -66,6 +81,14 @@ class FileDetailsFrame(BaseFrame):
         
             self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+            if self.meta_index is not None:
+                self.meta_index.refresh(
+                    file_list,
+                    self.read_image_meta,
+                    callback=lambda path, meta: self._refreshed.put((path, meta)),
+                )
+                self._start_polling()
+
             # Default select the first
             if file_list:
                 self.tree.selection_set(file_list[0])
@@ -81,7 +104,7 @@ class FileDetailsFrame(BaseFrame):
             queue = list(self.preview_frame._PreviewFrame__file_queue)
             idx = queue.index(file_path)
             self.preview_frame._queue_index = idx
-            self.preview_frame.show_file(file_path)
+            self.preview_frame.request_file(file_path)
             self.preview_frame._update_page_label()
         except Exception:
             pass
@@ -104,7 +127,7 @@ class FileDetailsFrame(BaseFrame):
         if sig[:4] == b'RIFF' and b'WEBP' in head[:32]: return 'WEBP','Raster'
         if sig[:4] in (b'II*\x00', b'MM\x00*'): return 'TIFF','Raster'
         if head.startswith(b'%PDF-'): return 'PDF','Vector'
-        if head.startswith(b'%!PS'): return 'EPS','Vector'
+        if head.startswith(b'%!PS') or head.startswith(vec.dos_eps_magic): return 'EPS','Vector'
         
         # 改进SVG检测逻辑
         # 1. 检查完整的前512字节，不只是前200
@@ -164,6 +187,13 @@ class FileDetailsFrame(BaseFrame):
         # Other cases
         else:
             meta['Size'] = 'N/A'
+        if typ in ('PDF', 'EPS', 'PS'):
+            try:
+                thumb = vec.embedded_preview(path)
+            except Exception:
+                thumb = None
+            if thumb is not None:
+                meta['Embedded Preview'] = f'{thumb.width} × {thumb.height} px'
         # Vector analyzer additional information
         if cat == 'Vector':
             try:
@@ -199,12 +229,15 @@ class FileDetailsFrame(BaseFrame):
             ttk.Label(self.detail_frame, text="File does not exist", foreground="red").pack(anchor="w")
             return
             
-        # Read from cache or parse anew
-        if path in self._file_meta_cache:
-            meta = self._file_meta_cache[path]
-        else:
-            meta = self.read_image_meta(path)
-            self._file_meta_cache[path] = meta
+        self._current_path = path
+        self.render_details(self.load_meta(path))
+
+        # When detail panel refreshes, sync preview Frame to current file
+        self._sync_preview_to_file(path)
+
+    def render_details(self, meta):
+        for widget in self.detail_frame.winfo_children():
+            widget.destroy()
         # Display each item
         for k, v in meta.items():
             row = ttk.Frame(self.detail_frame)
@@ -212,8 +245,97 @@ class FileDetailsFrame(BaseFrame):
             ttk.Label(row, text=f"{k}: ", font=("TkDefaultFont", 10, "bold")).pack(side="left", anchor="w")
             ttk.Label(row, text=str(v), font=("TkDefaultFont", 10)).pack(side="left", anchor="w")
 
-        # When detail panel refreshes, sync preview Frame to current file
-        self._sync_preview_to_file(path)
+    def load_meta(self, path):
+        """
+        Get metadata from the session cache, then the persistent index, and only
+        parse the file when neither has a valid entry. A stale index row is shown
+        while the background refresh recomputes it. Parsing never runs on the Tk
+        thread: a placeholder is returned and _poll_refreshed shows the result.
+        """
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        if key in self._file_meta_cache:
+            return self._file_meta_cache[key]
+        meta = None
+        if self.meta_index is not None:
+            # Hashing is left to the background refresh, it would block the UI on large files
+            meta = self.meta_index.get(path, verify=False)
+            if meta is None and self.meta_index.refreshing:
+                stale = self.meta_index.get_stale(path)
+                if stale is not None:
+                    stale['Status'] = 'Refreshing...'
+                    return stale
+        if meta is None:
+            if self.meta_index is None or not self.meta_index.refreshing:
+                # The refresh, when running, reaches this file itself
+                self._reading = get_scheduler().submit(
+                    self._read_meta, path, priority=INTERACTIVE, key=self.meta_key
+                )
+            self._start_polling()
+            return {'Location': path, 'Status': 'Reading...'}
+        self._file_meta_cache[key] = meta
+        return meta
+
+    @property
+    def meta_key(self):
+        return f"file-meta-{id(self)}"
+
+    def _read_meta(self, path):
+        # Runs on a scheduler worker; the result is picked up by _poll_refreshed
+        meta = self.read_image_meta(path)
+        index = self.meta_index
+        if index is not None:
+            try:
+                index.put(path, meta, digest=False)
+            except Exception:
+                pass
+        self._refreshed.put((path, meta))
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.after(200, self._poll_refreshed)
+
+    def _poll_refreshed(self):
+        """Pick up rows refreshed in the background and redraw the current one if affected."""
+        redraw = False
+        while True:
+            try:
+                path, meta = self._refreshed.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            self._file_meta_cache[(path, st.st_size, st.st_mtime_ns)] = meta
+            redraw = redraw or path == self._current_path
+        if redraw and self.winfo_exists():
+            meta = self._file_meta_cache.get(self._current_key())
+            if meta is not None:
+                self.render_details(meta)
+        refreshing = self.meta_index is not None and self.meta_index.refreshing
+        reading = self._reading is not None and not self._reading.done()
+        if refreshing or reading or not self._refreshed.empty():
+            self.after(200, self._poll_refreshed)
+        else:
+            self._polling = False
+
+    def _current_key(self):
+        try:
+            st = os.stat(self._current_path)
+        except OSError:
+            return None
+        return (self._current_path, st.st_size, st.st_mtime_ns)
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        get_scheduler().discard(self.meta_key)
+        if self.meta_index is not None:
+            # Stops the background refresh and releases the SQLite connection
+            self.meta_index.close()
+            self.meta_index = None
 
     # Bind selection event
     def on_select(self, event):
@@ -2,11 +2,13 @@ import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 import os
-from pillow_heif import register_heif_opener
 
 from src.frames.base_frame import BaseFrame
+from src.frames.zoom_frame import open_zoom_window
 import src.utils.vector as vec
+import src.utils.raster as rst
 from src.utils.commons import script_formats, bitmap_formats, heif_formats
+from src.utils.scheduler import get_scheduler, INTERACTIVE
 
 
 class PreviewFrame(BaseFrame):
@@ -24,6 +26,13 @@ class PreviewFrame(BaseFrame):
             pass
         self.__init_file_queue()
         self._queue_index = -1
+        # Page shown of a multi-page document and page counts seen so far
+        self._doc_path = None
+        self._doc_page = 0
+        self._doc_pages = {}
+        # Vectors first show a draft at this fraction of the preview size
+        self.progressive = True
+        self.draft_scale = 0.25
 
         self.title_frame = ttk.LabelFrame(
             self, text=self.title, width=self.width, height=self.height, relief="groove"
@@ -38,6 +47,8 @@ class PreviewFrame(BaseFrame):
         # Pack the preview label after buttons to ensure it is above them
         self.preview_label = ttk.Label(self.title_frame, text="Preview Area", anchor="center")
         self.preview_label.pack(side="top", fill="both", expand=True, padx=10, pady=10)
+        # Double-click opens the document in a zoomable view rendered at full resolution
+        self.preview_label.bind("<Double-Button-1>", lambda e: self.open_zoom())
 
     def build_buttons(self):
         # Navigation buttons area (pack first to ensure at bottom)
@@ -51,6 +62,14 @@ class PreviewFrame(BaseFrame):
         self.page_label.pack(side="left", padx=(0, 12))
         self.btn_next = tk.Button(btn_frame, text="▶", width=2, height=1, font=small_font, command=self.next_page)
         self.btn_next.pack(side="left", ipadx=0, ipady=0)
+        # Document pages, shown only for multi-page PDF/PS files
+        self.doc_frame = ttk.Frame(self.title_frame)
+        self.btn_doc_prev = tk.Button(self.doc_frame, text="▲", width=2, height=1, font=small_font, command=self.previous_doc_page)
+        self.btn_doc_prev.pack(side="left", ipadx=0, ipady=0, padx=(0, 12))
+        self.doc_page_label = ttk.Label(self.doc_frame, text="", width=9, anchor="center")
+        self.doc_page_label.pack(side="left", padx=(0, 12))
+        self.btn_doc_next = tk.Button(self.doc_frame, text="▼", width=2, height=1, font=small_font, command=self.next_doc_page)
+        self.btn_doc_next.pack(side="left", ipadx=0, ipady=0)
 
     def _get_page_text(self):
         total = len(self.__file_queue)
@@ -62,6 +81,15 @@ class PreviewFrame(BaseFrame):
         if hasattr(self, "page_label"):
             self.page_label.config(text=self._get_page_text())
 
+    def _update_doc_label(self):
+        pages = self._doc_pages.get(self._doc_path, 1)
+        if pages > 1:
+            self.doc_page_label.config(text=f"p. {self._doc_page + 1}/{pages}")
+            if not self.doc_frame.winfo_manager():
+                self.doc_frame.pack(side="bottom", pady=0, before=self.preview_label)
+        else:
+            self.doc_frame.pack_forget()
+
     def __init_file_queue(self):
         # Private ordered queue, not directly accessible from outside
         from collections import deque
@@ -73,7 +101,7 @@ class PreviewFrame(BaseFrame):
         """
         self.__file_queue.append(file_path)
         self._queue_index = len(self.__file_queue) - 1
-        self.show_file(self.__file_queue[self._queue_index])
+        self.request_file(self.__file_queue[self._queue_index])
         self._update_page_label()
 
     def clear_file_queue(self):
@@ -85,15 +113,16 @@ class PreviewFrame(BaseFrame):
         self.clear_preview()
         self._update_page_label()
 
-    def show_image(self, image, unit='px'):
+    def show_image(self, image, unit='px', orig_size=None):
+        """orig_size: size of the source when image is a reduced version of it."""
         try:
             img = image.copy()
-            if unit == 'pt':
+            if unit not in ('pt', 'px'):
+                raise ValueError("Unsupported unit for image size.")
+            if orig_size is None and unit == 'pt':
                 orig_size = (int(img.size[0] / self.dpi * 72), int(img.size[1] / self.dpi * 72))
-            elif unit == 'px':
+            elif orig_size is None:
                 orig_size = img.size
-            else:
-                raise ValueError("Unsupported unit for image size.")
             self.update_idletasks()
             frame_w = self.preview_label.winfo_width()
             frame_h = self.preview_label.winfo_height()
@@ -121,57 +150,166 @@ class PreviewFrame(BaseFrame):
             self.preview_label.config(image="", text="Preview failed")
             self.preview_label.image = None
     
+    def preview_box(self):
+        """Pixel size of the preview area; call on the UI thread."""
+        width = self.preview_label.winfo_width()
+        height = self.preview_label.winfo_height()
+        if width <= 1 or height <= 1:
+            # Not laid out yet
+            return self.width, self.height
+        return width, height
+
+    def render_file(self, img_path, process_callback=None, page=0, box=None, draft=False):
+        """
+        Decode or render img_path for the preview without touching any widget,
+        so it can run on a worker thread. Returns (image, unit) or
+        (image, unit, source size), or None for unsupported formats. Of a
+        document only the given page (0-based) is rendered.
+
+        Vectors are rendered at the resolution that fills box, the preview
+        size, rather than at self.dpi; box=None renders at full self.dpi, as
+        does a process_callback, which may depend on the resolution. draft
+        renders PDF/PS/EPS without antialiasing; cairosvg has no such switch,
+        so an SVG draft is only cheaper by its smaller box.
+        """
+        ext = os.path.splitext(img_path)[1].lower()
+        box = box if process_callback is None else None
+        if ext in script_formats:
+            pages = vec.get_page_count(img_path)
+            self._doc_pages[img_path] = pages
+            page = min(max(page, 0), pages - 1)
+            if box:
+                # An embedded preview costs a seek instead of a render. It stands in for a
+                # draft, and for the final image only when it fills the preview unenlarged
+                thumb = vec.embedded_preview(img_path, page)
+                if thumb is not None and (draft or min(box[0] / thumb.width, box[1] / thumb.height) <= 1):
+                    sz, unit = vec.get_page_size(img_path, page), "pt"
+                    return (thumb, unit, sz) if all(sz) else (thumb, 'px')
+        if ext in script_formats:
+            img = vec.show_script(img_path, dpi=self.dpi, page=page, box=box, antialias=not draft)
+            # Shared with the session cache, the callback gets its own copy
+            img = process_callback(img.copy()) if process_callback else img
+            sz, unit = vec.get_page_size(img_path, page), "pt"
+        elif ext == ".svg":
+            img = vec.show_svg(img_path, dpi=self.dpi, box=box)
+            img = process_callback(img.copy()) if process_callback else img
+            sz, unit = vec.get_svg_size(img_path)
+        elif ext in heif_formats or ext in bitmap_formats:
+            if process_callback is None:
+                # Decode only as many pixels as the preview shows; the header gives the real size
+                img, orig_size = rst.open_preview(img_path, box or (self.width, self.height))
+                return img, 'px', orig_size
+            img = process_callback(Image.open(img_path))
+            unit = 'px'
+        else:
+            return None
+        if unit == 'px':
+            # Decode now, on the calling thread, rather than in show_image
+            img.load()
+        if box and all(sz):
+            # Rendered to fit the preview, so the image size says nothing about the source
+            return img, unit, sz
+        return img, unit
+
+    def show_rendered(self, rendered):
+        if rendered is None:
+            # Unsupported format
+            self.show_unavailable()
+        else:
+            self.show_image(*rendered)
+        self._update_page_label()
+        self._update_doc_label()
+
+    def show_unavailable(self):
+        # Only clear image and size information, do not destroy buttons and page number
+        if hasattr(self, "preview_label"):
+            self.preview_label.config(image="", text="No Preview Available")
+            self.preview_label.image = None
+        if hasattr(self, "size_label"):
+            self.size_label.config(text="")
+
     def show_file(self, img_path, process_callback=None):
         try:
-            ext = os.path.splitext(img_path)[1].lower()
-            if ext == ".pdf":
-                img = vec.show_script(img_path, dpi=self.dpi)
-                img = process_callback(img) if process_callback else img
-                sz, unit = vec.get_pdf_size(img_path)
-                self.show_image(img, unit=unit)
-            elif ext in (".eps", ".ps"):
-                img = vec.show_script(img_path, dpi=self.dpi)
-                img = process_callback(img.copy()) if process_callback else img
-                sz, unit = vec.get_script_size(img_path)
-                self.show_image(img, unit=unit)
-            elif ext == ".svg":
-                img = vec.show_svg(img_path, dpi=self.dpi)
-                img = process_callback(img) if process_callback else img
-                sz, unit = vec.get_svg_size(img_path)
-                self.show_image(img, unit=unit)
-            elif ext in heif_formats:
-                register_heif_opener()
-                img = Image.open(img_path)
-                img = process_callback(img) if process_callback else img
-                self.show_image(img, unit='px')
-            elif ext in bitmap_formats:
-                img = Image.open(img_path)
-                img = process_callback(img) if process_callback else img
-                self.show_image(img, unit='px')
-            else:
-                # Unsupported format
-                if hasattr(self, "preview_label"):
-                    self.preview_label.config(image="", text="No Preview Available")
-                    self.preview_label.image = None
-                if hasattr(self, "size_label"):
-                    self.size_label.config(text="")
-            self._update_page_label()
+            self.show_rendered(self.render_file(img_path, process_callback, box=self.preview_box()))
         except Exception as e:
-            # Only clear image and size information, do not destroy buttons and page number
-            if hasattr(self, "preview_label"):
-                self.preview_label.config(image="", text="No Preview Available")
-                self.preview_label.image = None
-            if hasattr(self, "size_label"):
-                self.size_label.config(text="")
+            self.show_unavailable()
             raise RuntimeError(e)
 
+    @property
+    def job_key(self):
+        """Scheduler key of this frame's preview jobs; a new request supersedes the last."""
+        return f"preview-{id(self)}"
+
+    @property
+    def draft_key(self):
+        return f"preview-draft-{id(self)}"
+
+    def request_file(self, img_path, process_callback=None, page=0):
+        """
+        Like show_file, but render on the shared scheduler and show the result
+        when ready.
+        """
+        self._doc_path = img_path
+        self._doc_page = min(page, self._doc_pages.get(img_path, page + 1) - 1)
+        box = self.preview_box()
+        scheduler = get_scheduler()
+        ext = os.path.splitext(img_path)[1].lower()
+        if self.progressive and box and process_callback is None and (ext in script_formats or ext == ".svg"):
+            # A coarse draft first, replaced by the refined render below unless that is already done
+            draft_box = (max(16, int(box[0] * self.draft_scale)), max(16, int(box[1] * self.draft_scale)))
+            draft = scheduler.submit(
+                self.render_file, img_path, None, self._doc_page, draft_box, True, priority=INTERACTIVE, key=self.draft_key
+            )
+            scheduler.watch(
+                self, draft, lambda rendered: None if future.done() else self.show_rendered(rendered), key=self.draft_key
+            )
+        else:
+            scheduler.discard(self.draft_key)
+        # Submitted after the draft, so it starts after it; it supersedes the refinement of the previous request
+        future = scheduler.submit(
+            self.render_file, img_path, process_callback, self._doc_page, box, priority=INTERACTIVE, key=self.job_key
+        )
+        scheduler.watch(self, future, self.show_rendered, on_error=self._on_render_error, key=self.job_key)
+        return future
+
+    def _on_render_error(self, error):
+        self.show_unavailable()
+        self.logger.error(f"Preview failed: {error}") if self.logger else None
+
+    def request_preview(self, func, *args, priority=INTERACTIVE, **kwargs):
+        """
+        Run func(*args, preview_callback=..., **kwargs) on the shared scheduler,
+        e.g. transform_image or crop_pdf, and show the last image it passed to
+        preview_callback once it returns. Interactive requests supersede each
+        other; saves (any other priority) always run to completion.
+        """
+        def job():
+            shown = []
+            func(*args, preview_callback=lambda img, unit='px': shown.append((img, unit)), **kwargs)
+            return shown[-1] if shown else None
+
+        def on_error(error):
+            self.logger.error(str(error)) if self.logger else None
+
+        key = self.job_key if priority == INTERACTIVE else None
+        scheduler = get_scheduler()
+        future = scheduler.submit(job, priority=priority, key=key)
+        scheduler.watch(self, future, lambda shown: self.show_image(*shown) if shown else None, on_error=on_error, key=key)
+        return future
+
     def clear_preview(self):
+        # A preview still being rendered must not appear after the clear
+        get_scheduler().discard(self.job_key)
+        get_scheduler().discard(self.draft_key)
         # Only clear image and size information, do not destroy buttons and page number
         if hasattr(self, "preview_label"):
             self.preview_label.config(image="", text="Preview Area")
             self.preview_label.image = None
         if hasattr(self, "size_label"):
             self.size_label.config(text="")
+        self._doc_path = None
+        self._doc_page = 0
+        self._update_doc_label()
         self._update_page_label()
             
     def previous_page(self):
@@ -182,7 +320,7 @@ class PreviewFrame(BaseFrame):
             return
         if self._queue_index > 0:
             self._queue_index -= 1
-            self.show_file(self.__file_queue[self._queue_index])
+            self.request_file(self.__file_queue[self._queue_index])
             self._update_page_label()
             # Send custom page change event
             self.event_generate('<<PreviewPageChanged>>', when='tail')
@@ -195,11 +333,33 @@ class PreviewFrame(BaseFrame):
             return
         if self._queue_index < len(self.__file_queue) - 1:
             self._queue_index += 1
-            self.show_file(self.__file_queue[self._queue_index])
+            self.request_file(self.__file_queue[self._queue_index])
             self._update_page_label()
             # Send custom page change event
             self.event_generate('<<PreviewPageChanged>>', when='tail')
 
+    def open_zoom(self):
+        """Open the shown PDF page or SVG in a zoom-and-pan window."""
+        if not self._doc_path or os.path.splitext(self._doc_path)[1].lower() not in (".pdf", ".svg"):
+            return None
+        try:
+            return open_zoom_window(self, self._doc_path, page=self._doc_page)
+        except Exception as e:
+            self.logger.error(f"Zoom preview failed: {e}") if self.logger else None
+            return None
+
+    def previous_doc_page(self):
+        """Show the previous page of the current document, rendering only that page."""
+        if self._doc_path and self._doc_page > 0:
+            self.request_file(self._doc_path, page=self._doc_page - 1)
+            self._update_doc_label()
+
+    def next_doc_page(self):
+        """Show the next page of the current document, rendering only that page."""
+        if self._doc_path and self._doc_page < self._doc_pages.get(self._doc_path, 1) - 1:
+            self.request_file(self._doc_path, page=self._doc_page + 1)
+            self._update_doc_label()
+
     def get_queue_size(self):
         """
         Get the current queue size
@@ -0,0 +1,114 @@
+import queue
+import os
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from src.frames.base_frame import BaseFrame
+from src.utils.batch import BatchStats, format_duration
+
+
+class ProgressFrame(BaseFrame):
+    """
+    Live batch progress: counts, throughput, ETA, what each worker is doing
+    and the slowest files so far. Fed by the event queue of a BatchRunner.
+    """
+
+    def __init__(self, parent, title=None, poll_ms=200, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.title = title if title is not None else "Progress"
+        self.poll_ms = poll_ms
+        self.stats = BatchStats()
+        self.runner = None
+        self.on_event = None
+        self._polling = False
+        self.build_contents()
+
+    def build_contents(self):
+        frame = ttk.LabelFrame(self, text=self.title, style="Bold.TLabelframe")
+        frame.pack(fill="both", expand=True, padx=4, pady=(4, 4))
+
+        top_row = ttk.Frame(frame)
+        top_row.pack(fill="x", padx=6, pady=(4, 2))
+        self.progress_bar = ttk.Progressbar(top_row, mode="determinate", maximum=1)
+        self.progress_bar.pack(side="left", fill="x", expand=True, padx=(0, 8))
+        self.cancel_button = ttk.Button(top_row, text="Cancel", width=8, command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="right")
+
+        self.count_label = ttk.Label(frame, text="Idle")
+        self.count_label.pack(fill="x", padx=6)
+        self.rate_label = ttk.Label(frame, text="")
+        self.rate_label.pack(fill="x", padx=6)
+
+        lists_row = ttk.Frame(frame)
+        lists_row.pack(fill="both", expand=True, padx=6, pady=(2, 4))
+        self.worker_list = self._make_list(lists_row, "Workers")
+        self.slowest_list = self._make_list(lists_row, "Slowest files")
+
+    def _make_list(self, parent, text):
+        box = ttk.LabelFrame(parent, text=text)
+        box.pack(side="left", fill="both", expand=True, padx=(0, 4))
+        listbox = tk.Listbox(box, height=4, font=("Consolas", 9), activestyle="none")
+        listbox.pack(fill="both", expand=True, padx=2, pady=2)
+        return listbox
+
+    def attach(self, runner, on_event=None):
+        """
+        Follow runner's events. on_event(event) is called on the Tk thread for
+        every event after the statistics have been updated.
+        """
+        self.runner = runner
+        self.on_event = on_event
+        self.stats = BatchStats()
+        self.cancel_button.configure(state="normal")
+        if not self._polling:
+            self._polling = True
+            self.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.count_label.config(text="Cancelling after the running files...")
+
+    def _poll(self):
+        finished = False
+        while True:
+            try:
+                event = self.runner.events.get_nowait()
+            except queue.Empty:
+                break
+            self.stats.update(event)
+            if self.on_event:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    self.logger.error(f"Batch event handler failed: {e}") if self.logger else None
+            finished = finished or event.kind == "end"
+        if not self.winfo_exists():
+            return
+        self.render()
+        if finished:
+            self._polling = False
+            self.cancel_button.configure(state="disabled")
+        else:
+            self.after(self.poll_ms, self._poll)
+
+    def render(self):
+        s = self.stats
+        self.progress_bar.configure(maximum=max(s.total, 1), value=s.processed)
+        state = "Finished" if s.ended_at is not None else "Running"
+        self.count_label.config(
+            text=f"{state}: {s.completed} completed, {s.failed} failed, {s.total} total"
+        )
+        self.rate_label.config(
+            text=f"{s.files_per_sec:.2f} files/s   {s.mb_per_sec:.2f} MB/s   "
+                 f"elapsed {format_duration(s.elapsed)}   ETA {format_duration(s.eta)}"
+                 + (f"   RAM {s.memory_in_use / 2 ** 20:.0f}/{s.memory_budget / 2 ** 20:.0f} MB" if s.memory_budget else "")
+        )
+        now = time.monotonic()
+        self.worker_list.delete(0, "end")
+        for worker, (path, started) in sorted(s.active.items()):
+            self.worker_list.insert("end", f"{worker.rsplit('_', 1)[-1]:>2} {now - started:6.1f}s {os.path.basename(path)}")
+        self.slowest_list.delete(0, "end")
+        for elapsed, path in s.slowest():
+            self.slowest_list.insert("end", f"{elapsed:7.2f}s {os.path.basename(path)}")
@@ -0,0 +1,166 @@
+import tkinter as tk
+from tkinter import ttk
+from PIL import ImageTk
+import os
+
+from src.frames.base_frame import BaseFrame
+import src.utils.vector as vec
+from src.utils.tiles import TILE_SIZE, get_tile_cache, tile_key, visible_tiles, render_tiles
+from src.utils.scheduler import get_scheduler, INTERACTIVE
+
+
+class ZoomFrame(BaseFrame):
+    """
+    Zoomable, pannable view of one PDF page or SVG. Only the tiles inside the
+    canvas are rendered, at the current zoom, so deep zoom stays cheap.
+    Wheel zooms at the cursor, dragging pans, double-click fits the page.
+    """
+
+    zoom_step = 1.25
+    # Pixels per page unit (point for PDF), about 2300 dpi
+    max_zoom = 32.0
+
+    def __init__(self, parent, path, page=0, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.path = path
+        self.page = page
+        self.page_size = vec.get_page_size(path, page)
+        self.zoom = None
+        self.fit_zoom = None
+        # Canvas position of the page's top-left corner
+        self.origin = [0.0, 0.0]
+        self._photos = {}
+        self._drag = None
+        self._refresh_id = None
+        self.build_contents()
+
+    def build_contents(self):
+        self.canvas = tk.Canvas(self, bg="#808080", highlightthickness=0)
+        self.status_label = ttk.Label(self, anchor="w")
+        self.status_label.pack(side="bottom", fill="x", padx=6, pady=(0, 2))
+        self.canvas.pack(side="top", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", self._on_wheel)
+        self.canvas.bind("<Button-5>", self._on_wheel)
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.fit())
+
+    @property
+    def job_key(self):
+        """Scheduler key of the tile jobs; a new view supersedes the last."""
+        return f"zoom-{id(self)}"
+
+    def _on_configure(self, event):
+        if self.zoom is None:
+            self.fit()
+        else:
+            self.schedule_refresh()
+
+    def fit(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        self.fit_zoom = min(width / self.page_size[0], height / self.page_size[1])
+        self.zoom = self.fit_zoom
+        self.origin = [
+            (width - self.page_size[0] * self.zoom) / 2,
+            (height - self.page_size[1] * self.zoom) / 2,
+        ]
+        self.refresh()
+
+    def zoom_at(self, factor, x, y):
+        """Zoom by factor, keeping the page point under canvas position (x, y) in place."""
+        zoom = min(max(self.zoom * factor, self.fit_zoom / 4), self.max_zoom)
+        factor = zoom / self.zoom
+        self.origin = [x - (x - self.origin[0]) * factor, y - (y - self.origin[1]) * factor]
+        self.zoom = zoom
+        self.refresh()
+
+    def _on_wheel(self, event):
+        if self.zoom is None:
+            return
+        zoom_in = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.zoom_at(self.zoom_step if zoom_in else 1 / self.zoom_step, event.x, event.y)
+
+    def _on_press(self, event):
+        self._drag = (event.x, event.y)
+
+    def _on_drag(self, event):
+        if self._drag is None:
+            return
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        self.origin[0] += dx
+        self.origin[1] += dy
+        # Move what is drawn now, render what came into view once the drag pauses
+        self.canvas.move("all", dx, dy)
+        self.schedule_refresh()
+
+    def schedule_refresh(self, delay_ms=60):
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+        self._refresh_id = self.after(delay_ms, self.refresh)
+
+    def refresh(self):
+        """Draw the cached tiles of the viewport and render the missing ones in the background."""
+        self._refresh_id = None
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        ox, oy = self.origin
+        page_w, page_h = self.page_size[0] * self.zoom, self.page_size[1] * self.zoom
+
+        self.canvas.delete("all")
+        self._photos = {}
+        self.canvas.create_rectangle(ox, oy, ox + page_w, oy + page_h, fill="white", outline="")
+        cache = get_tile_cache()
+        missing = []
+        for column, row in visible_tiles(self.page_size, self.zoom, (-ox, -oy, width - ox, height - oy)):
+            img = cache.get(tile_key(self.path, self.page, self.zoom, column, row))
+            if img is None:
+                missing.append((column, row))
+            else:
+                self._draw_tile(column, row, img)
+        if self.path.lower().endswith(".svg"):
+            # SVG units are not points, so there is no dpi to show
+            scale = f"{self.zoom:.2f} px/unit"
+        else:
+            scale = f"{self.zoom * 72:.0f} dpi"
+        self.status_label.config(
+            text=f"{os.path.basename(self.path)}  {scale}  ({self.zoom / self.fit_zoom:.0%})"
+        )
+        if missing:
+            scheduler = get_scheduler()
+            future = scheduler.submit(self._render_tiles, self.zoom, missing, priority=INTERACTIVE, key=self.job_key)
+            scheduler.watch(self, future, self._on_tiles_rendered, on_error=self._on_render_error, key=self.job_key)
+
+    def _draw_tile(self, column, row, img):
+        photo = ImageTk.PhotoImage(img)
+        self._photos[(column, row)] = photo
+        self.canvas.create_image(
+            self.origin[0] + column * TILE_SIZE, self.origin[1] + row * TILE_SIZE, image=photo, anchor="nw"
+        )
+
+    def _render_tiles(self, zoom, tiles):
+        # Worker thread: fill the cache only, the Tk thread draws from it
+        render_tiles(self.path, self.page, zoom, tiles, self.page_size)
+        return zoom
+
+    def _on_tiles_rendered(self, zoom):
+        if zoom == self.zoom:
+            self.refresh()
+
+    def _on_render_error(self, error):
+        self.status_label.config(text=f"Rendering failed: {error}")
+        self.logger.error(f"Zoom preview failed: {error}") if self.logger else None
+
+
+def open_zoom_window(parent, path, page=0):
+    """Open path in its own window with a ZoomFrame."""
+    window = tk.Toplevel(parent)
+    window.title(f"{os.path.basename(path)}" + (f" - page {page + 1}" if page else ""))
+    window.geometry("800x600")
+    frame = ZoomFrame(window, path, page=page)
+    frame.pack(fill="both", expand=True)
+    # Tiles left queued for a closed window are not needed any more
+    window.bind("<Destroy>", lambda e: get_scheduler().discard(frame.job_key) if e.widget is window else None)
+    return window
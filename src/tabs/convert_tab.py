@@ -1,15 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
 import os
-import shutil
 
 import src.utils.converter as cv
-from src.utils.commons import bitmap_formats, script_formats
+from src.utils.result_cache import ResultCache, cached_convert
+from src.utils.batch import BatchRunner
+from src.utils.memory import MB, default_budget, estimate_job_memory
+from src.utils.scheduler import BATCH, get_scheduler
+from src.utils.journal import BatchJournal
 
 from src.tabs.base_tab import BaseTab
 from src.frames.labeled_validated_entry import LabeledValidatedEntry
 from src.frames.input_output_frame import InputOutputFrame
 from src.frames.title_frame import TitleFrame
+from src.frames.check_frame import CheckFrame
+from src.frames.progress_frame import ProgressFrame
 
 
 class ConvertTab(BaseTab):
@@ -17,6 +22,10 @@ class ConvertTab(BaseTab):
     def __init__(self, parent, title=None, logger=None):
         super().__init__(parent, title=title, logger=logger)
         self._preview_imgtk = None
+        self._result_cache = None
+        self._batch_runner = None
+        # Attempts of a failing file across resumed runs of the same batch
+        self.max_retries = 2
         self.output_dir = os.path.join(self.output_dir, "convert_output")
         self.build_content()
         self.on_files_var_changed()
@@ -99,6 +108,17 @@ class ConvertTab(BaseTab):
         )
         self.dpi_labeled_entry.pack(side="left", padx=(4, 4), pady=(8, 8))
 
+        # Memory the parallel conversions may use together
+        self.memory_budget_var = tk.IntVar(value=default_budget() // MB)
+        self.memory_budget_labeled_entry = LabeledValidatedEntry(
+            sub_frame,
+            var=self.memory_budget_var,
+            bounds=(256, 1024 * 1024),
+            label_text="RAM (MB)",
+            width=7,
+        )
+        self.memory_budget_labeled_entry.pack(side="left", padx=(4, 4), pady=(8, 8))
+
         control_frame = ttk.LabelFrame(
             convert_row, text="Out Format", style="Bold.TLabelframe"
         )
@@ -113,10 +133,17 @@ class ConvertTab(BaseTab):
                 out_ext=self.out_fmt.get(),
                 quality=self.quality_var.get(),
                 dpi=self.dpi_var.get(),
+                incremental=self.incremental_check.var.get(),
             ),
             width=16
-        ).pack(padx=8, pady=(8, 12))
+        ).pack(padx=8, pady=(8, 4))
 
+        self.incremental_check = CheckFrame(control_frame, title="Skip unchanged")
+        self.incremental_check.var.set(True)
+        self.incremental_check.pack(padx=8, pady=(0, 4))
+
+        self.progress_frame = ProgressFrame(self, title="Progress")
+        self.progress_frame.pack(padx=4, pady=(2, 4), fill="both", expand=True)
 
     def batch_convert(self, file_list, out_dir, out_ext, **kwargs):
         """
@@ -133,98 +160,71 @@ class ConvertTab(BaseTab):
         if not file_list or (len(file_list) == 1 and file_list[0].strip() == ""):
             self.logger.error("No input files selected")
             return
+        if self._batch_runner is not None and self._batch_runner.running:
+            self.logger.warning("A conversion batch is still running.")
+            return
         self.preview_frame.clear_file_queue()
         out_ext = out_ext.lower()
-        for f in file_list:
-            base = os.path.splitext(os.path.basename(f))[0]
-            in_ext = os.path.splitext(f)[1].lower()
-
-            # Bitmap -> Bitmap
-            if in_ext in bitmap_formats and out_ext in bitmap_formats:
-                out_path = cv.raster_convert(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    quality=kwargs.get('quality', 95),
-                    logger=self.logger,
-                )
-            # Bitmap -> Script (pdf/eps/ps)
-            elif in_ext in bitmap_formats and out_ext in script_formats:
-                out_path = cv.raster2script(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    dpi=kwargs.get('dpi', 300),
-                    logger=self.logger,
-                )
-            # Bitmap -> SVG
-            elif in_ext in bitmap_formats and out_ext == ".svg":
-                out_path = cv.raster2svg(
-                    in_path=f,
-                    out_dir=out_dir,
-                    logger=self.logger,
-                )
-            # Script (pdf/eps/ps) -> Bitmap
-            elif in_ext in script_formats and out_ext in bitmap_formats:
-                out_path = cv.script2raster(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    dpi=kwargs.get('dpi', 300),
-                    logger=self.logger,
-                )
-            # Script (pdf/eps/ps) -> Script (pdf/eps/ps)
-            elif in_ext == ".pdf" and out_ext in [".eps", ".ps"]:
-                out_path = cv.pdf2script(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    logger=self.logger,
-                )
-            elif in_ext in script_formats and out_ext in script_formats:
-
-                if in_ext == out_ext:
-                    out_path = os.path.join(out_dir, base + "_copied" + out_ext)
-                    shutil.copy2(f, out_path)
-                    self.logger.info(f"Copied {f} to {out_path}")
-                else:
-                    out_path = cv.script_convert(
-                        in_path=f,
-                        out_dir=out_dir,
-                        out_fmt=out_ext,
-                        logger=self.logger,
-                    )
-            # Script (pdf/eps/ps) -> SVG
-            elif in_ext in script_formats and out_ext == ".svg":
-                out_path = cv.script2svg(
-                    in_path=f,
-                    out_dir=out_dir,
-                    logger=self.logger,
-                )
-            # SVG -> Bitmap
-            elif in_ext == ".svg" and out_ext in bitmap_formats:
-                out_path = cv.svg2raster(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    dpi=kwargs.get('dpi', 300),
-                    logger=self.logger,
+        incremental = kwargs.pop("incremental", False)
+        cache = self.get_result_cache() if incremental else None
+        # A batch that was interrupted (crash, cancel) continues where it stopped;
+        # with "Skip unchanged" off everything is converted again, like --restart
+        journal = BatchJournal.for_batch(file_list, out_dir, dict(out_ext=out_ext, **kwargs))
+        file_list, done, given_up = journal.start(file_list, restart=not incremental, max_retries=self.max_retries)
+        if done or given_up:
+            self.logger.info(
+                f"Resuming interrupted batch: {len(done)} already done, "
+                f"{len(given_up)} given up after repeated failures, {len(file_list)} to convert."
+            )
+
+        def convert_one(f):
+            if cache is not None:
+                return cached_convert(cache, f, out_dir, out_ext, logger=self.logger, **kwargs)
+            return cv.convert_file(f, out_dir, out_ext, logger=self.logger, **kwargs)
+
+        # Files are converted by background workers; results come back as events.
+        # Large files are held back until their estimated memory fits the budget.
+        dpi = kwargs.get("dpi", 300)
+        self._batch_runner = BatchRunner(
+            convert_one,
+            memory_budget=self.memory_budget_var.get() * MB,
+            estimate=lambda f: estimate_job_memory(f, out_ext, dpi),
+            # Shared with previews, which take priority over queued conversions
+            scheduler=get_scheduler(),
+            journal=journal,
+        )
+        self.progress_frame.attach(self._batch_runner, on_event=lambda e: self.on_batch_event(e, cache, journal))
+        self._batch_runner.start(file_list)
+
+    def on_batch_event(self, event, cache=None, journal=None):
+        """Called on the Tk thread for every event of the running batch."""
+        if event.kind == "done" and os.path.exists(event.result):
+            self.preview_frame.add_file_to_queue(event.result)
+        elif event.kind == "failed" and event.error:
+            self.logger.error(f"Conversion of {os.path.basename(event.path)} failed: {event.error}")
+        elif event.kind == "end":
+            if cache is not None:
+                # Pruning stats every indexed input; only its result comes back to the Tk thread
+                scheduler = get_scheduler()
+                scheduler.watch(
+                    self,
+                    scheduler.submit(cache.prune, priority=BATCH),
+                    lambda dropped: self.logger.info(f"Result cache: dropped {dropped} old results.") if dropped else None,
+                    on_error=lambda e: self.logger.error(f"Pruning the result cache failed: {e}"),
                 )
-            # SVG -> Script (pdf/eps/ps)
-            elif in_ext == ".svg" and out_ext in script_formats:
-                out_path = cv.svg2script(
-                    in_path=f,
-                    out_dir=out_dir,
-                    out_fmt=out_ext,
-                    dpi=kwargs.get('dpi', 300),
-                    logger=self.logger,
-                )               
-            else:
-                self.logger.info(f"Unsupported conversion: {in_ext} -> {out_ext}")
-                continue
-            if out_path and os.path.exists(out_path):
-                self.preview_frame.add_file_to_queue(out_path)
-        self.logger.info("[Task Completed]")
+            if journal is not None:
+                journal.close()
+                self.logger.info(journal.format_summary())
+            self.logger.info("[Task Completed]" if event.result == "finished" else "[Task Cancelled]")
+
+    def get_result_cache(self):
+        """Open the conversion result cache on first use; None if it is unavailable."""
+        if self._result_cache is None:
+            try:
+                self._result_cache = ResultCache()
+            except Exception as e:
+                self.logger.error(f"Result cache unavailable, converting everything: {e}")
+        return self._result_cache
 
     def on_files_var_changed(self, *args):
         if self.out_fmt.get().lower() in (".jpg", ".jpeg"):
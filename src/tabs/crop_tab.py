@@ -6,11 +6,13 @@ from src.tabs.base_tab import BaseTab
 from src.frames.labeled_validated_entry import LabeledValidatedEntry
 from src.frames.input_output_frame import InputOutputFrame
 from src.frames.title_frame import TitleFrame
+from src.frames.crop_frame import open_crop_window
 from src.utils.commons import bitmap_formats, script_formats
 
 import src.utils.vector as vec
 import src.utils.raster as rst
 import src.utils.cropper as cr
+from src.utils.scheduler import INTERACTIVE, SAVE
 
 
 class CropTab(BaseTab):
@@ -21,6 +23,9 @@ class CropTab(BaseTab):
         self._preview_imgtk = None
         self.output_dir = os.path.join(self.output_dir, "crop_output")
         self.mode_var = tk.IntVar(value=1)
+        # Size of the current input in crop units, for the interactive crop
+        self._source_size = None
+        self._crop_window = None
         self.build_content()
 
     def build_content(self):
@@ -106,6 +111,12 @@ class CropTab(BaseTab):
             command=lambda: self.on_crop(save_flag=False)
         ).pack(side="left", padx=(2, 8))
 
+        ttk.Button(
+            cord_row,
+            text="Interactive",
+            command=self.on_interactive_crop
+        ).pack(side="left", padx=(2, 8))
+
         ttk.Button(
             cord_row,
             text="Save",
@@ -130,45 +141,55 @@ class CropTab(BaseTab):
         # Choose different crop methods based on file type
         in_path = file_list[0]
         ext = os.path.splitext(in_path)[1].lower()
+        # Previews run ahead of saves and batch work on the shared scheduler
+        priority = SAVE if save_flag else INTERACTIVE
         self.preview_frame.clear_preview()
         params = {
             "dpi": self.preview_frame.dpi
         }
         if ext in bitmap_formats:
-            cr.crop_image(
-                in_path, 
+            self.preview_frame.request_preview(
+                cr.crop_image,
+                in_path,
                 self.io_frame.out_dir_var.get(),
                 crop_box=crop_box,
                 save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
-                logger=self.logger
+                priority=priority,
+                logger=self.logger,
+                cache=True
             )
         elif ext == '.svg':
-            cr.crop_svg(
-                in_path, 
+            self.preview_frame.request_preview(
+                cr.crop_svg,
+                in_path,
                 self.io_frame.out_dir_var.get(),
                 crop_box=crop_box,
                 save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                priority=priority,
+                preview_box=self.preview_frame.preview_box(),
                 logger=self.logger
             )
         elif ext == '.pdf':
-            cr.crop_pdf(
-                in_path, 
+            self.preview_frame.request_preview(
+                cr.crop_pdf,
+                in_path,
                 self.io_frame.out_dir_var.get(),
                 crop_box=crop_box,
                 save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                priority=priority,
+                preview_box=self.preview_frame.preview_box(),
                 logger=self.logger,
                 kwargs=params
             )
         elif ext in ['.eps', '.ps']:
-            cr.crop_script(
-                in_path, 
+            self.preview_frame.request_preview(
+                cr.crop_script,
+                in_path,
                 self.io_frame.out_dir_var.get(),
                 crop_box=crop_box,
                 save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                priority=priority,
+                preview_box=self.preview_frame.preview_box(),
                 logger=self.logger,
                 kwargs=params
             )
@@ -177,6 +198,24 @@ class CropTab(BaseTab):
         return
 
 
+    def on_interactive_crop(self):
+        """Drag the crop box on a preview of the input; the entries follow the box."""
+        file_list = self.io_frame.load_file_list()
+        if not file_list or not self._source_size or not all(self._source_size):
+            return
+        if self._crop_window is not None and self._crop_window.winfo_exists():
+            self._crop_window.destroy()
+        in_path = file_list[0]
+        ext = os.path.splitext(in_path)[1].lower()
+        self._crop_window = open_crop_window(
+            self,
+            in_path,
+            (self.crop_x_var, self.crop_y_var, self.crop_w_var, self.crop_h_var),
+            self._source_size,
+            # crop_script takes the box in EPS coordinates, y upwards
+            flip_y=ext in ['.eps', '.ps'],
+        )
+
     def on_files_var_changed(self, *args):
         self.preview_frame.clear_preview()
         file = self.io_frame.files_var.get().strip().split("\n")[0]
@@ -192,6 +231,9 @@ class CropTab(BaseTab):
             else:
                 sz, unit = rst.get_raster_size(file)
                 
+            self._source_size = sz
+            if self._crop_window is not None and self._crop_window.winfo_exists():
+                self._crop_window.destroy()
             self.crop_x_var.set(value=0)
             self.crop_y_var.set(value=0)
             self.crop_w_var.set(value=int(sz[0]))
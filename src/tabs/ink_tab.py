@@ -72,6 +72,7 @@ class InkTab(BaseTab):
                 preview_callback=self.preview_frame.show_image,
                 save_image=False,
                 logger=self.logger,
+                cache=True,
             ),
             width=12
         ).pack(side="left", padx=(18, 4), pady=8)
@@ -86,6 +87,7 @@ class InkTab(BaseTab):
                 preview_callback=self.preview_frame.show_image,
                 save_image=True,
                 logger=self.logger,
+                cache=True,
             ),
             width=12
         ).pack(side="left", padx=(4, 12), pady=8)
@@ -11,6 +11,7 @@ from src.utils.commons import bitmap_formats, vector_formats, script_formats
 import src.utils.vector as vec
 import src.utils.raster as rst
 import src.utils.transformer as sc
+from src.utils.scheduler import get_scheduler, INTERACTIVE, SAVE
 
 class TransformTab(BaseTab):
 
@@ -20,9 +21,18 @@ class TransformTab(BaseTab):
         self._preview_imgtk = None
         self.output_dir = os.path.join(self.output_dir, "transform_output")
         self.mode_var = tk.IntVar(value=1)
-        #self.mode_var.trace_add("write", lambda *args: self.on_transform())
+        # Preview-sized rendering of the input, transformed live: (path, mtime, box, rendered)
+        self._proxy = None
+        self._live_id = None
+        self.live_delay_ms = 150
         self.build_content()
         self.update_mode()
+        for var in (
+            self.mode_var, self.scale_x_factor_var, self.scale_y_factor_var, self.width_var, self.height_var,
+            self.sharpness_var, self.blur_radius_var, self.median_size_var, self.rotate_angle_var,
+            self.flip_horizontal_check.var, self.flip_vertical_check.var,
+        ):
+            var.trace_add("write", lambda *args: self.schedule_live_preview())
 
     def build_content(self):
 
@@ -80,7 +90,6 @@ class TransformTab(BaseTab):
         ).pack(side="left", padx=(6, 8))
         
         self.scale_x_factor_var = tk.DoubleVar(value=1.0)
-        #self.scale_x_factor_var.trace_add("write", lambda *args: self.on_transform())
         self.scale_x_factor_labeled_entry = LabeledValidatedEntry(
             frm_2,
             var=self.scale_x_factor_var,
@@ -91,7 +100,6 @@ class TransformTab(BaseTab):
         self.scale_x_factor_labeled_entry.pack(side="left", padx=(4, 4))
 
         self.scale_y_factor_var = tk.DoubleVar(value=1.0)
-        #self.scale_y_factor_var.trace_add("write", lambda *args: self.on_transform())
         self.scale_y_factor_labeled_entry = LabeledValidatedEntry(
             frm_2,
             var=self.scale_y_factor_var,
@@ -126,7 +134,6 @@ class TransformTab(BaseTab):
             width=6,
         )
         self.width_entry.pack(side="left", padx=(6, 2))
-        #self.width_entry.var.trace_add("write", lambda *args: self.on_transform())
 
         self.height_var = tk.IntVar(value=1024)
         self.height_entry = LabeledValidatedEntry(
@@ -137,7 +144,6 @@ class TransformTab(BaseTab):
             width=6,
         )
         self.height_entry.pack(side="left", padx=(2, 2))
-        #self.height_var.trace_add("write", lambda *args: self.on_transform())
         # Row 2: Settings
 
         parameter_row = ttk.Frame(self)
@@ -182,11 +188,9 @@ class TransformTab(BaseTab):
 
         self.flip_horizontal_check = CheckFrame(flip_frame, title='Left-Right')
         self.flip_horizontal_check.pack(side="top", fill="x", padx=6, pady=(12,2))
-        #self.flip_horizontal_check.var.trace_add("write", lambda *args: self.on_transform())
 
         self.flip_vertical_check = CheckFrame(flip_frame, title='Top-Bottom')
         self.flip_vertical_check.pack(side="top", anchor="w", padx=6, pady=(0,2))
-        #self.flip_vertical_check.var.trace_add("write", lambda *args: self.on_transform())
 
         rotate_frame = ttk.LabelFrame(parameter_row, text="Rotate", style="Bold.TLabelframe")
         rotate_frame.pack(side="left", padx=8, pady=0, fill="both",expand=True)
@@ -203,7 +207,6 @@ class TransformTab(BaseTab):
             width=6
         )
         self.rotate_angle_combo.pack(side="top", anchor="w", padx=6, pady=(0,8))
-        #self.rotate_angle_var.trace_add("write", lambda *args: self.on_transform())
 
         control_frame = ttk.LabelFrame(parameter_row, text="Control", style="Bold.TLabelframe")
         control_frame.pack(side="left", padx=8, pady=0, fill="both",expand=True)
@@ -243,13 +246,7 @@ class TransformTab(BaseTab):
             self.height_entry.deactivate()
 
 
-    def on_transform(self, save_flag=False):
-
-        file_list = self.io_frame.load_file_list()
-        if not file_list:
-            # 这里可以弹窗、日志或直接 return
-            return
-        
+    def collect_params(self, save_flag=False):
         params = {
             "sharpness": self.sharpness_var.get(),
             "blur_radius": self.blur_radius_var.get(),
@@ -291,44 +288,63 @@ class TransformTab(BaseTab):
             params.update({
                 "flip_tb": False,
             })
+        return params
+
+    def on_transform(self, save_flag=False):
+
+        file_list = self.io_frame.load_file_list()
+        if not file_list:
+            # 这里可以弹窗、日志或直接 return
+            return
+        if not save_flag:
+            # Previews use the live proxy; only saving transforms the full-resolution input
+            self.live_preview()
+            return
+
+        params = self.collect_params(True)
 
         # 根据文件类型选择不同的resize方法
         in_path = file_list[0]
         ext = os.path.splitext(in_path)[1].lower()
         self.preview_frame.clear_preview()
         if ext in bitmap_formats:
-            sc.transform_image(
-                in_path, 
+            self.preview_frame.request_preview(
+                sc.transform_image,
+                in_path,
                 self.io_frame.out_dir_var.get(),
-                save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
-                logger=self.logger, 
+                save_image=True,
+                priority=SAVE,
+                logger=self.logger,
+                cache=True,
                 **params)
         elif ext == '.svg':
-            params.update({"dpi": self.preview_frame.dpi})
-            sc.transform_svg(
-                in_path, 
+            params.update({"dpi": self.preview_frame.dpi, "preview_box": self.preview_frame.preview_box()})
+            self.preview_frame.request_preview(
+                sc.transform_svg,
+                in_path,
                 self.io_frame.out_dir_var.get(),
-                save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                save_image=True,
+                priority=SAVE,
                 logger=self.logger, 
                 **params)
         elif ext == '.pdf':
-            params.update({"dpi": self.preview_frame.dpi})
-            sc.transform_pdf(
-                in_path, 
+            params.update({"dpi": self.preview_frame.dpi, "preview_box": self.preview_frame.preview_box()})
+            self.preview_frame.request_preview(
+                sc.transform_pdf,
+                in_path,
                 self.io_frame.out_dir_var.get(),
-                save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                save_image=True,
+                priority=SAVE,
                 logger=self.logger, 
                 **params)
         elif ext in ['.eps', '.ps']:
-            params.update({"dpi": self.preview_frame.dpi})
-            sc.transform_script(
-                in_path, 
+            params.update({"dpi": self.preview_frame.dpi, "preview_box": self.preview_frame.preview_box()})
+            self.preview_frame.request_preview(
+                sc.transform_script,
+                in_path,
                 self.io_frame.out_dir_var.get(),
-                save_image=save_flag,
-                preview_callback=self.preview_frame.show_image, 
+                save_image=True,
+                priority=SAVE,
                 logger=self.logger, 
                 **params)
         else:
@@ -336,8 +352,49 @@ class TransformTab(BaseTab):
         return
 
 
+    def schedule_live_preview(self):
+        """Debounce parameter edits: preview once they pause for live_delay_ms."""
+        if self._live_id is not None:
+            self.after_cancel(self._live_id)
+        self._live_id = self.after(self.live_delay_ms, self.live_preview)
+
+    def live_preview(self):
+        """Transform the cached preview-sized proxy of the input and show it."""
+        self._live_id = None
+        files = self.io_frame.files_var.get().strip().split("\n")
+        in_path = files[0] if files else ""
+        if not in_path or not os.path.isfile(in_path):
+            return
+        try:
+            params = self.collect_params()
+        except (tk.TclError, ValueError):
+            # An entry is being edited and does not hold a number yet
+            return
+        box = self.preview_frame.preview_box()
+        scheduler = get_scheduler()
+        key = self.preview_frame.job_key
+        future = scheduler.submit(self._render_live, in_path, box, params, priority=INTERACTIVE, key=key)
+        scheduler.watch(
+            self.preview_frame, future, lambda shown: self.preview_frame.show_image(*shown),
+            on_error=lambda e: self.logger.error(f"Preview failed: {e}") if self.logger else None, key=key,
+        )
+
+    def _render_live(self, in_path, box, params):
+        # Worker thread: render the proxy once per input and preview size, then transform it
+        mtime = os.stat(in_path).st_mtime_ns
+        proxy = self._proxy
+        if proxy is None or proxy[:3] != (in_path, mtime, box):
+            rendered = self.preview_frame.render_file(in_path, box=box)
+            if rendered is None or len(rendered) < 3:
+                raise RuntimeError("No preview available for this file")
+            proxy = self._proxy = (in_path, mtime, box, rendered)
+        img, unit, source_size = proxy[3]
+        img, out_size = sc.preview_transform(img, source_size, box, **params)
+        return img, unit, out_size
+
     def on_files_var_changed(self, *args):
         self.preview_frame.clear_preview()
+        self._proxy = None
         file = self.io_frame.files_var.get().strip().split("\n")[0]
         if file and os.path.isfile(file):
             ext = os.path.splitext(file)[1].lower()
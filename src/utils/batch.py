@@ -0,0 +1,295 @@
+"""Batch engine.
+
+BatchRunner applies a per-file function on a thread pool and reports progress
+as BatchEvents on a queue, so that a GUI can poll it from the Tk thread (or a
+headless caller can consume it directly). BatchStats folds the event stream
+into counters, rates, ETA and per-worker activity.
+
+With a memory budget, a job is started only when its estimated peak memory fits
+next to the jobs already running. Jobs larger than the whole budget run alone;
+smaller jobs further down the list may overtake a waiting large one, a bounded
+number of times, so that it is not starved. Estimates are taken only for the
+next few jobs in line, so a large batch starts right away.
+
+Given a JobScheduler, the runner submits its jobs there at batch priority
+instead of using a pool of its own, so previews and saves are not queued
+behind the batch.
+
+Given a BatchJournal, the outcome of every file is appended to it as soon as
+the file is done, so an interrupted batch can be resumed (see journal.py).
+"""
+
+import os
+import time
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional, Callable, Iterable, List, Tuple
+
+from src.utils.scheduler import BATCH
+from src.utils.tools import take_error
+from src.utils.journal import input_signature
+
+# kind: "begin" | "start" | "done" | "failed" | "end"
+# "begin" carries the number of files in result, the total bytes in size and
+# the memory budget in memory; other events carry the job's memory estimate.
+BatchEvent = namedtuple("BatchEvent", "kind path worker size elapsed result error time memory")
+
+
+def _event(kind, path=None, worker=None, size=0, elapsed=0.0, result=None, error=None, memory=0):
+    return BatchEvent(kind, path, worker, size, elapsed, result, error, time.monotonic(), memory)
+
+
+class BatchRunner:
+    """Run func(path) for every path on a worker pool, posting BatchEvents to self.events."""
+
+    def __init__(
+        self,
+        func: Callable[[str], object],
+        workers: Optional[int] = None,
+        events: Optional[queue.Queue] = None,
+        memory_budget: Optional[int] = None,
+        estimate: Optional[Callable[[str], int]] = None,
+        scheduler=None,
+        journal=None,
+    ):
+        """
+        memory_budget: bytes that running jobs may use together, None for no limit.
+        estimate(path): peak memory of one job in bytes, see src.utils.memory.
+        scheduler: a src.utils.scheduler.JobScheduler to run the jobs on.
+        journal: a src.utils.journal.BatchJournal to record outcomes in.
+        """
+        self.func = func
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.events = events if events is not None else queue.Queue()
+        self.memory_budget = memory_budget
+        self.estimate = estimate
+        self.scheduler = scheduler
+        self.journal = journal
+        # How often smaller jobs may start ahead of a job waiting for memory
+        self.max_overtakes = 2 * self.workers
+        # How many jobs in line are estimated and may start ahead of a waiting one
+        self.lookahead = 4 * self.workers
+        self._cancel = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def cancel(self):
+        """Stop after the files that are currently being processed."""
+        self._cancel.set()
+
+    def start(self, paths: Iterable[str]) -> threading.Thread:
+        """Process paths in a background thread; returns immediately."""
+        paths = list(paths)
+        self._thread = threading.Thread(target=self.run, args=(paths,), name="BatchRunner", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _estimate(self, path: str) -> int:
+        if self.estimate is None:
+            return 0
+        try:
+            memory = self.estimate(path)
+        except Exception:
+            return 0
+        # A job above the budget is admitted once nothing else runs
+        return min(memory, self.memory_budget) if self.memory_budget else memory
+
+    def run(self, paths: Iterable[str]):
+        """Process paths and block until all are done or the batch is cancelled."""
+        paths = list(paths)
+        sizes = {}
+        for path in paths:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        # path -> estimate, filled in as jobs come near the front of the line
+        memory = {}
+        self._cancel.clear()
+        self.events.put(_event("begin", result=len(paths), size=sum(sizes.values()), memory=self.memory_budget or 0))
+        if self.journal is not None:
+            self.journal.begin(len(paths))
+
+        cond = threading.Condition()
+        state = {"running": 0, "in_use": 0, "overtakes": 0}
+
+        def process(path):
+            worker = threading.current_thread().name
+            self.events.put(_event("start", path, worker, sizes[path], memory=memory[path]))
+            # Taken before converting, so an edit during the conversion is not recorded as done
+            signature = input_signature(path) if self.journal is not None else None
+            start = time.monotonic()
+            # Drop a tool failure left over from an earlier file on this thread
+            take_error()
+            try:
+                result = self.func(path)
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                self._record(path, "failed", elapsed, error=str(e), signature=signature)
+                self.events.put(_event("failed", path, worker, sizes[path], elapsed, error=str(e), memory=memory[path]))
+                return
+            finally:
+                with cond:
+                    state["running"] -= 1
+                    state["in_use"] -= memory[path]
+                    cond.notify_all()
+            kind = "done" if result else "failed"
+            elapsed = time.monotonic() - start
+            # Converters log tool failures and return None; report why the tool failed
+            tool_error = None if result else take_error()
+            error = str(tool_error) if tool_error else None
+            self._record(
+                path, kind, elapsed,
+                output=result if isinstance(result, str) else None,
+                error=error if result else error or "no output produced",
+                signature=signature,
+            )
+            self.events.put(_event(kind, path, worker, sizes[path], elapsed, result=result, error=error, memory=memory[path]))
+
+        def fits(path):
+            return not self.memory_budget or state["in_use"] + memory[path] <= self.memory_budget
+
+        def admit(pending):
+            """Next job to start, or None if it has to wait for a worker or memory."""
+            if state["running"] >= self.workers:
+                return None
+            if fits(pending[0]):
+                state["overtakes"] = 0
+                return pending[0]
+            if state["overtakes"] < self.max_overtakes:
+                for path in pending[1:self.lookahead]:
+                    if fits(path):
+                        state["overtakes"] += 1
+                        return path
+            return None
+
+        pending = list(paths)
+        futures = []
+        pool = None
+        if self.scheduler is None:
+            pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BatchWorker")
+        try:
+            while pending and not self._cancel.is_set():
+                # Estimated outside the lock: reading headers must not hold up finishing jobs
+                for path in pending[:self.lookahead]:
+                    if path not in memory:
+                        memory[path] = self._estimate(path)
+                with cond:
+                    path = admit(pending)
+                    while path is None and not self._cancel.is_set():
+                        cond.wait(0.5)
+                        path = admit(pending)
+                    if path is None:
+                        break
+                    pending.remove(path)
+                    state["running"] += 1
+                    state["in_use"] += memory[path]
+                if pool is not None:
+                    futures.append(pool.submit(process, path))
+                else:
+                    futures.append(self.scheduler.submit(process, path, priority=BATCH))
+            wait(futures)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            result = "cancelled" if self._cancel.is_set() else "finished"
+            if self.journal is not None:
+                self.journal.end(result)
+            self.events.put(_event("end", result=result))
+
+    def _record(self, path, status, elapsed, output=None, error=None, signature=None):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(path, status, output=output, duration=elapsed, error=error, signature=signature)
+        except OSError:
+            # A full disk must not fail the conversion itself
+            pass
+
+
+class BatchStats:
+    """Running totals of a batch, updated with update(event)."""
+
+    def __init__(self):
+        self.total = 0
+        self.total_bytes = 0
+        self.completed = 0
+        self.failed = 0
+        self.done_bytes = 0
+        self.started_at = None
+        self.ended_at = None
+        self.memory_budget = 0
+        self.memory_in_use = 0
+        # worker name -> (path, start time)
+        self.active = {}
+        # (elapsed, path) of finished files
+        self._durations: List[Tuple[float, str]] = []
+
+    def update(self, event: BatchEvent):
+        if event.kind == "begin":
+            self.__init__()
+            self.total = event.result
+            self.total_bytes = event.size
+            self.memory_budget = event.memory
+            self.started_at = event.time
+        elif event.kind == "start":
+            self.active[event.worker] = (event.path, event.time)
+            self.memory_in_use += event.memory
+        elif event.kind in ("done", "failed"):
+            self.active.pop(event.worker, None)
+            self.memory_in_use -= event.memory
+            if event.kind == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.done_bytes += event.size
+            self._durations.append((event.elapsed, event.path))
+        elif event.kind == "end":
+            self.ended_at = event.time
+            self.active.clear()
+            self.memory_in_use = 0
+
+    @property
+    def processed(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.monotonic()) - self.started_at
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.done_bytes / 2 ** 20 / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left, from the byte rate when sizes are known, else the file rate."""
+        if self.ended_at is not None:
+            return 0.0
+        if self.processed == 0:
+            return None
+        if self.total_bytes and self.done_bytes:
+            return (self.total_bytes - self.done_bytes) / (self.done_bytes / self.elapsed)
+        return (self.total - self.processed) / self.files_per_sec if self.files_per_sec else None
+
+    def slowest(self, n: int = 5) -> List[Tuple[float, str]]:
+        return sorted(self._durations, reverse=True)[:n]
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
@@ -5,6 +5,9 @@ import subprocess
 import shutil
 import json
 import importlib
+import importlib.metadata
+import threading
+from functools import lru_cache
 
 heif_formats = [".heic", ".heif"]
 bitmap_formats = [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]
@@ -12,6 +15,64 @@ vector_formats = [".svg", ".pdf", ".eps", ".ps"]
 script_formats = [".ps", ".eps", ".pdf"]
 
 
+_interaction = threading.local()
+_interactive_default = True
+
+
+def set_interactive(flag: bool, thread_only: bool = False):
+    """
+    Enable or disable confirmation dialogs. When disabled (headless or batch
+    workers), the confirm_* helpers answer with their non-blocking default:
+    create missing directories, overwrite, and continue on multi-page input.
+    """
+    global _interactive_default
+    if thread_only:
+        _interaction.enabled = flag
+    else:
+        _interactive_default = flag
+
+
+def is_interactive() -> bool:
+    return getattr(_interaction, "enabled", _interactive_default)
+
+
+_ui_dispatcher = None
+
+
+def set_ui_dispatcher(dispatcher):
+    """
+    dispatcher(func) must run func on the Tk thread and return its result.
+    Dialogs requested from worker threads are routed through it.
+    """
+    global _ui_dispatcher
+    _ui_dispatcher = dispatcher
+
+
+def call_in_ui(func, *args, **kwargs):
+    """Call func (e.g. a messagebox function) on the Tk thread and return its result."""
+    if _ui_dispatcher is not None and threading.current_thread() is not threading.main_thread():
+        return _ui_dispatcher(lambda: func(*args, **kwargs))
+    return func(*args, **kwargs)
+
+
+def get_cache_dir(*sub_dirs: str) -> str:
+    """
+    Per-user directory for ImBridge's persistent indexes and caches.
+    Can be overridden with the IMBRIDGE_CACHE_DIR environment variable.
+    """
+    base = os.environ.get("IMBRIDGE_CACHE_DIR")
+    if not base:
+        if os.name == "nt":
+            root = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+            base = os.path.join(root, "ImBridge", "cache")
+        else:
+            root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            base = os.path.join(root, "imbridge")
+    path = os.path.join(base, *sub_dirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 def confirm_cropbox(cropbox: tuple[float, float, float, float], canvas_size: tuple[int, int]) -> bool:
     """
     Confirm that the cropbox is within the canvas size.
@@ -26,7 +87,8 @@ def confirm_cropbox(cropbox: tuple[float, float, float, float], canvas_size: tup
             f"The specified crop box {cropbox} is out of bounds for the canvas size {canvas_size}.\n"
             "Please adjust the crop box to fit within the image dimensions."
         )
-        messagebox.showwarning("Invalid Crop Box", msg)
+        if is_interactive():
+            call_in_ui(messagebox.showwarning, "Invalid Crop Box", msg)
 
         return False
     return True
@@ -41,27 +103,32 @@ def confirm_single_page(in_path: str) -> bool:
     import tkinter as tk
     from tkinter import messagebox
     ext = os.path.splitext(in_path)[1].lower()
+    if not is_interactive():
+        return True
+
+    def ask(title, msg):
+        root = tk._default_root or tk.Tk()
+        root.withdraw()
+        resp = messagebox.askyesno(title, msg)
+        if not tk._default_root:
+            root.destroy()
+        return resp
+
     # Only PDF and PS can be multi-page
     if ext == ".pdf":
         try:
-            import fitz
-            doc = fitz.open(in_path)
-            n_pages = doc.page_count
-            doc.close()
+            from src.utils.documents import open_pdf
+            with open_pdf(in_path) as doc:
+                n_pages = doc.page_count
         except Exception:
             n_pages = 1  # Fallback: treat as single page if cannot open
         if n_pages > 1:
-            root = tk._default_root or tk.Tk()
-            root.withdraw()
             msg = (
                 f"The PDF file contains {n_pages} pages. Only single-page files are supported.\n"
                 "If you continue, only the last page will be saved and previous pages will be overwritten.\n"
                 "It is recommended to split the file into single pages before proceeding.\n\nContinue anyway?"
             )
-            resp = messagebox.askyesno("Multi-page PDF Detected", msg)
-            if not tk._default_root:
-                root.destroy()
-            return resp
+            return call_in_ui(ask, "Multi-page PDF Detected", msg)
         else:
             return True
     elif ext == ".ps":
@@ -73,17 +140,12 @@ def confirm_single_page(in_path: str) -> bool:
         except Exception:
             n_pages = 1
         if n_pages > 1:
-            root = tk._default_root or tk.Tk()
-            root.withdraw()
             msg = (
                 f"The PS file contains {n_pages} pages (detected by 'showpage'). Only single-page files are supported.\n"
                 "If you continue, only the last page will be saved and previous pages will be overwritten.\n"
                 "It is recommended to split the file into single pages before proceeding.\n\nContinue anyway?"
             )
-            resp = messagebox.askyesno("Multi-page PS Detected", msg)
-            if not tk._default_root:
-                root.destroy()
-            return resp
+            return call_in_ui(ask, "Multi-page PS Detected", msg)
         else:
             return True
     else:
@@ -98,7 +160,20 @@ def confirm_dir_existence(out_dir: str) -> bool:
     """
     if os.path.exists(out_dir):
         return True
+    if not is_interactive():
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            return True
+        except OSError:
+            return False
     # Prompt user
+    return call_in_ui(_prompt_create_dir, out_dir)
+
+
+def _prompt_create_dir(out_dir: str) -> bool:
+    if os.path.exists(out_dir):
+        # Created meanwhile by an earlier prompt of the same batch
+        return True
     root = None
     try:
         root = tk._default_root or tk.Tk()
@@ -123,9 +198,9 @@ def confirm_dir_existence(out_dir: str) -> bool:
             root.destroy()
 
 def confirm_overwrite(out_path: str) -> bool:
-    if os.path.exists(out_path):
-        return messagebox.askyesno(
-            "File Exists", f"File already exists:\n{out_path}\nOverwrite?"
+    if os.path.exists(out_path) and is_interactive():
+        return call_in_ui(
+            messagebox.askyesno, "File Exists", f"File already exists:\n{out_path}\nOverwrite?"
         )
     return True
 
@@ -199,3 +274,41 @@ def check_tool(tool_key: str) -> bool:
         return importlib.util.find_spec(tool_key) is not None
     except Exception:
         return False
+
+
+@lru_cache(maxsize=None)
+def get_tool_version(tool_key: str) -> str:
+    """
+    Version string of an external tool or Python package, used to key caches.
+    Returns "missing" if the tool is not installed and "unknown" if it is
+    installed but does not report a version.
+    """
+    tool_list_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "configs",
+        "tool_list.json",
+    )
+    with open(tool_list_path, "r", encoding="utf-8") as f:
+        tool = next((t for t in json.load(f) if t["key"] == tool_key), None)
+    if tool is not None and tool["type"] == "exe":
+        exe_path = next(filter(None, (shutil.which(e) for e in tool["executables"])), None)
+        if not exe_path:
+            return "missing"
+        for flag in ("--version", "-v"):
+            try:
+                proc = subprocess.run(
+                    [exe_path, flag],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    timeout=5,
+                )
+            except Exception:
+                continue
+            lines = [l.strip() for l in proc.stdout.decode("utf-8", "ignore").splitlines() if l.strip()]
+            if lines:
+                return lines[0]
+        return "unknown"
+    try:
+        return importlib.metadata.version(tool_key)
+    except importlib.metadata.PackageNotFoundError:
+        return "missing"
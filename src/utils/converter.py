@@ -6,20 +6,24 @@ import subprocess
 from typing import Optional
 import tempfile
 import shutil
-from pillow_heif import register_heif_opener
 
 from src.utils.logger import Logger
 from src.utils.commons import check_tool
 from src.utils.commons import confirm_overwrite
 from src.utils.commons import confirm_dir_existence
 from src.utils.commons import confirm_single_page
+from src.utils.tracing import span, traced, file_size
+from src.utils.tools import run_tool
+from src.utils.documents import get_document_pool
+from src.utils.pdf_writer import write_images_pdf
 
 import src.utils.raster as rst
-from src.utils.commons import heif_formats
+from src.utils.commons import heif_formats, bitmap_formats, script_formats
 
 """Bitmap conversion utilities.
 
-Uses Pillow for most bitmap format conversions and pillow-heif for HEIC/HEIF decoding.
+Uses Pillow for most bitmap format conversions and pillow-heif for HEIC/HEIF decoding
+(registered with Pillow once, when src.utils.raster is imported).
 """
 
 device_map = {
@@ -32,6 +36,7 @@ device_map = {
     ".tiff": "tiff24nc",
 }
 
+@traced()
 def raster_convert(
     in_path: str,
     out_dir: str,
@@ -47,19 +52,22 @@ def raster_convert(
         suffix = in_fmt.lstrip(".") + "2" + out_fmt.lstrip(".")
         out_path = os.path.join(out_dir, f"{base_name}_{suffix}{out_fmt}")
         if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
-            if in_fmt in heif_formats:
-                register_heif_opener()
-            img = Image.open(in_path)
+            with span("decode"):
+                img = Image.open(in_path)
+                img.load()
             # For formats like JPEG, ensure RGB
             if img.mode in ("RGBA", "P") and out_fmt in (".jpg", ".jpeg",):
                 img = img.convert("RGB")
-            img.save(out_path, quality=kwargs.get("quality", 95))
+            with span("encode") as sp:
+                img.save(out_path, quality=kwargs.get("quality", 95))
+                sp.add_bytes(written=file_size(out_path))
             logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
             return out_path
     except Exception as e:
         logger.error(f'Format Conversion of {os.path.basename(in_path)} failed due to "{e}".') if logger else None
 
 
+@traced()
 def raster2script(
     in_path: str,
     out_dir: str,
@@ -77,25 +85,33 @@ def raster2script(
         out_path = os.path.join(out_dir, f"{base_name}_{suffix}{out_fmt}")
         
         if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
-            if in_fmt in heif_formats:
-                register_heif_opener()
-            img = Image.open(in_path)
             if out_fmt == ".eps":
                 # EPS embedding can use Pillow to save as EPS, ensure mode is RGB or L
-                img = rst.remove_alpha_channel(img)
-                img.save(out_path, format="EPS", dpi=(dpi, dpi))
+                with span("decode"):
+                    img = rst.remove_alpha_channel(Image.open(in_path))
+                with span("encode") as sp:
+                    img.save(out_path, format="EPS", dpi=(dpi, dpi))
+                    sp.add_bytes(written=file_size(out_path))
                 logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
                 return out_path
-            elif out_fmt in (".pdf", ".ps"):
-                w, h = img.size
+            elif out_fmt == ".pdf":
+                # JPEG, PNG and TIFF data is embedded as it is, other images are compressed once
+                get_document_pool().close(out_path)
+                write_images_pdf([in_path], out_path, dpi=dpi)
+                logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
+                return out_path
+            elif out_fmt == ".ps":
+                (w, h), _ = rst.get_raster_size(in_path)
                 # Calculate physical size (inches) based on pixel dimensions and dpi
                 w_pt = w / dpi * 72
                 h_pt = h / dpi * 72
                 # Convert physical size (inches) to pt (1pt = 1/72 inches)
-                c = canvas.Canvas(out_path, pagesize=(w_pt, h_pt))
-                c.drawImage(in_path, 0, 0, width=w_pt, height=h_pt)
-                c.showPage()
-                c.save()
+                with span("encode", writer="reportlab") as sp:
+                    c = canvas.Canvas(out_path, pagesize=(w_pt, h_pt))
+                    c.drawImage(in_path, 0, 0, width=w_pt, height=h_pt)
+                    c.showPage()
+                    c.save()
+                    sp.add_bytes(written=file_size(out_path))
                 logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
                 return out_path
             else:
@@ -104,6 +120,7 @@ def raster2script(
         logger.error(f'Format Conversion of {os.path.basename(in_path)} failed due to "{e}".') if logger else None
 
 
+@traced()
 def script2raster(
     in_path: str,
     out_dir: str,
@@ -141,7 +158,7 @@ def script2raster(
                     f"-sOutputFile={out_path}",
                     in_path,
                 ]
-                subprocess.run(gs_cmd, check=True)
+                run_tool(gs_cmd, logger=logger)
                 logger.info(
                     f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded."
                 ) if logger else None
@@ -153,6 +170,7 @@ def script2raster(
         logger.error(msg) if logger else None
 
 
+@traced()
 def raster2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> Optional[str]:
     """Convert raster image to SVG by embedding as base64 PNG."""
     try:
@@ -162,28 +180,28 @@ def raster2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> O
         suffix = in_fmt.lstrip(".") + "2" + "svg"
         out_path = os.path.join(out_dir, f"{base_name}_{suffix}.svg")
 
-        if in_fmt in heif_formats:
-            register_heif_opener()
         with Image.open(in_path) as img:
             original_mode = img.mode
             w, h = img.size
 
             with tempfile.TemporaryDirectory() as tmp_dir:
                 tmp_path = os.path.join(tmp_dir, "temp.png")
-                if original_mode in ('RGBA', 'LA', 'PA'):
-                    if original_mode != 'RGBA':
-                        img = img.convert('RGBA')
-                    img.save(tmp_path, 'PNG')
-                    mime_type = 'image/png'
-                else:
-                    img.convert('RGB').save(tmp_path, 'PNG')
-                    mime_type = 'image/png'
+                with span("encode") as sp:
+                    if original_mode in ('RGBA', 'LA', 'PA'):
+                        if original_mode != 'RGBA':
+                            img = img.convert('RGBA')
+                        img.save(tmp_path, 'PNG')
+                        mime_type = 'image/png'
+                    else:
+                        img.convert('RGB').save(tmp_path, 'PNG')
+                        mime_type = 'image/png'
+                    sp.add_bytes(written=file_size(tmp_path))
 
                 with open(tmp_path, "rb") as f:
                     b64 = base64.b64encode(f.read()).decode("ascii")
         
         if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
-            with open(out_path, "w", encoding="utf-8") as f:
+            with span("write"), open(out_path, "w", encoding="utf-8") as f:
                 f.write(
                     f"""<?xml version="1.0" standalone="no"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}">
@@ -198,6 +216,7 @@ def raster2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> O
         return None
 
 
+@traced()
 def svg2raster(in_path: str, out_dir: str, out_fmt: str, dpi: int = None, logger: Optional[Logger] = None, **kwargs) -> Optional[str]:
     try:
         import cairosvg
@@ -215,21 +234,27 @@ def svg2raster(in_path: str, out_dir: str, out_fmt: str, dpi: int = None, logger
 
     with tempfile.TemporaryDirectory() as tmp_dir:
         if out_fmt == ".png":
-            cairosvg.svg2png(url=in_path, write_to=out_path, dpi=dpi)
+            with span("render", tool="cairosvg"):
+                cairosvg.svg2png(url=in_path, write_to=out_path, dpi=dpi)
         elif out_fmt in (".jpg", ".jpeg"):
             tmp_png = os.path.join(tmp_dir, "temp.png")
-            cairosvg.svg2png(url=in_path, write_to=tmp_png, dpi=dpi)
-            Image.open(tmp_png).convert("RGB").save(out_path, quality=kwargs.get("quality", 95))
+            with span("render", tool="cairosvg"):
+                cairosvg.svg2png(url=in_path, write_to=tmp_png, dpi=dpi)
+            with span("encode"):
+                Image.open(tmp_png).convert("RGB").save(out_path, quality=kwargs.get("quality", 95))
         elif out_fmt == ".tiff":
             tmp_png = os.path.join(tmp_dir, "temp.png")
-            cairosvg.svg2png(url=in_path, write_to=tmp_png, dpi=dpi)
-            Image.open(tmp_png).save(out_path, format="TIFF")
+            with span("render", tool="cairosvg"):
+                cairosvg.svg2png(url=in_path, write_to=tmp_png, dpi=dpi)
+            with span("encode"):
+                Image.open(tmp_png).save(out_path, format="TIFF")
         else:
             raise RuntimeError(f"Unsupported bitmap format: {out_fmt}")
         logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
     return out_path
 
 
+@traced()
 def script2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> Optional[str]:
     """
     支持ps/eps/pdf转svg，pdf需先转ps。
@@ -249,10 +274,10 @@ def script2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> O
         if in_fmt == ".pdf":
             with tempfile.TemporaryDirectory() as tmp_dir:
                 temp_ps, _ = script_convert(in_path, tmp_dir, ".ps")
-                subprocess.run([pstoedit, "-f", "svg", temp_ps, out_path], check=True)
+                run_tool([pstoedit, "-f", "svg", temp_ps, out_path], logger=logger)
             # 清理临时ps
         else:
-            subprocess.run([pstoedit, "-f", "svg", in_path, out_path], check=True)
+            run_tool([pstoedit, "-f", "svg", in_path, out_path], logger=logger)
         logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
         
         return out_path
@@ -261,6 +286,7 @@ def script2svg(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> O
         raise
 
 
+@traced()
 def svg2script(in_path: str, out_dir: str, out_fmt: str, dpi: int, logger: Optional[Logger] = None) -> Optional[str]:
     """
     将SVG转为PDF/EPS/PS，并用Ghostscript清洗，最后删除缓存文件。
@@ -278,10 +304,11 @@ def svg2script(in_path: str, out_dir: str, out_fmt: str, dpi: int, logger: Optio
     if confirm_dir_existence(out_dir):
         with tempfile.TemporaryDirectory() as tmp_dir:
             tmp_path = os.path.join(tmp_dir, "temp" + out_fmt)
-            if out_fmt == ".pdf":
-                cairosvg.svg2pdf(url=in_path, write_to=tmp_path, dpi=dpi)
-            elif out_fmt in (".eps", ".ps"):
-                cairosvg.svg2ps(url=in_path, write_to=tmp_path, dpi=dpi)
+            with span("render", tool="cairosvg"):
+                if out_fmt == ".pdf":
+                    cairosvg.svg2pdf(url=in_path, write_to=tmp_path, dpi=dpi)
+                elif out_fmt in (".eps", ".ps"):
+                    cairosvg.svg2ps(url=in_path, write_to=tmp_path, dpi=dpi)
             base_name = os.path.splitext(os.path.basename(in_path))[0]
             in_fmt = os.path.splitext(in_path)[1].lower()
             out_fmt = out_fmt if out_fmt is not None else in_fmt
@@ -293,6 +320,7 @@ def svg2script(in_path: str, out_dir: str, out_fmt: str, dpi: int, logger: Optio
         return out_path
 
 
+@traced()
 def script_convert(in_path: str, out_dir: str, out_fmt: str = None, logger: Optional[Logger] = None) -> Optional[str]:
     
     if not check_tool("ghostscript"):
@@ -319,11 +347,12 @@ def script_convert(in_path: str, out_dir: str, out_fmt: str = None, logger: Opti
             f"-sOutputFile={out_path}",
             in_path,
         ]
-        subprocess.run(cmd, check=True)
+        run_tool(cmd, logger=logger)
         logger.info(f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} succeeded.") if logger else None
         return out_path
 
 
+@traced()
 def pdf2script(in_path: str, out_dir: str, out_fmt: str, logger: Optional[Logger] = None):
     """
     Use pdf2ps to convert PDF to PS or EPS.
@@ -358,10 +387,105 @@ def pdf2script(in_path: str, out_dir: str, out_fmt: str, logger: Optional[Logger
     cmd.extend([in_path, out_path])
 
     try:
-        subprocess.run(cmd, check=True)
+        run_tool(cmd, logger=logger)
         logger.info(f"Conversion completed: {out_path}") if logger else None
     except subprocess.CalledProcessError as e:
         logger.error(f"Conversion failed: {e}") if logger else None
         raise
 
-    return out_path
\ No newline at end of file
+    return out_path
+
+@traced()
+def copy_script(in_path: str, out_dir: str, logger: Optional[Logger] = None) -> Optional[str]:
+    """Copy a script file whose input and output formats are the same."""
+    base_name = os.path.splitext(os.path.basename(in_path))[0]
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    out_path = os.path.join(out_dir, f"{base_name}_copied{in_fmt}")
+    shutil.copy2(in_path, out_path)
+    logger.info(f"Copied {in_path} to {out_path}") if logger else None
+    return out_path
+
+
+@traced()
+def rasters2pdf(in_paths: list, out_path: str, dpi: int = 300, logger: Optional[Logger] = None) -> Optional[str]:
+    """
+    Write bitmaps as the pages of one PDF, in order. Pages are written as they
+    are added, so the images are never all in memory at once.
+    """
+    try:
+        if confirm_dir_existence(os.path.dirname(out_path) or ".") and confirm_overwrite(out_path):
+            get_document_pool().close(out_path)
+            methods = write_images_pdf(in_paths, out_path, dpi=dpi)
+            passed = sum(method != "flate" for method in methods)
+            logger.info(
+                f"Wrote {len(in_paths)} images to {os.path.basename(out_path)} ({passed} embedded without re-encoding)."
+            ) if logger else None
+            return out_path
+    except Exception as e:
+        logger.error(f'Writing {os.path.basename(out_path)} failed due to "{e}".') if logger else None
+
+
+# (input formats, output formats, converter, keyword parameters, version, tools whose version affects the output)
+# The first matching row wins. HEIC/HEIF is read through the Pillow opener registered in src.utils.raster.
+# Bump the version of a row when its converter writes different output, so cached results are not reused.
+conversion_table = [
+    (bitmap_formats + heif_formats, bitmap_formats, raster_convert, ("out_fmt", "quality"), 1, ("pillow", "pillow-heif")),
+    (bitmap_formats + heif_formats, [".pdf", ".eps"], raster2script, ("out_fmt", "dpi"), 2, ("pillow", "pillow-heif")),
+    (bitmap_formats + heif_formats, [".ps"], raster2script, ("out_fmt", "dpi"), 1, ("pillow", "pillow-heif", "reportlab")),
+    (bitmap_formats + heif_formats, [".svg"], raster2svg, (), 1, ("pillow", "pillow-heif")),
+    (script_formats, bitmap_formats, script2raster, ("out_fmt", "dpi"), 1, ("ghostscript",)),
+    ([".pdf"], [".eps", ".ps"], pdf2script, ("out_fmt",), 1, ("pdftops",)),
+    (script_formats, script_formats, script_convert, ("out_fmt",), 1, ("ghostscript",)),
+    (script_formats, [".svg"], script2svg, (), 1, ("pstoedit", "ghostscript")),
+    ([".svg"], bitmap_formats, svg2raster, ("out_fmt", "dpi"), 1, ("cairosvg", "pillow")),
+    ([".svg"], script_formats, svg2script, ("out_fmt", "dpi"), 1, ("cairosvg",)),
+]
+
+
+def select_converter(in_fmt: str, out_fmt: str):
+    """
+    Return (converter, parameter names, version, tool keys) for in_fmt -> out_fmt,
+    or None if the conversion is not supported.
+    """
+    in_fmt, out_fmt = in_fmt.lower(), out_fmt.lower()
+    if in_fmt in script_formats and in_fmt == out_fmt:
+        return copy_script, (), 1, ()
+    for in_fmts, out_fmts, func, params, version, tools in conversion_table:
+        if in_fmt in in_fmts and out_fmt in out_fmts:
+            return func, params, version, tools
+    return None
+
+
+def get_out_path(in_path: str, out_dir: str, out_fmt: str) -> str:
+    """Output path that convert_file will write for in_path."""
+    base_name = os.path.splitext(os.path.basename(in_path))[0]
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    out_fmt = out_fmt.lower()
+    if in_fmt in script_formats and in_fmt == out_fmt:
+        return os.path.join(out_dir, f"{base_name}_copied{out_fmt}")
+    suffix = in_fmt.lstrip(".") + "2" + out_fmt.lstrip(".")
+    return os.path.join(out_dir, f"{base_name}_{suffix}{out_fmt}")
+
+
+def get_converter_params(params: tuple, out_fmt: str, **kwargs) -> dict:
+    defaults = {"out_fmt": out_fmt.lower(), "quality": 95, "dpi": 300}
+    defaults.update(kwargs)
+    return {name: defaults[name] for name in params}
+
+
+@traced()
+def convert_file(
+    in_path: str,
+    out_dir: str,
+    out_fmt: str,
+    logger: Optional[Logger] = None,
+    **kwargs,
+) -> Optional[str]:
+    """Convert one file to out_fmt with the converter selected from conversion_table."""
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    selected = select_converter(in_fmt, out_fmt)
+    if selected is None:
+        logger.info(f"Unsupported conversion: {in_fmt} -> {out_fmt}") if logger else None
+        return None
+    func, params, _, _ = selected
+    return func(in_path=in_path, out_dir=out_dir, logger=logger, **get_converter_params(params, out_fmt, **kwargs))
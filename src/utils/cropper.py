@@ -10,8 +10,11 @@ from src.utils.commons import confirm_single_page
 from src.utils.commons import confirm_dir_existence
 from src.utils.commons import confirm_overwrite
 from src.utils.commons import confirm_cropbox
+from src.utils.tracing import span, traced, file_size
 
 import src.utils.vector as vec
+from src.utils.documents import open_pdf, get_document_pool, fitz_lock
+import src.utils.raster as rst
 
 
 def display_crop(img, crop_box, eps_coordinate=False, box_color="white", box_width=3, mask_opacity=120):
@@ -30,42 +33,34 @@ def display_crop(img, crop_box, eps_coordinate=False, box_color="white", box_wid
         # EPS coordinate system, y axis upwards
         y, y2 = img.height - y2, img.height - y
 
-    # Copy the image to avoid modifying the original
-    img_out = img.copy().convert("RGBA")
-
-    # Create a transparent layer the same size as the image for the mask
-    mask_layer = Image.new("RGBA", img_out.size, (0, 0, 0, 0))
-    mask_draw = ImageDraw.Draw(mask_layer)
-
-    # Semi-transparent mask (outside the box)
-    width, height = img_out.size
-
-    # Draw masks in four directions
-    mask_draw.rectangle([(0, 0), (width, y)], fill=(0, 0, 0, mask_opacity))               # Top
-    mask_draw.rectangle([(0, y2), (width, height)], fill=(0, 0, 0, mask_opacity))        # Bottom
-    mask_draw.rectangle([(0, y), (x, y2)], fill=(0, 0, 0, mask_opacity))                 # Left
-    mask_draw.rectangle([(x2, y), (width, y2)], fill=(0, 0, 0, mask_opacity))            # Right
-
-    # Composite the mask layer onto the image
-    img_out = Image.alpha_composite(img_out, mask_layer)
+    # Darken the whole image once and paste the untouched box back, rather than
+    # compositing an RGBA mask layer
+    img = img.convert("RGB")
+    factor = (255 - mask_opacity) / 255
+    img_out = img.point(lambda v: int(v * factor))
+    box = (max(int(x), 0), max(int(y), 0), min(int(x2), img.width), min(int(y2), img.height))
+    if box[0] < box[2] and box[1] < box[3]:
+        img_out.paste(img.crop(box), box[:2])
 
     # Finally draw the crop box (white recommended for better visibility)
     draw = ImageDraw.Draw(img_out)
     draw.rectangle([x, y, x2, y2], outline=box_color, width=box_width)
 
-    return img_out.convert("RGB")
+    return img_out
 
 
+@traced()
 def crop_image(
     in_path: str,
     out_dir: str,
     crop_box: tuple[int, int, int, int],
     save_image: bool = True,
     preview_callback: Optional[Callable] = None,
-    logger: Optional[Logger] = None
+    logger: Optional[Logger] = None,
+    cache: bool = False
 ) -> Optional[str]:
 
-    img = Image.open(in_path)
+    img = rst.load_image(in_path, cache=cache)
     if not confirm_cropbox(crop_box, (img.width, img.height)):
         logger.error("[bitmap] Crop box invalid (exceeding the bounds), skipping crop.")
         return None
@@ -78,16 +73,19 @@ def crop_image(
 
         logger.info(f"[crop] crop box: {crop_box}") if logger else None
         img = img.crop(crop_box)
-        img.save(out_path)
+        with span("encode") as sp:
+            img.save(out_path)
+            sp.add_bytes(written=file_size(out_path))
         logger.info(f"[crop] saved to: {out_path}") if logger else None
         preview_callback(img) if preview_callback else None
         return out_path
     else:
-        preview_callback(display_crop(Image.open(in_path), crop_box)) if preview_callback else None
+        preview_callback(display_crop(img, crop_box)) if preview_callback else None
         logger.info("[crop] see preview frame for cropping effect") if logger else None
         return None
 
 
+@traced()
 def crop_svg(
     in_path: str,
     out_dir: str,
@@ -99,9 +97,12 @@ def crop_svg(
 ) -> Optional[Tuple[Optional[str], Optional[Image.Image]]]:
 
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
     try:
-        view_box = vec.get_svg_view_box(in_path)
-        (orig_width, orig_height), unit = vec.get_svg_size(in_path)
+        doc = vec.SvgDocument(in_path)
+        view_box = doc.view_box
+        (orig_width, orig_height), unit = doc.size
         if view_box is None:
             view_box = (0, 0, orig_width, orig_height)
     except Exception:
@@ -142,13 +143,12 @@ def crop_svg(
                 h = scaled_crop_box[3] - scaled_crop_box[1]
                 logger.info(f"[vector] Cropping SVG viewBox to ({x},{y},{w},{h})") if logger else None
                 
-                vec.set_svg_view_box(in_path, out_path, f"{x} {y} {w} {h}")
-                vec.set_svg_size(
-                    out_path, 
-                    out_path, 
+                doc.set_view_box(f"{x} {y} {w} {h}")
+                doc.set_size(
                     width_str=f"{crop_box[2]-crop_box[0]}{unit}",
                     height_str=f"{crop_box[3]-crop_box[1]}{unit}")
-                preview_img = vec.show_svg(out_path, dpi=dpi)
+                doc.save(out_path)
+                preview_img = vec.show_svg(out_path, dpi=dpi, box=preview_box)
                 preview_callback(preview_img, unit) if preview_callback else None
                 logger.info(f"[vector] SVG saved to {out_path}") if logger else None
                 return out_path
@@ -162,6 +162,7 @@ def crop_svg(
         logger.info(f"[Transform] see preview frame for cropping effect") if logger else None
         return None
 
+@traced()
 def crop_pdf(
     in_path: str,
     out_dir: str,
@@ -173,6 +174,8 @@ def crop_pdf(
 ) -> Optional[str]:
     
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
 
     def display_crop_pdf(img):
         x1 = max(math.floor(crop_box[0] / 72 * dpi), 0)
@@ -196,8 +199,8 @@ def crop_pdf(
 
         if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
             try:
-                with fitz.open(in_path) as doc:
-                    with fitz.open() as new_doc:
+                with open_pdf(in_path) as doc:
+                    with fitz_lock, fitz.open() as new_doc:
                         for page in doc:
                             new_page = new_doc.new_page(width=orig_width, height=orig_height)
                             new_page.set_cropbox(fitz.Rect(*crop_box))
@@ -211,8 +214,11 @@ def crop_pdf(
                                 overlay=True
                             )                            
                             logger.info(f"[vector] Set cropbox to {crop_box}") if logger else None
-                        new_doc.save(out_path)
-                preview_img = vec.show_script(out_path, dpi=dpi)
+                        with span("write", tool="pymupdf"):
+                            # An open handle on an earlier output would block overwriting it on Windows
+                            get_document_pool().close(out_path)
+                            new_doc.save(out_path)
+                preview_img = vec.show_script(out_path, dpi=dpi, box=preview_box)
                 preview_callback(preview_img, unit) if preview_callback else None
                 logger.info(f"[vector] PDF saved to {out_path}") if logger else None    
                 return out_path
@@ -226,6 +232,7 @@ def crop_pdf(
         logger.info(f"[Transform] see preview frame for cropping effect") if logger else None
         return None
 
+@traced()
 def crop_script(
     in_path: str,
     out_dir: str,
@@ -244,6 +251,8 @@ def crop_script(
       Only supports cropping, not scaling
     """
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
 
     def display_crop_script(img):
         x1 = max(math.floor(crop_box[0] / 72 * dpi), 0)
@@ -296,7 +305,7 @@ def crop_script(
                 out_path, 
                 translate=[-crop_box[0], -crop_box[1]],  # y direction translation
             )
-            preview_img = vec.show_script(out_path, dpi=dpi)
+            preview_img = vec.show_script(out_path, dpi=dpi, box=preview_box)
             preview_callback(preview_img, unit) if preview_callback else None
             logger.info(f"[vector] EPS saved to {out_path}") if logger else None
             return out_path
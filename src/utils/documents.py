@@ -0,0 +1,232 @@
+"""Shared document handles.
+
+Selecting one PDF used to open it separately for the page-count check, the
+size query, the analyzer, the preview and the transform or crop. Here each
+file is opened once, keyed by path, size and mtime, and the handle is lent to
+every helper that asks for it. A handle is reference counted while lent out.
+At most max_open handles are kept; the least recently used handle that nobody
+holds is closed first, and a handle evicted while lent out is closed when it is
+returned. A file changed on disk gets a new handle.
+
+PyMuPDF is not thread-safe even across different documents: all of them share
+one global context, so separate documents per thread would not help. Every
+use of fitz therefore holds fitz_lock, one process-wide lock: the pool takes it
+to open, lend and close documents, and code creating documents of its own (new
+output PDFs) takes it as well. PDF work on the preview, batch and indexing
+threads runs one at a time, including renders. So that a preview does not queue
+behind batch conversions, page probes or metadata refreshes, the lock goes to
+the waiting thread with the most urgent scheduler priority first (see
+scheduler.current_priority), and the time spent waiting for it is recorded as a
+"wait" span in the "lock" category when tracing is enabled.
+
+SVG files are parsed once the same way. The parsed trees are shared and must
+not be modified; SvgDocument copies its tree before the first edit.
+"""
+
+import os
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+from xml.etree import ElementTree as ET
+
+import fitz  # PyMuPDF
+
+from src.utils.tracing import span, file_size
+from src.utils.scheduler import current_priority
+
+DocKey = Tuple[str, int, int]
+
+
+class PriorityRLock:
+    """Reentrant lock handed to waiting threads in order of their scheduler priority."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._seq = itertools.count()
+        # (priority, seq, thread id) of the threads waiting
+        self._waiting = []
+        self._owner = None
+        self._count = 0
+
+    def acquire(self) -> bool:
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._count += 1
+                return True
+            if self._owner is None and not self._waiting:
+                self._owner, self._count = me, 1
+                return True
+            entry = (current_priority(), next(self._seq), me)
+            heapq.heappush(self._waiting, entry)
+            with span("wait", cat="lock", lock=self.name, priority=entry[0]):
+                while self._owner is not None or self._waiting[0] is not entry:
+                    self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._owner, self._count = me, 1
+            return True
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("Cannot release a lock held by another thread")
+            self._count -= 1
+            if self._count == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# Held around every PyMuPDF call; reentrant, so helpers may nest
+fitz_lock = PriorityRLock("pymupdf")
+
+
+def doc_key(path: str) -> DocKey:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class _Handle:
+    __slots__ = ("doc", "refs", "evicted")
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.refs = 0
+        self.evicted = False
+
+
+class DocumentPool:
+    """Reference-counted LRU of open PDF documents; see the module docstring."""
+
+    def __init__(self, max_open: int = 8):
+        self.max_open = max_open
+        self._handles: "OrderedDict[DocKey, _Handle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _acquire(self, path: str) -> _Handle:
+        # Called with fitz_lock held; the pool lock is always taken after it
+        key = doc_key(path)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                handle.refs += 1
+                return handle
+        with span("open", tool="pymupdf") as sp:
+            doc = fitz.open(path)
+            sp.add_bytes(read=file_size(path))
+        with self._lock:
+            # No other thread can have opened it meanwhile, it would need fitz_lock
+            handle = self._handles[key] = _Handle(doc)
+            handle.refs += 1
+            self._evict()
+        return handle
+
+    def _evict(self):
+        # Called with fitz_lock and the pool lock held
+        for key in list(self._handles):
+            if len(self._handles) <= self.max_open:
+                break
+            handle = self._handles[key]
+            del self._handles[key]
+            handle.evicted = True
+            if handle.refs == 0:
+                handle.doc.close()
+
+    def _release(self, handle: _Handle):
+        with self._lock:
+            handle.refs -= 1
+            if handle.evicted and handle.refs == 0:
+                handle.doc.close()
+
+    @contextmanager
+    def open(self, path: str):
+        """Lend the shared document of path for the with block, holding fitz_lock throughout."""
+        with fitz_lock:
+            handle = self._acquire(path)
+            try:
+                yield handle.doc
+            finally:
+                self._release(handle)
+
+    def close(self, path: str = None):
+        """Close the unused handles of path, or of all files, e.g. before overwriting them."""
+        target = os.path.abspath(path) if path else None
+        with fitz_lock, self._lock:
+            for key in list(self._handles):
+                if target is None or key[0] == target:
+                    handle = self._handles.pop(key)
+                    handle.evicted = True
+                    if handle.refs == 0:
+                        handle.doc.close()
+
+    def __len__(self):
+        return len(self._handles)
+
+
+class SvgTreeCache:
+    """LRU of parsed SVG trees keyed like the document pool."""
+
+    def __init__(self, max_trees: int = 16):
+        self.max_trees = max_trees
+        self._trees: "OrderedDict[DocKey, ET.ElementTree]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, path: str) -> ET.ElementTree:
+        """The parsed tree of path; shared, so read-only."""
+        key = doc_key(path)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+        with span("parse", format="svg") as sp:
+            tree = ET.parse(path)
+            sp.add_bytes(read=file_size(path))
+        with self._lock:
+            self._trees[key] = tree
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return tree
+
+
+_pool = None
+_trees = None
+_instance_lock = threading.Lock()
+
+
+def get_document_pool() -> DocumentPool:
+    global _pool
+    with _instance_lock:
+        if _pool is None:
+            _pool = DocumentPool()
+        return _pool
+
+
+def get_svg_trees() -> SvgTreeCache:
+    global _trees
+    with _instance_lock:
+        if _trees is None:
+            _trees = SvgTreeCache()
+        return _trees
+
+
+def open_pdf(path: str):
+    """
+    with open_pdf(path) as doc: ... borrows the shared PyMuPDF document, with
+    fitz_lock held; do not close it.
+    """
+    return get_document_pool().open(path)
+
+
+def parse_svg(path: str) -> ET.ElementTree:
+    return get_svg_trees().parse(path)
@@ -0,0 +1,103 @@
+"""Session cache of decoded images.
+
+Tweaking parameters in the Transform, Crop and Ink tabs runs the same source
+through an operation again and again. Decoded source pixels and rendered
+vector rasters are kept here, shared by all tabs, so a repeated operation on an
+unchanged file skips decoding and rendering. Entries are keyed on the file's
+path, size and mtime, and the least recently used are evicted once the pixel
+bytes exceed the cap.
+
+Cached images are shared between callers and must be treated as read-only;
+every Pillow operation used on them returns a new image.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from PIL import Image
+
+def image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * max(1, len(img.getbands()))
+
+
+def default_max_bytes() -> int:
+    """A quarter of the available memory, at most 1 GB."""
+    # Imported here: memory imports raster, which uses this module
+    from src.utils.memory import available_memory
+
+    available = available_memory()
+    limit = 1024 ** 3
+    return min(limit, available // 4) if available else limit // 2
+
+
+class ImageCache:
+    """Thread-safe LRU of images, bounded by their pixel bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else default_max_bytes()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        with self._lock:
+            img = self._images.get(key)
+            if img is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+            return img
+
+    def put(self, key: Hashable, img: Image.Image):
+        size = image_bytes(img)
+        with self._lock:
+            if key in self._images:
+                self.bytes -= image_bytes(self._images.pop(key))
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+            self._images[key] = img
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, old = self._images.popitem(last=False)
+                self.bytes -= image_bytes(old)
+
+    def cached(self, key: Hashable, load: Callable[[], Image.Image]) -> Image.Image:
+        """The image under key, loaded and stored on a miss."""
+        img = self.get(key)
+        if img is None:
+            img = load()
+            self.put(key, img)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._images)
+
+
+def file_key(path: str, *variant: Hashable) -> Tuple:
+    """Cache key of path as it is now on disk, plus whatever distinguishes the variant."""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns) + variant
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """The process-wide image cache shared by all tabs, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
@@ -0,0 +1,257 @@
+"""Append-only batch journal.
+
+Every batch writes one JSON line per event to a journal named after the batch
+(input list, output directory and parameters). start() decides what a new run
+does, the same way for every entry point: after a crash or a cancel the same
+batch resumes, skipping inputs that are unchanged since they were done and
+whose output is still in place and retrying failed inputs up to a limit; a
+batch whose last run finished, or a restart, converts everything again.
+
+A journal is deleted once its run finishes, and journals of interrupted runs
+that were never resumed are removed after max_age days. A torn last line
+(crash mid-write) is ignored.
+
+Records:
+    {"type": "run", "total": n, "params": {...}, "time": t}
+    {"type": "job", "input": p, "status": "done" | "failed", "output": o, "duration": s, "error": e,
+     "signature": [size, mtime_ns], "time": t}
+    {"type": "end", "result": "finished" | "cancelled", "time": t}
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, Iterable, List, Tuple, Dict, Any
+
+from src.utils.commons import get_cache_dir
+
+# Seconds after which the journal of an interrupted batch is no longer resumed
+max_age = 30 * 24 * 3600
+
+
+def batch_id(paths: Iterable[str], out_dir: str, params: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps(
+        {"inputs": sorted(os.path.abspath(p) for p in paths), "out_dir": os.path.abspath(out_dir), "params": params},
+        sort_keys=True, default=str,
+    ).encode())
+    return h.hexdigest()[:20]
+
+
+def input_signature(path: str) -> Optional[List[int]]:
+    """[size, mtime_ns] of path, or None if it cannot be read."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class BatchJournal:
+    """Journal of one batch; record() may be called from worker threads."""
+
+    def __init__(self, path: str, params: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.params = params or {}
+        self._lock = threading.Lock()
+        self._file = None
+        # input -> {"status", "output", "duration", "attempts", "error", "signature"}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.runs = 0
+        self.started_at = None
+        self.updated_at = None
+        self.finished = False
+        self.load()
+
+    @classmethod
+    def for_batch(cls, paths: Iterable[str], out_dir: str, params: Dict[str, Any]) -> "BatchJournal":
+        paths = list(paths)
+        journal_dir = get_cache_dir("journals")
+        remove_stale_journals(journal_dir)
+        path = os.path.join(journal_dir, batch_id(paths, out_dir, params) + ".jsonl")
+        return cls(path, params=params)
+
+    def load(self):
+        """Replay the journal file into entries."""
+        self.entries.clear()
+        self.runs = 0
+        self.finished = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]):
+        kind = record.get("type")
+        self.updated_at = record.get("time", self.updated_at)
+        if kind == "run":
+            self.runs += 1
+            self.finished = False
+            self.started_at = self.started_at or record.get("time")
+        elif kind == "job":
+            entry = self.entries.setdefault(record["input"], {"attempts": 0})
+            entry["attempts"] += 1
+            entry.update({k: record.get(k) for k in ("status", "output", "duration", "error", "signature")})
+        elif kind == "end":
+            self.finished = record.get("result") == "finished"
+
+    @property
+    def exists(self) -> bool:
+        return self.runs > 0
+
+    @property
+    def resumable(self) -> bool:
+        """True if an earlier run of this batch stopped before finishing."""
+        return self.exists and not self.finished
+
+    def is_complete(self, path: str) -> bool:
+        entry = self.entries.get(path)
+        if not entry or entry.get("status") != "done":
+            return False
+        # Inputs edited since, or done without a signature, are converted again
+        signature = entry.get("signature")
+        if signature is None or signature != input_signature(path):
+            return False
+        # Outputs deleted since are converted again
+        return not entry.get("output") or os.path.exists(entry["output"])
+
+    def plan(self, paths: Iterable[str], max_retries: int = 2) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Split paths into (to do, already done, given up). Failed inputs are
+        retried until they have failed max_retries + 1 times.
+        """
+        todo, done, given_up = [], [], []
+        for path in paths:
+            entry = self.entries.get(path)
+            if self.is_complete(path):
+                done.append(path)
+            elif entry and entry.get("status") == "failed" and entry["attempts"] > max_retries:
+                given_up.append(path)
+            else:
+                todo.append(path)
+        return todo, done, given_up
+
+    def start(
+        self, paths: Iterable[str], restart: bool = False, max_retries: int = 2
+    ) -> Tuple[List[str], List[str], List[str]]:
+        """
+        (to do, already done, given up) for a new run of the batch: plan() if an
+        earlier run was interrupted, otherwise, or with restart, every input.
+        """
+        paths = list(paths)
+        if restart or not self.resumable:
+            self.reset()
+            return paths, [], []
+        return self.plan(paths, max_retries)
+
+    def reset(self):
+        """Forget earlier runs and delete the journal file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.entries.clear()
+        self.runs = 0
+        self.started_at = None
+        self.finished = False
+
+    def _write(self, record: Dict[str, Any]):
+        record["time"] = time.time()
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            # A journal that does not survive a power loss cannot resume after one
+            os.fsync(self._file.fileno())
+            self._apply(record)
+
+    def begin(self, total: int):
+        self._write({"type": "run", "total": total, "params": self.params})
+
+    def record(
+        self,
+        path: str,
+        status: str,
+        output: Optional[str] = None,
+        duration: float = 0.0,
+        error: Optional[str] = None,
+        signature: Optional[List[int]] = None,
+    ):
+        """signature: input_signature(path) taken before the conversion; read now if not given."""
+        self._write({
+            "type": "job", "input": path, "status": status,
+            "output": output, "duration": round(duration, 4), "error": error,
+            "signature": signature if signature is not None else input_signature(path),
+        })
+
+    def end(self, result: str = "finished"):
+        """Record the end of the run; the journal of a finished run is deleted, it has nothing left to resume."""
+        self._write({"type": "end", "result": result})
+        if result == "finished":
+            self.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def summary(self) -> Dict[str, Any]:
+        done = [p for p, e in self.entries.items() if e.get("status") == "done"]
+        failed = [p for p, e in self.entries.items() if e.get("status") == "failed"]
+        return {
+            "runs": self.runs,
+            "done": len(done),
+            "failed": len(failed),
+            "retried": sum(1 for e in self.entries.values() if e["attempts"] > 1),
+            "cpu_seconds": sum(e.get("duration") or 0.0 for e in self.entries.values()),
+            "wall_seconds": (self.updated_at - self.started_at) if self.started_at and self.updated_at else 0.0,
+            "finished": self.finished,
+            "failures": [(p, self.entries[p].get("error"), self.entries[p]["attempts"]) for p in failed],
+        }
+
+    def format_summary(self, max_failures: int = 20) -> str:
+        s = self.summary()
+        lines = [
+            f"Batch {'finished' if s['finished'] else 'incomplete'} after {s['runs']} run(s): "
+            f"{s['done']} done, {s['failed']} failed, {s['retried']} retried",
+            f"Conversion time {s['cpu_seconds']:.1f}s, wall time {s['wall_seconds']:.1f}s",
+        ]
+        for path, error, attempts in s["failures"][:max_failures]:
+            lines.append(f"  FAILED x{attempts} {os.path.basename(path)}: {error}")
+        if len(s["failures"]) > max_failures:
+            lines.append(f"  ... and {len(s['failures']) - max_failures} more")
+        if os.path.exists(self.path):
+            lines.append(f"Journal: {self.path}")
+        return "\n".join(lines)
+
+
+def remove_stale_journals(journal_dir: str, age: float = max_age):
+    """Delete journals not written to for age seconds."""
+    cutoff = time.time() - age
+    try:
+        names = os.listdir(journal_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(journal_dir, name)
+        try:
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
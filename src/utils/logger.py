@@ -2,6 +2,10 @@ import logging
 from tkinter import messagebox
 import tkinter
 import time
+import queue
+import threading
+
+from src.utils.commons import is_interactive, call_in_ui
 
 
 class GuiLogHandler(logging.Handler):
@@ -11,18 +15,29 @@ class GuiLogHandler(logging.Handler):
         super().__init__()
         self.text_widget = text_widget
         self.scroll_delay = 0.1
+        # Messages from worker threads, written by the Tk thread in drain()
+        self.pending = queue.Queue()
+        self.poll_ms = 100
+        self._draining = False
 
     def emit(self, record):
         msg = self.format(record)
+        if threading.current_thread() is not threading.main_thread():
+            # Tk widgets may only be touched from the Tk thread
+            self.pending.put(msg)
+            return
+        self.write(msg, self.scroll_delay)
+
+    def write(self, msg, scroll_delay=0):
         if self.text_widget and self.text_widget.winfo_exists():  # 添加控件存在性检查
             try:
                 self.text_widget.config(state="normal")
                 self.text_widget.insert("end", msg + "\n")
 
                 # 添加延时让滚动效果更明显
-                if self.scroll_delay > 0:
+                if scroll_delay > 0:
                     self.text_widget.update()  # 强制更新界面
-                    time.sleep(self.scroll_delay)  # 短暂延时
+                    time.sleep(scroll_delay)  # 短暂延时
 
                 self.text_widget.see("end")  # 这行已经实现了自动滚动
                 self.text_widget.config(state="disabled")
@@ -32,6 +47,27 @@ class GuiLogHandler(logging.Handler):
                 # 处理控件已被销毁的情况
                 pass
 
+    def start_draining(self):
+        """Start polling for messages logged from worker threads; call from the Tk thread."""
+        if not self._draining and self.text_widget is not None:
+            self._draining = True
+            self.text_widget.after(self.poll_ms, self.drain)
+
+    def drain(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            # One insert per poll, without the scroll delay, so busy batches do not stall the UI
+            self.write("\n".join(lines))
+        try:
+            self.text_widget.after(self.poll_ms, self.drain)
+        except (tkinter.TclError, AttributeError):
+            self._draining = False
+
 
 class Logger:
     """Unified logging interface for the project, supporting both standard output and GUI output."""
@@ -56,29 +92,32 @@ class Logger:
             gh = GuiLogHandler(gui_widget)
             gh.setFormatter(self.fmt)
             self.logger.addHandler(gh)
+            gh.start_draining()
 
     def set_gui_widget(self, widget):
         """Dynamically set/update GUI widget."""
         for h in self.logger.handlers:
             if isinstance(h, GuiLogHandler):
                 h.text_widget = widget
+                h.start_draining()
                 return
         gh = GuiLogHandler(widget)
         gh.setFormatter(self.fmt)
         self.logger.addHandler(gh)
+        gh.start_draining()
 
     def info(self, msg):
         self.logger.info(msg)
 
     def warning(self, msg, messagebox_flag=True):
         self.logger.warning(msg)
-        if messagebox_flag:
-            messagebox.showwarning("Warning", str(msg))
+        if messagebox_flag and is_interactive():
+            call_in_ui(messagebox.showwarning, "Warning", str(msg))
 
     def error(self, msg, messagebox_flag=False):
         self.logger.error(msg)
-        if messagebox_flag:
-            messagebox.showerror("Error", str(msg))
+        if messagebox_flag and is_interactive():
+            call_in_ui(messagebox.showerror, "Error", str(msg))
 
     def debug(self, msg):
         self.logger.debug(msg)
@@ -87,4 +126,4 @@ class Logger:
         self.logger.exception(msg)
 
     def get_logger(self):
-        return self.logger
\ No newline at end of file
+        return self.logger
@@ -0,0 +1,131 @@
+"""Peak memory estimates for batch jobs.
+
+Estimates are made from header-only metadata: pixel dimensions and mode for
+rasters, page size and render DPI for PDF/PS/EPS and SVG. They are deliberately
+rough upper bounds used for admission control, not measurements.
+"""
+
+import os
+from typing import Optional
+from xml.etree import ElementTree as ET
+
+from PIL import Image
+
+import src.utils.raster as rst
+from src.utils.commons import bitmap_formats, heif_formats, script_formats
+
+MB = 1024 * 1024
+# Fixed cost of a job besides its pixel buffers (interpreter work, tool start-up)
+base_overhead = 16 * MB
+# Ghostscript / cairo processes carry their own heap
+renderer_overhead = 64 * MB
+
+mode_bytes = {"1": 1, "L": 1, "P": 1, "LA": 2, "I;16": 2, "RGB": 3, "YCbCr": 3, "LAB": 3, "HSV": 3, "RGBA": 4, "CMYK": 4, "I": 4, "F": 4}
+
+
+def available_memory() -> Optional[int]:
+    """Currently available physical memory in bytes, or None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        # MemAvailable counts reclaimable page cache, which free pages do not
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget() -> int:
+    """Half of the available memory, or 2 GB when that is unknown."""
+    available = available_memory()
+    return int(available * 0.5) if available else 2048 * MB
+
+
+def raster_pixels(path: str) -> Optional[tuple[int, int, int]]:
+    """(width, height, bytes per pixel) from the image header."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in heif_formats and not rst.heif_available:
+        return None
+    with Image.open(path) as img:
+        return img.width, img.height, mode_bytes.get(img.mode, 4)
+
+
+def svg_size_px(path: str, dpi: float = 96) -> Optional[tuple[float, float]]:
+    """
+    Pixel size cairosvg renders the root element at dpi, read without parsing
+    the rest of the document. Physical units scale with dpi, px do not.
+    """
+    for _, elem in ET.iterparse(path, events=("start",)):
+        width, height = elem.get("width"), elem.get("height")
+        view_box = elem.get("viewBox")
+        break
+    else:
+        return None
+    try:
+        import src.utils.vector as vec
+        (w, h), unit = vec.parse_svg_size(width, height)
+        scale = {"pt": dpi / 72, "in": dpi, "mm": dpi / 25.4, "cm": dpi / 2.54}.get(unit, 1)
+        return w * scale, h * scale
+    except Exception:
+        if view_box:
+            parts = view_box.replace(",", " ").split()
+            if len(parts) == 4:
+                return float(parts[2]), float(parts[3])
+    return None
+
+
+def page_size_pt(path: str) -> Optional[tuple[float, float]]:
+    """Largest page of a PDF, or the BoundingBox of a PS/EPS file, in pt."""
+    import src.utils.vector as vec
+
+    if path.lower().endswith(".pdf"):
+        from src.utils.documents import open_pdf
+        with open_pdf(path) as doc:
+            sizes = [(page.rect.width, page.rect.height) for page in doc]
+        return max(sizes, key=lambda s: s[0] * s[1]) if sizes else None
+    (w, h), _ = vec.get_script_size(path)
+    return (w, h) if w and h else None
+
+
+def estimate_job_memory(path: str, out_fmt: Optional[str] = None, dpi: int = 300) -> int:
+    """
+    Estimated peak memory in bytes of converting path to out_fmt at dpi.
+    Falls back to a multiple of the file size when no header can be read.
+    """
+    in_fmt = os.path.splitext(path)[1].lower()
+    out_fmt = (out_fmt or in_fmt).lower()
+    try:
+        file_size = os.path.getsize(path)
+    except OSError:
+        file_size = 0
+    try:
+        if in_fmt in bitmap_formats or in_fmt in heif_formats:
+            w, h, bpp = raster_pixels(path)
+            # Decoded image, one converted copy (mode change / resize) and encoder buffers
+            return base_overhead + int(w * h * bpp * 2.5)
+        if in_fmt in script_formats:
+            if out_fmt in bitmap_formats:
+                w, h = page_size_pt(path)
+                pixels = w * h * (dpi / 72) ** 2
+                # Ghostscript renders RGBA, Pillow may re-read the output
+                return renderer_overhead + int(pixels * 4 * 1.5)
+            return renderer_overhead + file_size * 8
+        if in_fmt == ".svg":
+            if out_fmt in bitmap_formats:
+                w, h = svg_size_px(path, dpi or 96)
+                pixels = w * h
+                # cairo ARGB32 surface plus a Pillow copy for JPEG/TIFF output
+                return renderer_overhead + int(pixels * 4 * 2)
+            return renderer_overhead + file_size * 8
+    except Exception:
+        pass
+    return base_overhead + file_size * 4
@@ -0,0 +1,202 @@
+"""Persistent file metadata index.
+
+Rows are keyed on (path, size, mtime, content hash). A matching size and
+mtime is trusted as-is; a changed mtime with the same size is confirmed by
+re-hashing, and content already indexed under another path (copies, moved
+files) is reused without re-analysis. Rows stored from the UI thread carry
+no hash until the background refresh fills it in.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Callable, Iterable, Dict, Any
+
+from src.utils.commons import get_cache_dir
+
+# Bump when the layout of the stored metadata changes, to drop old rows
+SCHEMA_VERSION = 1
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class MetaIndex:
+    """SQLite-backed metadata index shared across sessions."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), "meta_index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Digests computed by get() for (path, size, mtime), reused by put(); guarded by _lock
+        self._digests = {}
+        self._refresh_stop = None
+        self._refresh_done = None
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS meta")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS meta (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    updated REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS meta_digest ON meta (digest, size)")
+
+    def _digest(self, path: str, st: os.stat_result) -> str:
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            # Hashed outside the lock, it can take a while on large files
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def get(self, path: str, verify: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return the indexed metadata if it is still valid for the file on disk, else None.
+        With verify=False only size and mtime are compared and the file is never
+        hashed, so a touched file is a miss; for callers on the Tk thread.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest, meta FROM meta WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return json.loads(row[3])
+        if not verify:
+            return None
+
+        digest = self._digest(path, st)
+        if row and row[0] == st.st_size and row[2] == digest:
+            # Touched but unchanged: only refresh the stored mtime
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE meta SET mtime_ns = ?, updated = ? WHERE path = ?",
+                    (st.st_mtime_ns, time.time(), path),
+                )
+            return json.loads(row[3])
+
+        with self._lock:
+            other = self._conn.execute(
+                "SELECT meta FROM meta WHERE digest = ? AND size = ? LIMIT 1",
+                (digest, st.st_size),
+            ).fetchone()
+        if other:
+            meta = json.loads(other[0])
+            if "Location" in meta:
+                meta["Location"] = path
+            self.put(path, meta)
+            return meta
+        return None
+
+    def get_stale(self, path: str) -> Optional[Dict[str, Any]]:
+        """Return whatever is indexed for path, without checking that it is still valid."""
+        with self._lock:
+            row = self._conn.execute("SELECT meta FROM meta WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, path: str, meta: Dict[str, Any], digest: bool = True):
+        """
+        Store meta for path. With digest=False the content hash is left empty
+        for the next refresh to fill in, so the caller never hashes the file.
+        """
+        st = os.stat(path)
+        value = self._digest(path, st) if digest else ""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (path, size, mtime_ns, digest, meta, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, value, json.dumps(meta), time.time()),
+            )
+            self._digests.pop((path, st.st_size, st.st_mtime_ns), None)
+
+    def fill_digest(self, path: str):
+        """Hash path if its row was stored without a digest and is still current."""
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM meta WHERE path = ? AND digest = ''", (path,)
+            ).fetchone()
+        if not row or row != (st.st_size, st.st_mtime_ns):
+            return
+        digest = file_digest(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE meta SET digest = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (digest, path, st.st_size, st.st_mtime_ns),
+            )
+
+    def refresh(
+        self,
+        paths: Iterable[str],
+        compute: Callable[[str], Dict[str, Any]],
+        callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ) -> threading.Thread:
+        """
+        Re-index missing or stale entries of paths in a background thread.
+        callback(path, meta) is called from that thread for every refreshed row.
+        A new refresh cancels the previous one.
+        """
+        if self._refresh_stop is not None:
+            self._refresh_stop.set()
+        stop = self._refresh_stop = threading.Event()
+        paths = list(paths)
+        self._refresh_done = done = threading.Event()
+
+        def worker():
+            try:
+                refresh_rows()
+            finally:
+                done.set()
+
+        def refresh_rows():
+            for path in paths:
+                if stop.is_set():
+                    return
+                try:
+                    if not os.path.isfile(path):
+                        continue
+                    self.fill_digest(path)
+                    if self.get(path) is not None:
+                        continue
+                    meta = compute(path)
+                    self.put(path, meta)
+                except Exception:
+                    continue
+                if callback and not stop.is_set():
+                    callback(path, meta)
+
+        thread = threading.Thread(target=worker, name="MetaIndexRefresh", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh_done is not None and not self._refresh_done.is_set()
+
+    def close(self):
+        if self._refresh_stop is not None:
+            self._refresh_stop.set()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,350 @@
+"""Raster to PDF writer that embeds encoded image data as-is.
+
+reportlab decodes every bitmap and compresses the pixels again. PDF can hold
+most bitmap encodings directly, so here:
+
+- JPEG files are embedded byte for byte as DCTDecode streams;
+- non-interlaced PNG without alpha keeps its IDAT data, which is a
+  FlateDecode stream with the PNG predictors;
+- single-strip TIFF compressed with Deflate, LZW or CCITT Group 4 keeps its
+  strip data;
+- anything else is decoded once and Flate compressed, with the alpha channel
+  as a soft mask.
+
+Each image becomes one page of its size at dpi. Objects are written to the file
+as soon as an image is added and only the page list is kept until close, so a
+long series of images goes into one PDF without holding them in memory. A file
+added again is drawn from the image object written the first time.
+"""
+
+import os
+import struct
+import zlib
+from typing import Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from src.utils.tracing import span, file_size
+from src.utils.image_cache import file_key
+
+# Bytes copied per read when passing file data through
+CHUNK_SIZE = 1024 * 1024
+
+png_signature = b"\x89PNG\r\n\x1a\n"
+png_chunk_header = struct.Struct(">I4s")
+
+# TIFF tags
+TIFF_BITS = 258
+TIFF_COMPRESSION = 259
+TIFF_PHOTOMETRIC = 262
+TIFF_FILL_ORDER = 266
+TIFF_STRIP_OFFSETS = 273
+TIFF_SAMPLES = 277
+TIFF_STRIP_BYTES = 279
+TIFF_PLANAR = 284
+TIFF_PREDICTOR = 317
+TIFF_EXTRA_SAMPLES = 338
+
+color_spaces = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}
+
+# An image stream: XObject dictionary entries and the data, in chunks
+Stream = Tuple[List[str], int, Iterable[bytes]]
+
+
+def _file_range(path: str, offset: int, length: int) -> Iterable[bytes]:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                raise RuntimeError(f"{os.path.basename(path)} is truncated")
+            length -= len(data)
+            yield data
+
+
+def _image_entries(width: int, height: int, color_space: str, bits: int) -> List[str]:
+    return [
+        "/Type /XObject", "/Subtype /Image",
+        f"/Width {width}", f"/Height {height}",
+        f"/ColorSpace {color_space}", f"/BitsPerComponent {bits}",
+    ]
+
+
+def _indexed(palette: bytes) -> str:
+    return f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+
+
+def jpeg_stream(in_path: str, img: Image.Image) -> Optional[Stream]:
+    """The JPEG file as a DCTDecode stream, or None if PDF cannot show it as it is."""
+    if img.mode not in ("L", "RGB", "CMYK"):
+        return None
+    entries = _image_entries(img.width, img.height, color_spaces[len(img.mode)], 8)
+    entries.append("/Filter /DCTDecode")
+    if img.mode == "CMYK" and "adobe" in img.info:
+        # Adobe writes CMYK JPEGs inverted
+        entries.append("/Decode [1 0 1 0 1 0 1 0]")
+    length = file_size(in_path)
+    return entries, length, _file_range(in_path, 0, length)
+
+
+def png_stream(in_path: str) -> Optional[Stream]:
+    """The IDAT data of a PNG as a FlateDecode stream, or None if it needs decoding."""
+    idat = []
+    palette = b""
+    with open(in_path, "rb") as f:
+        if f.read(8) != png_signature:
+            return None
+        while True:
+            header = f.read(png_chunk_header.size)
+            if len(header) < png_chunk_header.size:
+                return None
+            length, kind = png_chunk_header.unpack(header)
+            if kind == b"IHDR":
+                width, height, bits, color_type, _, _, interlace = struct.unpack(">IIBBBBB", f.read(13))
+                f.seek(4, os.SEEK_CUR)
+                # Alpha, 16-bit samples and interlacing have no PDF equivalent
+                if color_type not in (0, 2, 3) or bits > 8 or interlace:
+                    return None
+                continue
+            if kind == b"tRNS":
+                return None
+            if kind == b"PLTE":
+                palette = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                continue
+            if kind == b"IDAT":
+                idat.append((f.tell(), length))
+            elif kind == b"IEND":
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    if not idat:
+        return None
+    colors = {0: 1, 2: 3, 3: 1}[color_type]
+    color_space = _indexed(palette) if color_type == 3 else color_spaces[colors]
+    entries = _image_entries(width, height, color_space, bits)
+    entries.append("/Filter /FlateDecode")
+    entries.append(f"/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent {bits} /Columns {width} >>")
+
+    def chunks():
+        for offset, length in idat:
+            yield from _file_range(in_path, offset, length)
+
+    return entries, sum(length for _, length in idat), chunks()
+
+
+def tiff_stream(in_path: str, img: Image.Image) -> Optional[Stream]:
+    """The strip of a single-strip Deflate, LZW or Group 4 TIFF, or None if it needs decoding."""
+    tags = img.tag_v2
+    offsets, counts = tags.get(TIFF_STRIP_OFFSETS), tags.get(TIFF_STRIP_BYTES)
+    if not offsets or not counts or len(offsets) != 1 or len(counts) != 1:
+        return None
+    if tags.get(TIFF_PLANAR, 1) != 1 or tags.get(TIFF_FILL_ORDER, 1) != 1 or tags.get(TIFF_EXTRA_SAMPLES):
+        return None
+    compression = tags.get(TIFF_COMPRESSION, 1)
+    photometric = tags.get(TIFF_PHOTOMETRIC)
+    samples = tags.get(TIFF_SAMPLES, 1)
+    width, height = img.size
+
+    if compression == 4 and img.mode == "1":
+        entries = _image_entries(width, height, "/DeviceGray", 1)
+        entries.append("/Filter /CCITTFaxDecode")
+        black_is_1 = " /BlackIs1 true" if photometric == 1 else ""
+        entries.append(f"/DecodeParms << /K -1 /Columns {width} /Rows {height}{black_is_1} >>")
+    elif compression in (5, 8, 32946):
+        if (img.mode, photometric) not in (("L", 0), ("L", 1), ("RGB", 2), ("CMYK", 5)):
+            return None
+        colors = samples
+        if len(img.mode) != colors or tags.get(TIFF_BITS, (8,))[0] != 8:
+            return None
+        entries = _image_entries(width, height, color_spaces[colors], 8)
+        entries.append("/Filter " + ("/LZWDecode" if compression == 5 else "/FlateDecode"))
+        if photometric == 0:
+            entries.append("/Decode [1 0]")
+        predictor = tags.get(TIFF_PREDICTOR, 1)
+        if predictor == 2:
+            entries.append(f"/DecodeParms << /Predictor 2 /Colors {colors} /BitsPerComponent 8 /Columns {width} >>")
+        elif predictor != 1:
+            return None
+    else:
+        return None
+    return entries, counts[0], _file_range(in_path, offsets[0], counts[0])
+
+
+def pixel_streams(img: Image.Image, level: int = 6) -> Tuple[Stream, Optional[Stream]]:
+    """Decoded pixels as a Flate stream, plus the alpha channel as a soft mask stream if any."""
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    alpha = None
+    if img.mode in ("LA", "RGBA"):
+        alpha = img.getchannel("A")
+        img = img.convert(img.mode[:-1])
+    elif img.mode == "PA":
+        alpha = img.getchannel("A")
+        img = img.convert("RGB")
+
+    if img.mode == "1":
+        color_space, bits = "/DeviceGray", 1
+    elif img.mode == "P":
+        palette = img.getpalette()[: 3 * 256]
+        color_space, bits = _indexed(bytes(palette)), 8
+    elif img.mode in ("L", "RGB", "CMYK"):
+        color_space, bits = color_spaces[len(img.mode)], 8
+    else:
+        img = img.convert("RGB")
+        color_space, bits = "/DeviceRGB", 8
+
+    def flate(image, space, depth):
+        data = zlib.compress(image.tobytes(), level)
+        entries = _image_entries(image.width, image.height, space, depth)
+        entries.append("/Filter /FlateDecode")
+        return entries, len(data), [data]
+
+    mask = flate(alpha, "/DeviceGray", 8) if alpha is not None and alpha.getextrema() != (255, 255) else None
+    return flate(img, color_space, bits), mask
+
+
+class PdfImageWriter:
+    """
+    Write images as the pages of one PDF, passing their encoded data through
+    where possible; see the module docstring.
+
+        with PdfImageWriter(out_path, dpi=300) as pdf:
+            for path in paths:
+                pdf.add_image(path)
+    """
+
+    def __init__(self, out_path: str, dpi: float = 300):
+        self.out_path = out_path
+        self.dpi = dpi
+        self.pages = []
+        # file_key -> (image object number, pixel size, method) of the files written so far
+        self._images = {}
+        # Object number -> file offset; 1 and 2 are the catalog and the page tree, written last
+        self._offsets = {}
+        self._next_id = 3
+        self._file = open(out_path, "wb")
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+
+    def _new_id(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _begin(self, obj_id: int):
+        self._offsets[obj_id] = self._file.tell()
+        self._write(f"{obj_id} 0 obj\n".encode("ascii"))
+
+    def _object(self, obj_id: int, body: str):
+        self._begin(obj_id)
+        self._write(body.encode("latin-1") + b"\nendobj\n")
+
+    def _stream(self, obj_id: int, entries: List[str], length: int, chunks: Iterable[bytes]):
+        self._begin(obj_id)
+        self._write(f"<< {' '.join(entries)} /Length {length} >>\nstream\n".encode("latin-1"))
+        written = 0
+        for data in chunks:
+            self._write(data)
+            written += len(data)
+        if written != length:
+            raise RuntimeError(f"Stream of object {obj_id} has {written} bytes, expected {length}")
+        self._write(b"\nendstream\nendobj\n")
+
+    def image_streams(self, image: Union[str, Image.Image]) -> Tuple[str, Tuple[int, int], Stream, Optional[Stream]]:
+        """(method, pixel size, image stream, soft mask stream) for a path or a Pillow image."""
+        if not isinstance(image, str):
+            return "flate", image.size, *pixel_streams(image)
+        with Image.open(image) as img:
+            stream, method = None, "flate"
+            if img.format == "JPEG":
+                stream, method = jpeg_stream(image, img), "dct"
+            elif img.format == "PNG":
+                stream, method = png_stream(image), "png"
+            elif img.format == "TIFF":
+                stream, method = tiff_stream(image, img), "tiff"
+            if stream is not None:
+                return method, img.size, stream, None
+            img.load()
+            return "flate", img.size, *pixel_streams(img)
+
+    def add_image(self, image: Union[str, Image.Image], dpi: Optional[float] = None) -> str:
+        """
+        Append image (a path or a Pillow image) as a page sized at dpi, the
+        writer's dpi by default. Returns how the data was stored: "dct", "png"
+        or "tiff" when passed through, "flate" when the pixels were compressed.
+        """
+        dpi = dpi or self.dpi
+        key = file_key(image) if isinstance(image, str) else None
+        if key in self._images:
+            image_id, (width, height), method = self._images[key]
+            stream = None
+        else:
+            method, (width, height), stream, mask = self.image_streams(image)
+        with span("encode", writer="pdf_writer", method=method) as sp:
+            start = self._file.tell()
+            if stream is not None:
+                image_id = self._new_id()
+                entries, length, chunks = stream
+                if mask is not None:
+                    mask_id = self._new_id()
+                    self._stream(mask_id, *mask)
+                    entries = entries + [f"/SMask {mask_id} 0 R"]
+                self._stream(image_id, entries, length, chunks)
+                if key is not None:
+                    self._images[key] = image_id, (width, height), method
+
+            w_pt, h_pt = width / dpi * 72, height / dpi * 72
+            content = f"q {w_pt:.4f} 0 0 {h_pt:.4f} 0 0 cm /Im0 Do Q".encode("ascii")
+            content_id = self._new_id()
+            self._stream(content_id, [], len(content), [content])
+
+            page_id = self._new_id()
+            self._object(
+                page_id,
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.4f} {h_pt:.4f}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>",
+            )
+            self.pages.append(page_id)
+            sp.add_bytes(written=self._file.tell() - start)
+        return method
+
+    def close(self):
+        """Write the page tree, the catalog and the cross-reference table, and close the file."""
+        if self._file.closed:
+            return
+        if not self.pages:
+            self.abort()
+            raise RuntimeError("No images were added to the PDF")
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>")
+        self._object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._file.tell()
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self._next_id)]
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
+        self._file.close()
+
+    def abort(self):
+        """Close and remove the unfinished file."""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.out_path):
+            os.remove(self.out_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_images_pdf(images: Iterable[Union[str, Image.Image]], out_path: str, dpi: float = 300) -> List[str]:
+    """Write images as the pages of out_path; returns the storage method of each page."""
+    with PdfImageWriter(out_path, dpi=dpi) as pdf:
+        return [pdf.add_image(image) for image in images]
@@ -1,13 +1,28 @@
-from PIL import Image
+from PIL import Image, ExifTags
 from typing import Optional, Callable
+import io
 import os
 import shutil
 import numpy as np
 
 from src.utils.logger import Logger
+from src.utils.tracing import span, traced, file_size
+from src.utils.image_cache import get_image_cache, file_key
 
 from src.utils.commons import confirm_overwrite
 from src.utils.commons import confirm_dir_existence
+from src.utils.commons import heif_formats
+
+try:
+    import pillow_heif
+    # Registered once per process: Image.open reads HEIC/HEIF everywhere from here on
+    pillow_heif.register_heif_opener()
+    # Phone photos are grids of tiles, which libheif decodes in parallel without the GIL
+    pillow_heif.options.DECODE_THREADS = max(1, os.cpu_count() or 1)
+    heif_available = True
+except ImportError:
+    pillow_heif = None
+    heif_available = False
 
 
 def remove_alpha_channel(img: Image.Image, bg_color=(255, 255, 255)) -> Image.Image:
@@ -21,6 +36,125 @@ def remove_alpha_channel(img: Image.Image, bg_color=(255, 255, 255)) -> Image.Im
     return img
 
 
+def heif_thumbnail(in_path: str, min_size: int = 0) -> Optional[Image.Image]:
+    """
+    Thumbnail embedded in a HEIC/HEIF file, without decoding the main image:
+    the smallest one with a side of at least min_size px, else the largest.
+    Returns None if the file has no thumbnail.
+    """
+    if pillow_heif is None:
+        return None
+    heif = pillow_heif.open_heif(in_path)
+    primary = heif[getattr(heif, "primary_index", 0)]
+    boxes = primary.info.get("thumbnails") or []
+    if not boxes:
+        return None
+    candidates = sorted(range(len(boxes)), key=lambda i: boxes[i])
+    index = next((i for i in candidates if boxes[i] >= min_size), candidates[-1])
+    with span("decode", thumbnail=boxes[index]):
+        return primary.get_thumbnail(index).to_pillow()
+
+
+def exif_thumbnail(img: Image.Image) -> Optional[Image.Image]:
+    """JPEG thumbnail stored in the EXIF block (IFD1) of img, if any."""
+    raw = img.info.get("exif")
+    if not raw:
+        return None
+    exif = img.getexif()
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset, length = ifd1.get(0x0201), ifd1.get(0x0202)
+    if not offset or not length:
+        return None
+    # Offsets count from the TIFF header, which follows the "Exif\0\0" marker
+    start = 6 if raw.startswith(b"Exif\x00\x00") else 0
+    data = raw[start + offset:start + offset + length]
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    thumb = Image.open(io.BytesIO(data))
+    thumb.load()
+    return thumb
+
+
+def _tiff_reduced_frame(img: Image.Image, size: tuple[int, int]) -> bool:
+    """
+    Point img at the smallest reduced-resolution frame still covering size;
+    True if found. Only top-level frames are reachable through Image.seek:
+    reduced images kept in SubIFDs are left to the full decode and reduce.
+    """
+    best = None
+    for index in range(getattr(img, "n_frames", 1)):
+        img.seek(index)
+        # NewSubfileType bit 0: reduced-resolution version of another image
+        reduced = index > 0 and img.tag_v2.get(254, 0) & 1
+        if reduced and img.width >= size[0] and img.height >= size[1]:
+            if best is None or img.width < best[0]:
+                best = (img.width, index)
+    img.seek(best[1] if best is not None else 0)
+    return best is not None
+
+
+def open_preview(in_path: str, size: tuple[int, int]) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Decode in_path at about the resolution needed to fill size, by the cheapest
+    route available: HEIF or EXIF embedded thumbnail, JPEG DCT-scaled decode
+    (draft), TIFF reduced-resolution subfile, else a full decode followed by
+    Image.reduce. The result is at least size unless the source is smaller.
+    Returns (image, size of the source).
+    """
+    ext = os.path.splitext(in_path)[1].lower()
+    if ext in heif_formats:
+        with Image.open(in_path) as img:
+            orig_size = img.size
+        thumb = heif_thumbnail(in_path, min_size=max(size))
+        if thumb is not None and thumb.width >= size[0] and thumb.height >= size[1]:
+            return thumb, orig_size
+    img = Image.open(in_path)
+    orig_size = img.size
+    with span("decode", preview=True):
+        if img.format == "JPEG":
+            thumb = exif_thumbnail(img)
+            if thumb is not None and thumb.width >= size[0] and thumb.height >= size[1]:
+                img.close()
+                return thumb, orig_size
+            # libjpeg scales by 1/2, 1/4 or 1/8 while decoding
+            img.draft("RGB" if img.mode not in ("L", "CMYK") else img.mode, size)
+        elif img.format == "TIFF":
+            _tiff_reduced_frame(img, size)
+        img.load()
+    if getattr(img, "fp", None) is not None:
+        # Multi-frame files stay open after load(); return a detached copy
+        detached = img.copy()
+        img.close()
+        img = detached
+    factor = min(img.width // size[0], img.height // size[1]) if size[0] and size[1] else 1
+    if factor >= 2:
+        with span("reduce", factor=factor):
+            img = img.reduce(factor)
+    return img, orig_size
+
+
+def load_image(in_path: str, cache: bool = False) -> Image.Image:
+    """
+    Fully decoded image. With cache, an unchanged file is decoded once per
+    session and the shared decoded image is returned; do not modify it in place.
+    """
+    def decode():
+        with span("decode"):
+            img = Image.open(in_path)
+            img.load()
+        if getattr(img, "fp", None) is not None:
+            # Multi-frame files stay open after load(); the cache must not pin the file
+            detached = img.copy()
+            detached.format = img.format
+            img.close()
+            img = detached
+        return img
+
+    if not cache:
+        return decode()
+    return get_image_cache().cached(file_key(in_path, "decoded"), decode)
+
+
 def get_raster_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
     try:
         img = Image.open(in_path)
@@ -29,17 +163,20 @@ def get_raster_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
         raise 
 
 
+@traced()
 def grayscale_image(
     in_path: str, 
     out_dir: str, 
     binarize: bool = False, 
     save_image: bool = True, 
     preview_callback: Optional[Callable] = None, 
-    logger: Optional[Logger] = None
+    logger: Optional[Logger] = None,
+    cache: bool = False
 ) -> Optional[str]:
     """
     Turn image into grayscale, with optional contrast enhancement and binarization.
     If the input has an alpha channel, it will be separated and restored at the end.
+    cache: take the decoded input from the session image cache.
     """
     
     base_name = os.path.splitext(os.path.basename(in_path))[0]
@@ -47,7 +184,7 @@ def grayscale_image(
     suffix = "gray_binarized" if binarize else "gray"
     out_path = os.path.join(out_dir, f"{base_name}_{suffix}{in_fmt}")
     if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
-        img = Image.open(in_path)
+        img = load_image(in_path, cache=cache)
         is_bw = img.mode == "1" or (img.mode == "L" and set(img.getextrema()) <= {0, 255})
         if not is_bw:
             if img.mode == "RGBA":
@@ -82,7 +219,9 @@ def grayscale_image(
                 img = Image.merge("LA", (img, alpha))
             
             if save_image:
-                img.save(out_path)
+                with span("encode") as sp:
+                    img.save(out_path)
+                    sp.add_bytes(written=file_size(out_path))
                 logger.info(
                     f"Grayscale {os.path.basename(in_path)} -> {os.path.basename(out_path)} completed."
                 ) if logger else None
@@ -93,7 +232,7 @@ def grayscale_image(
                 ) if logger else None
             preview_callback(img) if preview_callback else None                
         else:
-            preview_callback(Image.open(in_path)) if preview_callback else None
+            preview_callback(img) if preview_callback else None
             shutil.copy(in_path, out_path) if save_image else None
             out_path = out_path if save_image else None
             logger.info(
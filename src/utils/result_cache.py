@@ -0,0 +1,236 @@
+"""Content-addressed cache of conversion results.
+
+A result is keyed on hash(input bytes + converter and its version + parameters +
+tool versions)
+and stored once under the cache directory. On a hit the artifact is hard-linked
+(or copied, across volumes) to the expected output path, and nothing is done at
+all if the output already holds the cached bytes. File digests are memoized by
+(size, mtime), so an unchanged library is re-checked with stat calls only.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+import src.utils.converter as cv
+from src.utils.logger import Logger
+from src.utils.commons import get_cache_dir
+from src.utils.commons import get_tool_version
+from src.utils.commons import confirm_overwrite
+from src.utils.commons import confirm_dir_existence
+from src.utils.meta_index import file_digest
+
+class ResultCache:
+    """Conversion result cache shared by batch runs."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 4 * 1024 ** 3):
+        self.cache_dir = cache_dir or get_cache_dir("results")
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "results.sqlite3"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    ext TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    used REAL NOT NULL
+                )"""
+            )
+
+    def digest(self, path: str) -> str:
+        """
+        Content digest of an input file, recomputed only when its size or mtime
+        changed. Only inputs are indexed; artifacts and outputs are hashed directly.
+        """
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, digest),
+            )
+        return digest
+
+    def make_key(self, in_path: str, func, params: dict, tools: tuple, version: int = 1) -> str:
+        h = hashlib.sha256()
+        h.update(self.digest(in_path).encode())
+        h.update(f"{func.__module__}.{func.__qualname__}@{version}".encode())
+        h.update(json.dumps(params, sort_keys=True).encode())
+        for tool in tools:
+            h.update(f"{tool}={get_tool_version(tool)}".encode())
+        return h.hexdigest()
+
+    def _object_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], key + ext)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Path of the cached artifact for key, or None. Entries altered on disk are dropped."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ext, size, mtime_ns FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        obj = self._object_path(key, row[0])
+        try:
+            st = os.stat(obj)
+        except OSError:
+            st = None
+        if st is None or st.st_size != row[1] or st.st_mtime_ns != row[2]:
+            # The artifact was removed, or edited through a hard-linked output
+            self.forget(key)
+            return None
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return obj
+
+    def store(self, key: str, out_path: str):
+        ext = os.path.splitext(out_path)[1].lower()
+        obj = self._object_path(key, ext)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        if os.path.exists(obj):
+            os.remove(obj)
+        try:
+            os.link(out_path, obj)
+        except OSError:
+            shutil.copy2(out_path, obj)
+        st = os.stat(obj)
+        digest = file_digest(obj)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, ext, size, mtime_ns, digest, used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, ext, st.st_size, st.st_mtime_ns, digest, time.time()),
+            )
+
+    def forget(self, key: str):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT ext FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        if row:
+            try:
+                os.remove(self._object_path(key, row[0]))
+            except OSError:
+                pass
+
+    def is_materialized(self, key: str, obj: str, out_path: str) -> bool:
+        """True if out_path already holds the bytes of the cached artifact obj of key."""
+        if not os.path.exists(out_path):
+            return False
+        try:
+            if os.path.samefile(obj, out_path):
+                return True
+        except OSError:
+            return False
+        if os.path.getsize(obj) != os.path.getsize(out_path):
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM results WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == file_digest(out_path)
+
+    def materialize(self, obj: str, out_path: str):
+        tmp_path = out_path + ".imbridge-tmp"
+        try:
+            os.link(obj, tmp_path)
+        except OSError:
+            shutil.copy2(obj, tmp_path)
+        os.replace(tmp_path, out_path)
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Drop least recently used artifacts until the cache fits into max_bytes,
+        and the digests of input files that no longer exist. Returns the number
+        of artifacts dropped. Stats every indexed input, so keep it off the Tk thread.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            rows = self._conn.execute("SELECT key, size FROM results ORDER BY used DESC").fetchall()
+        total = 0
+        dropped = 0
+        for key, size in rows:
+            total += size
+            if total > max_bytes:
+                self.forget(key)
+                dropped += 1
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM files")]
+        # Rows of the cache's own objects were written by earlier versions
+        objects_dir = os.path.join(os.path.abspath(self.objects_dir), "")
+        gone = [(p,) for p in paths if not os.path.exists(p) or os.path.abspath(p).startswith(objects_dir)]
+        if gone:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        return dropped
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def cached_convert(
+    cache: ResultCache,
+    in_path: str,
+    out_dir: str,
+    out_fmt: str,
+    logger: Optional[Logger] = None,
+    **kwargs,
+) -> Optional[str]:
+    """
+    convert_file with result reuse: unchanged inputs are skipped when the output
+    is already in place, or linked from the cache, and only misses are converted.
+    """
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    selected = cv.select_converter(in_fmt, out_fmt)
+    if selected is None:
+        return cv.convert_file(in_path, out_dir, out_fmt, logger=logger, **kwargs)
+    func, params, version, tools = selected
+    out_path = cv.get_out_path(in_path, out_dir, out_fmt)
+    key = cache.make_key(in_path, func, cv.get_converter_params(params, out_fmt, **kwargs), tools, version)
+
+    obj = cache.lookup(key)
+    if obj is not None:
+        if cache.is_materialized(key, obj, out_path):
+            logger.info(f"Unchanged {os.path.basename(in_path)}, skipped.") if logger else None
+            return out_path
+        if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
+            cache.materialize(obj, out_path)
+            logger.info(
+                f"Format Conversion {os.path.basename(in_path)} -> {os.path.basename(out_path)} restored from cache."
+            ) if logger else None
+            return out_path
+        return None
+
+    if os.path.exists(out_path) and os.stat(out_path).st_nlink > 1:
+        # Converters overwrite in place; detach a linked output so the artifact survives
+        shutil.copy2(out_path, out_path + ".imbridge-tmp")
+        os.replace(out_path + ".imbridge-tmp", out_path)
+    result = cv.convert_file(in_path, out_dir, out_fmt, logger=logger, **kwargs)
+    if result and os.path.exists(result):
+        try:
+            cache.store(key, result)
+        except Exception as e:
+            logger.warning(f"Failed to cache result of {os.path.basename(in_path)}: {e}", messagebox_flag=False) if logger else None
+    return result
@@ -0,0 +1,192 @@
+"""Shared job scheduler.
+
+All background work of the GUI goes through one pool of worker threads with
+three priority classes: interactive previews before user-initiated saves before
+background batch jobs. Some workers are reserved for interactive jobs, so a
+preview still starts immediately while every other worker is busy with a batch.
+
+Jobs submitted with a key supersede the earlier job with the same key: a
+superseded job that has not started is cancelled, and the result of one that is
+already running is dropped by watch().
+
+current_priority() tells code running in a job which class it belongs to, so
+shared locks can serve interactive work first (see documents.fitz_lock).
+"""
+
+import os
+import heapq
+import itertools
+import threading
+import tkinter
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+INTERACTIVE = 0
+SAVE = 1
+BATCH = 2
+
+_local = threading.local()
+
+
+def current_priority() -> int:
+    """
+    Priority of the job running on this thread. Outside of jobs the Tk thread
+    counts as interactive and any other thread as batch.
+    """
+    priority = getattr(_local, "priority", None)
+    if priority is not None:
+        return priority
+    return INTERACTIVE if threading.current_thread() is threading.main_thread() else BATCH
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "func", "args", "kwargs", "future")
+
+    def __init__(self, priority, seq, func, args, kwargs):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class JobScheduler:
+    """Priority thread pool; see the module docstring."""
+
+    def __init__(self, workers: Optional[int] = None, reserved: int = 1):
+        """
+        workers: threads that take jobs of any priority.
+        reserved: additional threads that only take interactive jobs.
+        """
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.reserved = reserved
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._latest = {}
+        self._shutdown = False
+        self._threads = []
+        for i in range(self.workers + self.reserved):
+            interactive_only = i >= self.workers
+            name = f"{'PreviewWorker' if interactive_only else 'JobWorker'}_{i}"
+            thread = threading.Thread(target=self._work, args=(interactive_only,), name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func: Callable, *args, priority: int = BATCH, key: Optional[str] = None, **kwargs) -> Future:
+        """Queue func(*args, **kwargs) and return its Future."""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            job = _Job(priority, next(self._seq), func, args, kwargs)
+            if key is not None:
+                previous = self._latest.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._latest[key] = job.future
+            heapq.heappush(self._heap, job)
+            self._cond.notify_all()
+        return job.future
+
+    def is_current(self, key: str, future: Future) -> bool:
+        """False once a newer job has been submitted with the same key."""
+        return self._latest.get(key) is future
+
+    def discard(self, key: str):
+        """Cancel the latest job with key and drop its result if it is already running."""
+        with self._cond:
+            previous = self._latest.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for job in self._heap if not job.future.cancelled())
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._shutdown = True
+            for job in self._heap:
+                job.future.cancel()
+            self._heap.clear()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _take(self, interactive_only: bool) -> Optional[_Job]:
+        while self._heap and self._heap[0].future.cancelled():
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        if interactive_only and self._heap[0].priority != INTERACTIVE:
+            return None
+        return heapq.heappop(self._heap)
+
+    def _work(self, interactive_only: bool):
+        while True:
+            with self._cond:
+                job = self._take(interactive_only)
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._take(interactive_only)
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            _local.priority = job.priority
+            try:
+                result = job.func(*job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finally:
+                _local.priority = None
+
+    def watch(
+        self,
+        widget,
+        future: Future,
+        on_done: Callable,
+        on_error: Optional[Callable] = None,
+        key: Optional[str] = None,
+        poll_ms: int = 30,
+    ):
+        """
+        Call on_done(result) or on_error(exception) on the Tk thread once future
+        completes. Nothing is called if the job was cancelled or superseded.
+        """
+        def poll():
+            if not future.done():
+                try:
+                    widget.after(poll_ms, poll)
+                except tkinter.TclError:
+                    pass
+                return
+            if future.cancelled() or (key is not None and not self.is_current(key, future)):
+                return
+            error = future.exception()
+            if error is not None:
+                on_error(error) if on_error else None
+            else:
+                on_done(future.result())
+
+        widget.after(poll_ms, poll)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    """The process-wide scheduler shared by all tabs, created on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -0,0 +1,122 @@
+"""Tiles for the zoomable preview.
+
+A page shown at some zoom is split into TILE_SIZE pixel squares. Only the tiles
+inside the viewport are rendered, clipped to their part of the page, so zooming
+deep into a large drawing never rasterizes the whole page at that resolution.
+PDF tiles are clipped one by one by PyMuPDF. cairosvg parses and draws the
+whole document on every render, so the missing SVG tiles of a view are cut from
+one render of the rectangle covering them. Rendered tiles are kept in an LRU cache bounded in
+bytes and keyed on the file's mtime, so an edited file is rendered afresh.
+"""
+
+import os
+import math
+import threading
+from typing import Optional, Tuple, List
+
+from PIL import Image
+
+import src.utils.vector as vec
+from src.utils.image_cache import ImageCache
+
+TILE_SIZE = 256
+
+# Key: (path, mtime_ns, page, zoom, column, row)
+TileKey = Tuple[str, int, int, float, int, int]
+
+
+class TileCache(ImageCache):
+    """LRU of rendered tiles, bounded by their pixel bytes."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2):
+        super().__init__(max_bytes)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tile_cache() -> TileCache:
+    """The process-wide tile cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TileCache()
+        return _cache
+
+
+def tile_key(path: str, page: int, zoom: float, column: int, row: int) -> TileKey:
+    # Zoom is rounded so that the same zoom step always hits the same tiles
+    return (path, os.stat(path).st_mtime_ns, page, round(zoom, 6), column, row)
+
+
+def visible_tiles(
+    page_size: Tuple[float, float],
+    zoom: float,
+    view: Tuple[float, float, float, float],
+) -> List[Tuple[int, int]]:
+    """
+    (column, row) of the tiles overlapping view = (x0, y0, x1, y1), in pixels
+    of the page at zoom, nearest to the centre of the view first.
+    """
+    cols = math.ceil(page_size[0] * zoom / TILE_SIZE)
+    rows = math.ceil(page_size[1] * zoom / TILE_SIZE)
+    x0, y0, x1, y1 = view
+    c0, c1 = max(0, int(x0 // TILE_SIZE)), min(cols - 1, int((x1 - 1) // TILE_SIZE))
+    r0, r1 = max(0, int(y0 // TILE_SIZE)), min(rows - 1, int((y1 - 1) // TILE_SIZE))
+    cx, cy = (x0 + x1) / 2 / TILE_SIZE - 0.5, (y0 + y1) / 2 / TILE_SIZE - 0.5
+    tiles = [(c, r) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+    tiles.sort(key=lambda t: (t[0] - cx) ** 2 + (t[1] - cy) ** 2)
+    return tiles
+
+
+def render_tile(
+    path: str,
+    page: int,
+    zoom: float,
+    column: int,
+    row: int,
+    page_size: Tuple[float, float],
+    cache: Optional[TileCache] = None,
+) -> Image.Image:
+    """One tile of the page at zoom, from the cache when it was rendered before."""
+    cache = cache if cache is not None else get_tile_cache()
+    key = tile_key(path, page, zoom, column, row)
+    img = cache.get(key)
+    if img is not None:
+        return img
+    step = TILE_SIZE / zoom
+    x0, y0 = column * step, row * step
+    # Edge tiles stop at the page border
+    clip = (x0, y0, min(x0 + step, page_size[0]), min(y0 + step, page_size[1]))
+    img = vec.render_region(path, zoom, clip, page=page)
+    cache.put(key, img)
+    return img
+
+
+def render_tiles(
+    path: str,
+    page: int,
+    zoom: float,
+    tiles: List[Tuple[int, int]],
+    page_size: Tuple[float, float],
+    cache: Optional[TileCache] = None,
+):
+    """Render the (column, row) tiles of the page at zoom into the cache."""
+    cache = cache if cache is not None else get_tile_cache()
+    if not path.lower().endswith(".svg"):
+        for column, row in tiles:
+            render_tile(path, page, zoom, column, row, page_size, cache=cache)
+        return
+    tiles = [(c, r) for c, r in tiles if cache.get(tile_key(path, page, zoom, c, r)) is None]
+    if not tiles:
+        return
+    c0, c1 = min(c for c, _ in tiles), max(c for c, _ in tiles)
+    r0, r1 = min(r for _, r in tiles), max(r for _, r in tiles)
+    step = TILE_SIZE / zoom
+    clip = (c0 * step, r0 * step, min((c1 + 1) * step, page_size[0]), min((r1 + 1) * step, page_size[1]))
+    img = vec.render_region(path, zoom, clip, page=page)
+    for column, row in tiles:
+        left, top = (column - c0) * TILE_SIZE, (row - r0) * TILE_SIZE
+        box = (left, top, min(left + TILE_SIZE, img.width), min(top + TILE_SIZE, img.height))
+        cache.put(tile_key(path, page, zoom, column, row), img.crop(box))
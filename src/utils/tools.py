@@ -0,0 +1,282 @@
+"""External tool runner.
+
+Ghostscript, pstoedit, potrace and pdftops are run as asyncio subprocesses on
+one background event loop, so any number of tool processes can be in flight
+without a thread per process. Each tool has a concurrency limit (a semaphore)
+and a wall-clock timeout after which the process is killed. stdout and stderr
+are read line by line while the tool runs and passed to the logger at debug
+level; the tail of stderr is kept for error messages.
+
+On POSIX every tool runs in its own process group with RLIMIT_AS and
+RLIMIT_CPU set, and the whole group is killed on timeout. The limits are set
+by a shell ulimit wrapper that then execs the tool, so they are in force
+before the tool's first instruction; no Python code runs in the forked child,
+which could deadlock on a lock held by one of this process's threads.
+Failures raise ToolError, classified as timeout, oom, crash or error; the last
+failure on a thread is also kept for take_error(), so a batch can report why a
+file failed even when the converter only logged it.
+
+run_tool() blocks the calling thread like subprocess.run; submit_tool() returns
+a Future instead.
+"""
+
+import os
+import signal
+import asyncio
+import threading
+import subprocess
+from concurrent.futures import Future
+from typing import Optional, List, Dict, Tuple
+
+from src.utils.logger import Logger
+from src.utils.tracing import span
+
+# Processes per tool allowed to run at the same time
+tool_limits: Dict[str, int] = {
+    "gs": max(2, (os.cpu_count() or 2)),
+    "pstoedit": 2,
+    "potrace": max(2, (os.cpu_count() or 2)),
+    "pdftops": 4,
+}
+default_limit = 4
+
+# Seconds before a tool process is considered hung and killed
+tool_timeouts: Dict[str, float] = {
+    "gs": 300,
+    "pstoedit": 300,
+    "potrace": 120,
+    "pdftops": 120,
+}
+default_timeout = 600
+
+# Address space (bytes) and CPU time (seconds) allowed to one tool process
+tool_memory_limits: Dict[str, int] = {
+    "gs": 4 * 1024 ** 3,
+    "pstoedit": 2 * 1024 ** 3,
+    "potrace": 2 * 1024 ** 3,
+    "pdftops": 2 * 1024 ** 3,
+}
+default_memory_limit = 4 * 1024 ** 3
+
+# Lines of stderr kept for error messages
+stderr_tail = 20
+
+# stderr patterns of tools that ran out of memory
+_oom_markers = (b"VMerror", b"bad_alloc", b"out of memory", b"Out of memory", b"Cannot allocate memory", b"MemoryError")
+
+_aliases = {"gswin64c": "gs", "gswin32c": "gs"}
+
+
+def tool_name(cmd: List[str]) -> str:
+    name = os.path.splitext(os.path.basename(str(cmd[0])))[0].lower()
+    return _aliases.get(name, name)
+
+
+class ToolError(subprocess.CalledProcessError):
+    """
+    A failed tool run. kind is "timeout" (wall clock or CPU limit), "oom",
+    "crash" (killed by a signal) or "error" (non-zero exit).
+    """
+
+    def __init__(self, kind: str, returncode, cmd, output=None, stderr=None, detail: str = ""):
+        super().__init__(returncode, cmd, output, stderr)
+        self.kind = kind
+        self.tool = tool_name(cmd)
+        self.detail = detail
+
+    def __str__(self):
+        tail = (self.stderr or b"").decode("utf-8", "replace").strip().splitlines()[-1:]
+        return f"{self.tool} {self.kind}: {self.detail}" + (f" ({tail[0]})" if tail else "")
+
+
+def classify(returncode: int, stderr: bytes, timed_out: bool = False) -> Tuple[str, str]:
+    """(kind, detail) of a failed run."""
+    if timed_out:
+        return "timeout", "killed after exceeding its time limit"
+    if any(marker in stderr for marker in _oom_markers):
+        return "oom", f"ran out of memory (status {returncode})"
+    if returncode is not None and returncode < 0:
+        sig = -returncode
+        name = signal.Signals(sig).name if sig in signal.Signals._value2member_map_ else str(sig)
+        if sig == getattr(signal, "SIGXCPU", None):
+            return "timeout", "exceeded its CPU time limit"
+        if sig == signal.SIGKILL:
+            # Not killed by us, so by the CPU hard limit or the kernel OOM killer
+            return "oom", "killed by SIGKILL, most likely out of memory"
+        return "crash", f"killed by {name}"
+    return "error", f"exited with status {returncode}"
+
+
+_last_error = threading.local()
+
+
+def take_error() -> Optional[ToolError]:
+    """The last tool failure on this thread since the previous call, if any."""
+    error = getattr(_last_error, "error", None)
+    _last_error.error = None
+    return error
+
+
+def _cpu_limits(cpu: float) -> Tuple[int, int]:
+    # Soft limit sends SIGXCPU, the hard limit SIGKILL shortly after
+    cpu = max(1, int(cpu))
+    return cpu, cpu + 5
+
+
+def _ulimit_wrapper(cmd: List[str], memory: Optional[int], cpu: Optional[float]) -> List[str]:
+    """cmd started through sh, which sets the limits and then execs the tool in its place."""
+    script = []
+    if memory:
+        # Not every platform supports an address space limit
+        script.append(f"ulimit -v {memory // 1024} 2>/dev/null")
+    if cpu:
+        soft, hard = _cpu_limits(cpu)
+        script.append(f"ulimit -S -t {soft}; ulimit -H -t {hard}")
+    script.append('exec "$@"')
+    return ["/bin/sh", "-c", "; ".join(script), "sh"] + list(map(str, cmd))
+
+
+def set_tool_limit(
+    tool: str,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    memory: Optional[int] = None,
+):
+    """Change a tool's limits; takes effect for processes started afterwards."""
+    if memory is not None:
+        tool_memory_limits[tool] = memory
+    if concurrency is not None:
+        tool_limits[tool] = concurrency
+        if _instance is not None:
+            _instance.loop.call_soon_threadsafe(_instance.semaphores.pop, tool, None)
+    if timeout is not None:
+        tool_timeouts[tool] = timeout
+
+
+class ToolRunner:
+    """Owns the event loop thread and the per-tool semaphores."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._thread = threading.Thread(target=self._run_loop, name="ToolRunner", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        # Only called on the loop thread
+        if tool not in self.semaphores:
+            self.semaphores[tool] = asyncio.Semaphore(tool_limits.get(tool, default_limit))
+        return self.semaphores[tool]
+
+    async def _pump(self, stream, tool: str, label: str, lines: List[bytes], logger: Optional[Logger]):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            lines.append(line)
+            logger.debug(f"[{tool} {label}] {line.decode('utf-8', 'replace').rstrip()}") if logger else None
+
+    async def run(
+        self,
+        cmd: List[str],
+        timeout: Optional[float] = None,
+        logger: Optional[Logger] = None,
+        **popen_kwargs,
+    ) -> subprocess.CompletedProcess:
+        tool = tool_name(cmd)
+        timeout = timeout if timeout is not None else tool_timeouts.get(tool, default_timeout)
+        argv = list(map(str, cmd))
+        if os.name == "posix":
+            # Own process group, so that helpers spawned by the tool die with it
+            popen_kwargs.setdefault("start_new_session", True)
+            argv = _ulimit_wrapper(argv, tool_memory_limits.get(tool, default_memory_limit), timeout)
+        async with self._semaphore(tool):
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **popen_kwargs,
+            )
+            out_lines, err_lines = [], []
+            pumps = asyncio.gather(
+                self._pump(proc.stdout, tool, "out", out_lines, logger),
+                self._pump(proc.stderr, tool, "err", err_lines, logger),
+            )
+            # One deadline for reading the output and waiting for the exit
+            deadline = self.loop.time() + timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), timeout)
+                returncode = await asyncio.wait_for(proc.wait(), max(0.0, deadline - self.loop.time()))
+            except asyncio.TimeoutError:
+                self._kill(proc)
+                await proc.wait()
+                pumps.cancel()
+                raise ToolError(
+                    "timeout", proc.returncode, cmd, b"".join(out_lines), b"".join(err_lines[-stderr_tail:]),
+                    detail=f"killed after {timeout:g}s",
+                )
+            except asyncio.CancelledError:
+                self._kill(proc)
+                raise
+        return subprocess.CompletedProcess(cmd, returncode, b"".join(out_lines), b"".join(err_lines))
+
+    def _kill(self, proc):
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def submit(self, cmd: List[str], **kwargs) -> Future:
+        return asyncio.run_coroutine_threadsafe(self.run(cmd, **kwargs), self.loop)
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def _runner() -> ToolRunner:
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ToolRunner()
+        return _instance
+
+
+def submit_tool(cmd: List[str], timeout: Optional[float] = None, logger: Optional[Logger] = None, **popen_kwargs) -> Future:
+    """Start cmd on the tool loop; the Future resolves to a CompletedProcess."""
+    return _runner().submit(cmd, timeout=timeout, logger=logger, **popen_kwargs)
+
+
+def run_tool(
+    cmd: List[str],
+    check: bool = True,
+    timeout: Optional[float] = None,
+    logger: Optional[Logger] = None,
+    **popen_kwargs,
+) -> subprocess.CompletedProcess:
+    """
+    Run an external tool and wait for it, like subprocess.run(cmd, check=check).
+    Raises ToolError (a CalledProcessError carrying the stderr tail) when the
+    tool timed out, and with check=True when it failed in any other way.
+    """
+    try:
+        with span(tool_name(cmd), "subprocess", cmd=" ".join(map(str, cmd))) as sp:
+            proc = submit_tool(cmd, timeout=timeout, logger=logger, **popen_kwargs).result()
+            sp.set(returncode=proc.returncode)
+        if check and proc.returncode != 0:
+            tail = b"\n".join(proc.stderr.splitlines()[-stderr_tail:])
+            kind, detail = classify(proc.returncode, proc.stderr)
+            raise ToolError(kind, proc.returncode, cmd, proc.stdout, tail, detail=detail)
+    except ToolError as e:
+        _last_error.error = e
+        logger.error(str(e)) if logger else None
+        raise
+    return proc
@@ -0,0 +1,226 @@
+"""Stage timing for conversions.
+
+Spans nest per thread and record wall time, self time (excluding child spans)
+and optional byte counts. Nothing is recorded unless tracing is enabled, with
+enable() or by pointing the IMBRIDGE_TRACE environment variable at the output
+file; while disabled, span() hands out a shared no-op object and traced
+functions are called directly.
+
+Recorded spans can be exported as Chrome trace-event JSON (chrome://tracing,
+Perfetto) or summarized per stage with aggregate(). Only the last max_events
+spans are kept.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from collections import deque
+from typing import Optional, Callable, Dict, List, Any
+
+# Spans kept; the oldest are dropped first, so a long session cannot grow without bound
+max_events = 100_000
+
+_enabled = False
+_events: "deque[Dict[str, Any]]" = deque(maxlen=max_events)
+_thread_names: Dict[int, str] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(flag: bool = True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _events.clear()
+
+
+def get_events() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_events)
+
+
+def file_size(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+    def add_bytes(self, read: int = 0, written: int = 0):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "cat", "args", "start", "child_ns")
+
+    def __init__(self, name: str, cat: str, args: Dict[str, Any]):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.child_ns = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.perf_counter_ns() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_ns += dur
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.args["self_us"] = (dur - self.child_ns) / 1000
+        tid = threading.get_ident()
+        event = {
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": self.start / 1000,
+            "dur": dur / 1000,
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": self.args,
+        }
+        with _lock:
+            _events.append(event)
+            if tid not in _thread_names:
+                _thread_names[tid] = threading.current_thread().name
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def add_bytes(self, read: int = 0, written: int = 0):
+        if read:
+            self.args["bytes_read"] = self.args.get("bytes_read", 0) + read
+        if written:
+            self.args["bytes_written"] = self.args.get("bytes_written", 0) + written
+
+
+def span(name: str, cat: str = "stage", **args):
+    """Context manager timing one stage, e.g. `with span("decode"): ...`."""
+    if not _enabled:
+        return _null_span
+    return Span(name, cat, args)
+
+
+def traced(name: Optional[str] = None, cat: str = "call") -> Callable:
+    """
+    Decorator recording each call as a span named module.function. The size of
+    in_path (first argument) is counted as read and a returned file path as written.
+    """
+
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            in_path = kwargs.get("in_path", args[0] if args else None)
+            with Span(label, cat, {}) as sp:
+                if isinstance(in_path, str):
+                    sp.set(in_path=in_path)
+                    sp.add_bytes(read=file_size(in_path))
+                result = func(*args, **kwargs)
+                if isinstance(result, str) and os.path.isfile(result):
+                    sp.set(out_path=result)
+                    sp.add_bytes(written=file_size(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def aggregate(events: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Per-span totals: count, total/self/mean/max milliseconds and bytes."""
+    stats = {}
+    for event in get_events() if events is None else events:
+        key = f"{event['cat']}:{event['name']}"
+        s = stats.setdefault(key, {
+            "cat": event["cat"], "name": event["name"], "count": 0,
+            "total_ms": 0.0, "self_ms": 0.0, "max_ms": 0.0, "bytes_read": 0, "bytes_written": 0,
+        })
+        dur_ms = event["dur"] / 1000
+        s["count"] += 1
+        s["total_ms"] += dur_ms
+        s["self_ms"] += event["args"].get("self_us", event["dur"]) / 1000
+        s["max_ms"] = max(s["max_ms"], dur_ms)
+        s["bytes_read"] += event["args"].get("bytes_read", 0)
+        s["bytes_written"] += event["args"].get("bytes_written", 0)
+    for s in stats.values():
+        s["mean_ms"] = s["total_ms"] / s["count"]
+    return stats
+
+
+def format_aggregate(stats: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """Aggregate table as text, slowest self time first."""
+    stats = aggregate() if stats is None else stats
+    lines = [f"{'span':40s} {'count':>6s} {'total ms':>10s} {'self ms':>10s} {'mean ms':>9s} {'max ms':>9s} {'MB read':>8s} {'MB written':>10s}"]
+    for s in sorted(stats.values(), key=lambda s: s["self_ms"], reverse=True):
+        lines.append(
+            f"{s['cat'] + ':' + s['name']:40s} {s['count']:6d} {s['total_ms']:10.1f} {s['self_ms']:10.1f} "
+            f"{s['mean_ms']:9.1f} {s['max_ms']:9.1f} {s['bytes_read'] / 2 ** 20:8.2f} {s['bytes_written'] / 2 ** 20:10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def export_chrome_trace(path: str):
+    """Write the recorded spans as Chrome trace-event JSON."""
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+    pid = os.getpid()
+    meta = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in names.items()
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+
+
+def _export_at_exit(path: str):
+    if not get_events():
+        return
+    export_chrome_trace(path)
+    print(format_aggregate(), file=sys.stderr)
+
+
+if os.environ.get("IMBRIDGE_TRACE"):
+    enable()
+    atexit.register(_export_at_exit, os.environ["IMBRIDGE_TRACE"])
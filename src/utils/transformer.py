@@ -8,9 +8,13 @@ from src.utils.commons import confirm_single_page
 from src.utils.commons import confirm_dir_existence
 
 from src.utils.logger import Logger
+from src.utils.tracing import span, traced, file_size
 import src.utils.vector as vec
+from src.utils.documents import open_pdf, get_document_pool, fitz_lock
+import src.utils.raster as rst
 
 
+@traced()
 def transform_raster(
     img: Image.Image,
     logger: Optional[Logger] = None,
@@ -96,12 +100,54 @@ def transform_raster(
     return img_2
 
 
+def target_size(source_size: Tuple[float, float], **kwargs) -> Tuple[float, float]:
+    """Output size of transform_raster for a source of source_size, before rotation."""
+    if 'new_width' in kwargs and 'new_height' in kwargs:
+        return float(kwargs['new_width']), float(kwargs['new_height'])
+    if 'scale_x' in kwargs and 'scale_y' in kwargs:
+        return source_size[0] * float(kwargs['scale_x']), source_size[1] * float(kwargs['scale_y'])
+    return tuple(source_size)
+
+
+@traced()
+def preview_transform(
+    proxy: Image.Image,
+    source_size: Tuple[float, float],
+    box: Tuple[int, int],
+    **kwargs
+) -> Tuple[Image.Image, Tuple[float, float]]:
+    """
+    Apply the transform to proxy, a preview-sized rendering of a source of
+    source_size, at the size the result fills box. Returns the preview and
+    the size the full transform would produce; the source is not touched.
+    """
+    width, height = target_size(source_size, **kwargs)
+    upscale = width > source_size[0] and height > source_size[1]
+    angle = kwargs.get('rotate_angle', 0) % 360
+    tilt = angle in (90, 270)
+    fit_w, fit_h = vec.fit_size((height, width) if tilt else (width, height), box)
+    size = (fit_h, fit_w) if tilt else (fit_w, fit_h)
+    img = proxy.resize(size, Image.Resampling.LANCZOS)
+    if upscale:
+        # The upscale filters, with the blur scaled down to the preview
+        img = ImageEnhance.Sharpness(img).enhance(kwargs.get('sharpness', 5.0))
+        img = img.filter(ImageFilter.GaussianBlur(radius=kwargs.get('blur_radius', 1.0) * size[0] / width))
+        img = img.filter(ImageFilter.MedianFilter(size=kwargs.get('median_size', 3)))
+    # Rotation and flips only; the size is already final
+    options = {k: kwargs[k] for k in ('rotate_angle', 'flip_lr', 'flip_tb') if k in kwargs}
+    img = transform_raster(img, **options)
+    out_size = (height, width) if tilt else (width, height)
+    return img, out_size
+
+
+@traced()
 def transform_image(
     in_path: str,
     out_dir: str,
     save_image: bool = True,
     preview_callback: Optional[Callable] = None,
     logger: Optional[Logger] = None,
+    cache: bool = False,
     **kwargs
 ) -> Optional[str]:
 
@@ -111,11 +157,13 @@ def transform_image(
     out_path = os.path.join(out_dir, f"{base_name}_{suffix}{in_fmt}")
 
     # 自动获取目标尺寸
-    img = Image.open(in_path)
+    img = rst.load_image(in_path, cache=cache)
     img = transform_raster(img, logger=logger, **kwargs)
     
     if save_image:
-        img.save(out_path)
+        with span("encode") as sp:
+            img.save(out_path)
+            sp.add_bytes(written=file_size(out_path))
         logger.info(f"[Transform] saved to: {out_path}") if logger else None
     else:
         out_path = None
@@ -125,6 +173,7 @@ def transform_image(
     return out_path
 
 
+@traced()
 def transform_svg(
     in_path: str,
     out_dir: str,
@@ -135,14 +184,17 @@ def transform_svg(
 ) -> Optional[Tuple[Optional[str], Optional[Image.Image]]]:
     
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
 
     def mat2str(mat: list[float, float, float, float, float, float]) -> str:
         return "matrix(" + " ".join(f"{x}" for x in mat) + ")"
     
     
     try:
-        view_box = vec.get_svg_view_box(in_path)
-        (orig_width, orig_height), unit = vec.get_svg_size(in_path)
+        doc = vec.SvgDocument(in_path)
+        view_box = doc.view_box
+        (orig_width, orig_height), unit = doc.size
     except Exception:
         raise RuntimeError("Failed to parse SVG dimensions.")
 
@@ -201,14 +253,13 @@ def transform_svg(
             logger.info(f"[Transform] Rotating SVG by {angle} degrees") if logger else None
         view_box = vec.transform_box(view_box, mat)
         try:
-            vec.set_svg_transform(in_path, out_path, " ".join([mat2str(mat)]))
-            vec.set_svg_view_box(out_path, out_path, "{} {} {} {}".format(*view_box))
-            vec.set_svg_size(
-                out_path, 
-                out_path, 
+            doc.set_transform(" ".join([mat2str(mat)]))
+            doc.set_view_box(view_box)
+            doc.set_size(
                 width_str=f"{target_width}{unit}",
                 height_str=f"{target_height}{unit}")
-            preview_img = vec.show_svg(out_path, dpi=dpi)
+            doc.save(out_path)
+            preview_img = vec.show_svg(out_path, dpi=dpi, box=preview_box)
             preview_callback(preview_img, unit) if preview_callback else None
             logger.info(f"[Transform] svg saved to {out_path}") if logger else None
             return out_path
@@ -221,6 +272,7 @@ def transform_svg(
         return None
 
 
+@traced()
 def transform_pdf(
     in_path: str,
     out_dir: str,
@@ -231,6 +283,8 @@ def transform_pdf(
 ) -> Optional[str]:
     
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
 
     if not confirm_single_page(in_path):
         return None
@@ -243,8 +297,8 @@ def transform_pdf(
 
         if confirm_dir_existence(out_dir) and confirm_overwrite(out_path):
             try:
-                with fitz.open(in_path) as doc:
-                    with fitz.open() as new_doc:
+                with open_pdf(in_path) as doc:
+                    with fitz_lock, fitz.open() as new_doc:
                         page = doc[0]
                         rect = page.rect
                         orig_width = rect.width
@@ -282,8 +336,11 @@ def transform_pdf(
                             new_page.set_rotation(angle)
                         if 'flip_lr' in kwargs or 'flip_tb' in kwargs:
                             logger.error(f"[vector] Flipping PDF page is not supported.") if logger else None
-                        new_doc.save(out_path)
-                preview_img = vec.show_script(out_path, dpi=dpi)
+                        with span("write", tool="pymupdf"):
+                            # An open handle on an earlier output would block overwriting it on Windows
+                            get_document_pool().close(out_path)
+                            new_doc.save(out_path)
+                preview_img = vec.show_script(out_path, dpi=dpi, box=preview_box)
                 preview_callback(preview_img, "pt") if preview_callback else None
                 logger.info(f"[Transform] PDF saved to {out_path}") if logger else None
                 return out_path
@@ -297,6 +354,7 @@ def transform_pdf(
 
 
 
+@traced()
 def transform_script(
     in_path: str,
     out_dir: str,
@@ -314,6 +372,8 @@ def transform_script(
       只支持裁剪，不支持缩放
     """
     dpi = kwargs.get("dpi", 96)
+    # The saved result is previewed at the size of the preview area, not at dpi
+    preview_box = kwargs.get("preview_box")
 
     if save_image:
         base_name = os.path.splitext(os.path.basename(in_path))[0]
@@ -384,7 +444,7 @@ def transform_script(
                 new_bbox=(0, 0, target_width, target_height),
                 logger=logger
             )
-            preview_img = vec.show_script(out_path, dpi=dpi)
+            preview_img = vec.show_script(out_path, dpi=dpi, box=preview_box)
             preview_callback(preview_img, "pt") if preview_callback else None
             logger.info(f"[Transform] EPS/PS saved to {out_path}") if logger else None
     else:
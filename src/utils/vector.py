@@ -1,11 +1,13 @@
 from PIL import Image
 import os
+import io
 import base64
-import subprocess
+import struct
 from typing import Optional, Dict, Any, Callable, Tuple
 import tempfile
 import shutil
 import re
+import copy
 import fitz  # PyMuPDF
 import numpy as np
 from xml.etree import ElementTree as ET
@@ -13,6 +15,10 @@ from xml.etree import ElementTree as ET
 import src.utils.converter as cv
 import src.utils.raster as rst
 from src.utils.logger import Logger
+from src.utils.tracing import span, traced, file_size
+from src.utils.tools import run_tool
+from src.utils.image_cache import get_image_cache, file_key
+from src.utils.documents import open_pdf, parse_svg
 from src.utils.commons import check_tool
 from src.utils.commons import confirm_overwrite
 from src.utils.commons import confirm_dir_existence
@@ -82,19 +88,306 @@ pattern_in_byte = re.compile(
     )
 
 
-def show_script(in_path: str, dpi: int = 96) -> Image.Image:
+def fit_size(size: Tuple[float, float], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest pixel size with the aspect ratio of size that fits in box."""
+    scale = min(box[0] / size[0], box[1] / size[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def fit_dpi(size_pt: Tuple[float, float], box: Tuple[int, int]) -> float:
+    """DPI at which a page of size_pt points just fills a box of pixels."""
+    return 72.0 * min(box[0] / size_pt[0], box[1] / size_pt[1])
+
+
+@traced()
+def show_script(
+    in_path: str,
+    dpi: int = 96,
+    page: int = 0,
+    box: Optional[Tuple[int, int]] = None,
+    antialias: bool = True,
+    cache: bool = True,
+) -> Image.Image:
+    """
+    Render one page (0-based) of a PDF/PS/EPS file for preview. With box,
+    the page is rendered at the resolution that fills box instead of at dpi.
+    With cache, an unchanged file is rendered once per session with the same
+    arguments; the shared image must not be modified in place.
+    """
+    render = lambda: render_page(in_path, page=page, dpi=dpi, box=box, antialias=antialias)
+    if not cache:
+        return render()
+    return get_image_cache().cached(file_key(in_path, "page", page, dpi, box, antialias), render)
+
+
+# Header of a DOS-binary EPS: magic, PostScript, WMF and TIFF sections (offset, length), checksum
+dos_eps_magic = b"\xc5\xd0\xd3\xc6"
+dos_eps_header = struct.Struct("<4s6IH")
+
+
+def dos_eps_sections(in_path: str) -> Optional[Dict[str, Tuple[int, int]]]:
+    """(offset, length) of the sections of a DOS-binary EPS, None for plain PostScript."""
+    with open(in_path, "rb") as f:
+        header = f.read(dos_eps_header.size)
+    if len(header) < dos_eps_header.size or not header.startswith(dos_eps_magic):
+        return None
+    _, ps_off, ps_len, wmf_off, wmf_len, tiff_off, tiff_len, _ = dos_eps_header.unpack(header)
+    return {"ps": (ps_off, ps_len), "wmf": (wmf_off, wmf_len), "tiff": (tiff_off, tiff_len)}
+
+
+def _pdf_thumb(doc, xref: int) -> Optional[Image.Image]:
+    """Decode a /Thumb image stream; thumbnails need not be marked as image XObjects."""
+    key = lambda name: doc.xref_get_key(xref, name)[1]
+    filters = key("Filter")
+    if "DCTDecode" in filters:
+        with Image.open(io.BytesIO(doc.xref_stream_raw(xref))) as image:
+            image.load()
+            return image.convert("RGB")
+    modes = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+    if key("ColorSpace") in modes and key("BitsPerComponent") == "8":
+        size = (int(key("Width")), int(key("Height")))
+        return Image.frombytes(modes[key("ColorSpace")], size, doc.xref_stream(xref))
+    # Indexed, ICC and other colour spaces: let MuPDF decode it if it can
     try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            out_path = cv.script2raster(in_path, tmp_dir, out_fmt=".png", dpi=dpi)
-            with Image.open(out_path) as image:
-                #img.load()  # 强制读取到内存
-                img = image.copy()
-        return img
-    except Exception as ve:
-        raise ve
+        pix = fitz.Pixmap(doc, xref)
+    except (ValueError, RuntimeError):
+        return None
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
 
 
-def show_svg(in_path: str, dpi: int = None) -> Image.Image:
+def embedded_preview(in_path: str, page: int = 0) -> Optional[Image.Image]:
+    """
+    Preview image stored in the file, read without rendering: the TIFF (or,
+    where Pillow can draw it, WMF) section of a DOS-binary EPS, or the /Thumb
+    thumbnail of a PDF page. None when there is none.
+    """
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    if in_fmt == ".pdf":
+        with open_pdf(in_path) as doc:
+            if not 0 <= page < doc.page_count:
+                return None
+            kind, value = doc.xref_get_key(doc[page].xref, "Thumb")
+            if kind != "xref":
+                return None
+            try:
+                with span("decode", preview="pdf-thumb"):
+                    return _pdf_thumb(doc, int(value.split()[0]))
+            except (OSError, ValueError):
+                # A damaged thumbnail is no reason not to render the page
+                return None
+    if in_fmt not in (".eps", ".ps") or page != 0:
+        return None
+    sections = dos_eps_sections(in_path)
+    if sections is None:
+        return None
+    for name in ("tiff", "wmf"):
+        offset, length = sections[name]
+        if not offset or not length:
+            continue
+        with open(in_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        try:
+            with span("decode", preview=f"eps-{name}"):
+                with Image.open(io.BytesIO(data)) as image:
+                    # Pillow draws WMF only on Windows; elsewhere load() fails
+                    image.load()
+                    return rst.remove_alpha_channel(image.copy())
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def get_page_count(in_path: str) -> int:
+    """Pages of a PDF, or of a PS file according to its %%Pages / %%Page: comments."""
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    if in_fmt == ".pdf":
+        with open_pdf(in_path) as doc:
+            return doc.page_count
+    if in_fmt != ".ps":
+        return 1
+    pages = 0
+    with open(in_path, "rb") as f:
+        for line in f:
+            if line.startswith(b"%%Pages:"):
+                value = line[8:].strip()
+                if value.isdigit():
+                    return max(1, int(value))
+            elif line.startswith(b"%%Page:"):
+                pages += 1
+    return max(1, pages)
+
+
+def get_script_page_size(in_path: str, page: int = 0) -> Tuple[Optional[float], Optional[float]]:
+    """Size in points of a page (0-based) of a PS/EPS file, (None, None) without bounding boxes."""
+    bbox_pat = re.compile(rb"^%%(Page)?BoundingBox:\s*(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)")
+    size = (None, None)
+    current = -1
+    with open(in_path, "rb") as f:
+        for line in f:
+            if line.startswith(b"%%Page:"):
+                current += 1
+                if current > page:
+                    break
+                continue
+            m = bbox_pat.match(line)
+            if not m:
+                continue
+            llx, lly, urx, ury = (int(m.group(i)) for i in range(2, 6))
+            if m.group(1) is None and size == (None, None):
+                size = (urx - llx, ury - lly)
+            elif m.group(1) is not None and current == page:
+                return urx - llx, ury - lly
+    return size
+
+
+def render_page(
+    in_path: str,
+    page: int = 0,
+    dpi: int = 96,
+    box: Optional[Tuple[int, int]] = None,
+    antialias: bool = True,
+) -> Image.Image:
+    """
+    Rasterize a single page: PyMuPDF for PDF, Ghostscript limited to the page
+    with -dFirstPage/-dLastPage for PS/EPS. Other pages are never rendered.
+    With box, dpi is replaced by the one at which the page fills box.
+    antialias=False turns off Ghostscript's text and graphics antialiasing for
+    drafts; PyMuPDF's antialiasing level is process-wide and left alone.
+    """
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    if in_fmt == ".pdf":
+        with open_pdf(in_path) as doc:
+            if not 0 <= page < doc.page_count:
+                raise RuntimeError(f"Page {page + 1} out of range (1-{doc.page_count})")
+            if box:
+                rect = doc[page].rect
+                dpi = fit_dpi((rect.width, rect.height), box)
+            with span("render", tool="pymupdf", page=page, dpi=round(dpi, 1)):
+                pix = doc[page].get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False)
+                return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    gs = shutil.which("gswin64c") or shutil.which("gswin32c") or shutil.which("gs")
+    if not gs:
+        raise RuntimeError("Ghostscript executable not found; provide path in config or ensure it is on PATH")
+    if box:
+        width_pt, height_pt = get_script_page_size(in_path, page)
+        if width_pt and height_pt:
+            dpi = fit_dpi((width_pt, height_pt), box)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_path = os.path.join(tmp_dir, "page.png")
+        cmd = [
+            gs, "-dSAFER", "-dBATCH", "-dNOPAUSE", "-dQUIET",
+            "-dEPSCrop",
+            f"-dFirstPage={page + 1}",
+            f"-dLastPage={page + 1}",
+            "-sDEVICE=pngalpha" if antialias else "-sDEVICE=png16m",
+            *([] if antialias else ["-dTextAlphaBits=1", "-dGraphicsAlphaBits=1"]),
+            f"-r{dpi:.2f}",
+            f"-sOutputFile={out_path}",
+            in_path,
+        ]
+        run_tool(cmd)
+        with Image.open(out_path) as image:
+            image.load()
+            return image.copy()
+
+
+def get_page_size(in_path: str, page: int = 0) -> Tuple[float, float]:
+    """
+    Size of a PDF page in points, or of an SVG in its own units: the
+    coordinate space of render_region's clip. A PS/EPS page is measured by
+    its %%PageBoundingBox, or the document's %%BoundingBox without one.
+    """
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    if in_fmt == ".pdf":
+        with open_pdf(in_path) as doc:
+            rect = doc[page].rect
+            return rect.width, rect.height
+    if in_fmt in (".eps", ".ps"):
+        return get_script_page_size(in_path, page)
+    if in_fmt == ".svg":
+        doc = SvgDocument(in_path)
+        try:
+            return parse_svg_lengths(doc.root.get("width"), doc.root.get("height"))[0]
+        except RuntimeError:
+            if doc.view_box:
+                return doc.view_box[2], doc.view_box[3]
+            raise
+    raise RuntimeError(f"Region rendering is not supported for {in_fmt} files")
+
+
+def render_region(
+    in_path: str,
+    zoom: float,
+    clip: Tuple[float, float, float, float],
+    page: int = 0,
+) -> Image.Image:
+    """
+    Rasterize only the part clip = (x0, y0, x1, y1) of a page, in the units of
+    get_page_size, at zoom pixels per unit. PDFs use PyMuPDF's clip; SVGs are
+    rendered by cairosvg with the viewBox narrowed to the clip.
+    """
+    x0, y0, x1, y1 = clip
+    width, height = max(1, round((x1 - x0) * zoom)), max(1, round((y1 - y0) * zoom))
+    in_fmt = os.path.splitext(in_path)[1].lower()
+    if in_fmt == ".pdf":
+        with open_pdf(in_path) as doc:
+            with span("render", tool="pymupdf", page=page, zoom=round(zoom, 3)):
+                pix = doc[page].get_pixmap(
+                    matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(x0, y0, x1, y1), alpha=False
+                )
+                return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    if in_fmt == ".svg":
+        import cairosvg
+
+        doc = SvgDocument(in_path)
+        page_w, page_h = get_page_size(in_path)
+        vx, vy, vw, vh = doc.view_box or (0, 0, page_w, page_h)
+        sx, sy = vw / page_w, vh / page_h
+        doc.set_view_box((vx + x0 * sx, vy + y0 * sy, (x1 - x0) * sx, (y1 - y0) * sy))
+        doc.set_size(str(width), str(height))
+        # The clip is already in the page's aspect ratio; do not let rounding letterbox it
+        doc.root.set("preserveAspectRatio", "none")
+        with span("render", tool="cairosvg", zoom=round(zoom, 3)):
+            data = cairosvg.svg2png(bytestring=ET.tostring(doc.root), output_width=width, output_height=height)
+        with Image.open(io.BytesIO(data)) as image:
+            return rst.remove_alpha_channel(image.copy())
+    raise RuntimeError(f"Region rendering is not supported for {in_fmt} files")
+
+
+@traced()
+def show_svg(in_path: str, dpi: int = None, box: Optional[Tuple[int, int]] = None, cache: bool = True) -> Image.Image:
+    """
+    Rasterize an SVG for preview. With box, cairosvg renders straight at the
+    pixel size that fills box (output_width/output_height) instead of at dpi.
+    cache works as in show_script.
+    """
+    render = lambda: render_svg(in_path, dpi=dpi, box=box)
+    if not cache:
+        return render()
+    return get_image_cache().cached(file_key(in_path, "svg", dpi, box), render)
+
+
+def render_svg(in_path: str, dpi: int = None, box: Optional[Tuple[int, int]] = None) -> Image.Image:
+    if box:
+        doc = SvgDocument(in_path)
+        try:
+            size = doc.size[0]
+        except RuntimeError:
+            size = doc.view_box[2:4] if doc.view_box else None
+        if size and size[0] and size[1]:
+            import cairosvg
+
+            width, height = fit_size(size, box)
+            with span("render", tool="cairosvg", width=width, height=height):
+                data = cairosvg.svg2png(url=in_path, output_width=width, output_height=height)
+            with Image.open(io.BytesIO(data)) as image:
+                return rst.remove_alpha_channel(image.copy())
     try:
         with tempfile.TemporaryDirectory() as tmp_dir:
             out_path = cv.svg2raster(in_path, tmp_dir, out_fmt=".png", dpi=dpi)
@@ -102,64 +395,92 @@ def show_svg(in_path: str, dpi: int = None) -> Image.Image:
                 # img.load()  # 强制读取所有数据到内存
                 img = rst.remove_alpha_channel(image.copy())  # 创建副本
             img = rst.remove_alpha_channel(img)
-            print(f"Loaded SVG raster image size: {img.size}")
         return img
     except Exception as ve:
         raise ve
 
 
-def set_svg_transform(in_path, out_path, transform_str):
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(in_path)
-    root = tree.getroot()
-    g = ET.Element("g")
-    for child in list(root):
-        g.append(child)
-        root.remove(child)
-    g.set("transform", transform_str)
-    root.append(g)
-    tree.write(out_path, encoding="utf-8", xml_declaration=True)
-
+class SvgDocument:
+    """
+    In-memory SVG document: parsed once, edited through methods and written once.
+    The viewBox and size measurements are cached on the object and re-read
+    lazily after the corresponding setter is called. The tree is the one shared
+    by all helpers (documents.parse_svg) until the first edit, which copies it.
+    """
 
-def set_svg_view_box(in_path: str, out_path: str, view_box_str: str):
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(in_path)
-    root = tree.getroot()
-    root.set("viewBox", view_box_str)
-    tree.write(out_path, encoding="utf-8", xml_declaration=True)
+    def __init__(self, in_path: str):
+        ET.register_namespace('', 'http://www.w3.org/2000/svg')
+        self.in_path = in_path
+        self.tree = parse_svg(in_path)
+        self.root = self.tree.getroot()
+        self._shared = True
+        self._view_box = None
+        self._view_box_read = False
+        self._size = None
+
+    @property
+    def view_box(self) -> Optional[tuple]:
+        if not self._view_box_read:
+            try:
+                self._view_box = tuple(map(float, self.root.get('viewBox').split()))
+            except:
+                self._view_box = None
+            self._view_box_read = True
+        return self._view_box
+
+    @property
+    def size(self) -> tuple[tuple[int, int], str]:
+        if self._size is None:
+            self._size = parse_svg_size(self.root.get("width"), self.root.get("height"))
+        return self._size
+
+    def _writable(self):
+        if self._shared:
+            self.tree = ET.ElementTree(copy.deepcopy(self.tree.getroot()))
+            self.root = self.tree.getroot()
+            self._shared = False
+
+    def set_transform(self, transform_str: str):
+        """Wrap all children of the root in a <g> carrying the given transform."""
+        self._writable()
+        g = ET.Element("g")
+        for child in list(self.root):
+            g.append(child)
+            self.root.remove(child)
+        g.set("transform", transform_str)
+        self.root.append(g)
+
+    def set_view_box(self, view_box):
+        if isinstance(view_box, str):
+            view_box_str = view_box
+        else:
+            view_box_str = "{} {} {} {}".format(*view_box)
+        self._writable()
+        self.root.set("viewBox", view_box_str)
+        self._view_box_read = False
 
+    def set_size(self, width_str: str, height_str: str):
+        self._writable()
+        self.root.set("width", width_str)
+        self.root.set("height", height_str)
+        self._size = None
 
-def set_svg_size(in_path: str, out_path: str, width_str: str, height_str: str):
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(in_path)
-    root = tree.getroot()
-    root.set("width", width_str)
-    root.set("height", height_str)
-    tree.write(out_path, encoding="utf-8", xml_declaration=True)
+    def save(self, out_path: str):
+        with span("write", format="svg") as sp:
+            self.tree.write(out_path, encoding="utf-8", xml_declaration=True)
+            sp.add_bytes(written=file_size(out_path))
 
 
-def get_svg_view_box(in_path: str) -> tuple[Optional[float], Optional[float]]:
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(in_path)
-    root = tree.getroot()
+def parse_svg_lengths(width_attr: Optional[str], height_attr: Optional[str]) -> tuple[tuple[float, float], str]:
+    """Width and height attributes as floats, with their common unit (px if none)."""
     try:
-        viewbox_str = root.get('viewBox')
-        return tuple(map(float, viewbox_str.split()))
-    except:
-        return None
-
-def get_svg_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(in_path)
-    root = tree.getroot()
-    try:
-        match = re.search(r'(\d+\.?\d*)(\D*)', root.get("width"))  # 匹配数字（包括小数）
+        match = re.search(r'(\d+\.?\d*)(\D*)', width_attr)  # 匹配数字（包括小数）
         if match:
-            width = int(float(match.group(1)))
+            width = float(match.group(1))
             unit_w = match.group(2).strip()
-        match = re.search(r'(\d+\.?\d*)(\D*)', root.get("height"))  # 匹配数字（包括小数）
+        match = re.search(r'(\d+\.?\d*)(\D*)', height_attr)  # 匹配数字（包括小数）
         if match:
-            height = int(float(match.group(1)))
+            height = float(match.group(1))
             unit_h = match.group(2).strip()
         if not width or not height:
             raise RuntimeError("SVG width or height attribute missing or invalid.")
@@ -173,9 +494,41 @@ def get_svg_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
     except Exception:
         raise RuntimeError("Failed to parse SVG dimensions.")
 
+
+def parse_svg_size(width_attr: Optional[str], height_attr: Optional[str]) -> tuple[tuple[int, int], str]:
+    (width, height), unit = parse_svg_lengths(width_attr, height_attr)
+    if not int(width) or not int(height):
+        raise RuntimeError("Failed to parse SVG dimensions.")
+    return (int(width), int(height)), unit
+
+
+def set_svg_transform(in_path, out_path, transform_str):
+    doc = SvgDocument(in_path)
+    doc.set_transform(transform_str)
+    doc.save(out_path)
+
+
+def set_svg_view_box(in_path: str, out_path: str, view_box_str: str):
+    doc = SvgDocument(in_path)
+    doc.set_view_box(view_box_str)
+    doc.save(out_path)
+
+
+def set_svg_size(in_path: str, out_path: str, width_str: str, height_str: str):
+    doc = SvgDocument(in_path)
+    doc.set_size(width_str, height_str)
+    doc.save(out_path)
+
+
+def get_svg_view_box(in_path: str) -> tuple[Optional[float], Optional[float]]:
+    return SvgDocument(in_path).view_box
+
+def get_svg_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
+    return SvgDocument(in_path).size
+
 def get_pdf_size(in_path: str) -> tuple[Optional[float], Optional[float]]:
     try:
-        with fitz.open(in_path) as doc:
+        with open_pdf(in_path) as doc:
             page = doc[0]
             width_pt = page.rect.width
             height_pt = page.rect.height
@@ -264,6 +617,7 @@ def compute_trans_matrix(
     return [a, b, c, d, e, f]
 
 
+@traced()
 def update_matrix(in_path: str, out_path: str, logger=None, **kwargs):
     """
     更新 EPS/PS 文件中的变换矩阵
@@ -309,6 +663,7 @@ def update_matrix(in_path: str, out_path: str, logger=None, **kwargs):
         f.writelines(lines)
 
 
+@traced()
 def change_bbox(
     in_path: str, out_path: str, old_bbox: tuple[float, float, float, float], new_bbox: tuple[float, float, float, float], logger: Optional[Logger] = None, tolerate: float = 2
 ) -> Optional[str]:
@@ -417,6 +772,7 @@ def change_bbox(
 
 
 
+@traced()
 def vector_analyzer(
     in_path: str, log_fun: Optional[Callable[[str], None]] = None
 ) -> Dict[str, Any]:
@@ -451,6 +807,7 @@ def vector_analyzer(
     return result
 
 
+@traced()
 def pdf_analyzer(pdf_path: str) -> Dict[str, Any]:
     """
     用 PyMuPDF 分析 PDF 文件的矢量/栅格内容，统计 path 和 image 数量及尺寸。
@@ -461,26 +818,26 @@ def pdf_analyzer(pdf_path: str) -> Dict[str, Any]:
         "num_images": 0,
         "images": [],
     }
-    doc = fitz.open(pdf_path)
-    for page in doc:
-        # 统计图片
-        for img in page.get_images(full=True):
-            xref = img[0]
-            pix = fitz.Pixmap(doc, xref)
-            w, h = pix.width, pix.height
-            result["num_images"] += 1
-            result["images"].append({
-                "xref": xref,
-                "width": w,
-                "height": h,
-            })
-            pix = None  # 释放内存
-        # 统计路径
-        drawings = page.get_drawings()
-        vector_ops = [d for d in drawings if d["type"] != "image"]
-        path_count = len(vector_ops)
-
-        result["num_paths"] += path_count
+    with open_pdf(pdf_path) as doc:
+        for page in doc:
+            # 统计图片
+            for img in page.get_images(full=True):
+                xref = img[0]
+                pix = fitz.Pixmap(doc, xref)
+                w, h = pix.width, pix.height
+                result["num_images"] += 1
+                result["images"].append({
+                    "xref": xref,
+                    "width": w,
+                    "height": h,
+                })
+                pix = None  # 释放内存
+            # 统计路径
+            drawings = page.get_drawings()
+            vector_ops = [d for d in drawings if d["type"] != "image"]
+            path_count = len(vector_ops)
+
+            result["num_paths"] += path_count
     # 类型判定
     if result["num_images"] > 0 and result["num_paths"] > 0:
         result["type"] = "mixed"
@@ -491,65 +848,131 @@ def pdf_analyzer(pdf_path: str) -> Dict[str, Any]:
     return result
 
 
+def probe_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read the pixel size of an encoded image from its leading bytes only.
+    PNG/GIF/JPEG headers are parsed directly; other formats fall back to
+    Pillow's lazy open, which also stops at the header.
+    Returns None if the header is not complete yet.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(data) < 24:
+            return None
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        if len(data) < 10:
+            return None
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        pos = 2
+        while pos + 4 <= len(data):
+            if data[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = data[pos + 1]
+            # Fill bytes and standalone markers carry no length field
+            if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                pos += 1 if marker == 0xFF else 2
+                continue
+            seg_len = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+            # SOF0..SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                if pos + 9 > len(data):
+                    return None
+                h, w = struct.unpack(">HH", data[pos + 5:pos + 9])
+                return w, h
+            if marker == 0xDA:
+                # Start of scan reached without a frame header
+                raise ValueError("JPEG stream has no SOF marker")
+            pos += 2 + seg_len
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+def probe_data_uri_size(href: str, chunk: int = 4096) -> Optional[Tuple[int, int]]:
+    """
+    Get the pixel size of a base64 data URI by decoding a growing prefix
+    until the image header is complete, instead of decoding the whole payload.
+    """
+    header, _, payload = href.partition(",")
+    if ";base64" not in header:
+        return None
+    while True:
+        prefix = re.sub(r"\s+", "", payload[:chunk])
+        complete = chunk >= len(payload)
+        if not complete:
+            prefix = prefix[: len(prefix) // 4 * 4]
+        size = probe_image_size(base64.b64decode(prefix))
+        if size is not None or complete:
+            return size
+        chunk *= 4
+
+
+@traced()
 def svg_analyzer(svg_path: str) -> Dict[str, Any]:
     """
     Analyze SVG files for pure vector, pure raster, or mixed graphics, and count paths and images.
     For <image> tags, try to get actual pixel size from href/xlink:href if possible.
+    The document is streamed with iterparse and finished elements are dropped,
+    so memory stays bounded by the nesting depth rather than the file size.
     """
-    import io
     result = {
         "type": "unknown",
         "num_paths": 0,
         "num_images": 0,
         "images": [],
+        "elements": {},
     }
-    ET.register_namespace('', 'http://www.w3.org/2000/svg')
-    tree = ET.parse(svg_path)
-    root = tree.getroot()
-
-    def find_all_by_local_name(root, tag_name):
-        """查找指定标签名的所有元素，忽略命名空间前缀"""
-        elements = []
-        for elem in root.iter():
-            if elem.tag.split('}')[-1] == tag_name:
-                elements.append(elem)
-        return elements
-
-    paths = find_all_by_local_name(root, 'path')
-    images = find_all_by_local_name(root, 'image')
-
-    result["num_paths"] = len(paths)
-    result["num_images"] = len(images)
+    counts = result["elements"]
     svg_dir = os.path.dirname(svg_path)
-    for img in images:
-        w = img.get("width")
-        h = img.get("height")
-        # 解析 href/xlink:href
-        href = img.get("{http://www.w3.org/1999/xlink}href") or img.get("href")
-        real_w, real_h = None, None
-        if href:
-            try:
-                if href.startswith("data:"):
-                    # Data URI
-                    header, b64data = href.split(",", 1)
-                    img_bytes = base64.b64decode(b64data)
-                    with Image.open(io.BytesIO(img_bytes)) as im:
-                        real_w, real_h = im.width, im.height
-                else:
-                    # 文件路径或URL（只尝试本地文件）
-                    img_path = os.path.join(svg_dir, href)
-                    if os.path.exists(img_path):
-                        with Image.open(img_path) as im:
-                            real_w, real_h = im.width, im.height
-            except Exception:
-                real_w, real_h = None, None
-        result["images"].append({
-            "width": w,
-            "height": h,
-            "real_width": real_w,
-            "real_height": real_h,
-            "href": href
-        })
+    stack = []
+    for event, elem in ET.iterparse(svg_path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        tag = elem.tag.split('}')[-1] if isinstance(elem.tag, str) else str(elem.tag)
+        counts[tag] = counts.get(tag, 0) + 1
+        if tag == "image":
+            w = elem.get("width")
+            h = elem.get("height")
+            # 解析 href/xlink:href
+            href = elem.get("{http://www.w3.org/1999/xlink}href") or elem.get("href")
+            real_w, real_h = None, None
+            data_uri = None
+            if href and href.startswith("data:"):
+                # Only the header is reported, the payload can be megabytes of base64
+                data_uri, href = href, href.split(",", 1)[0] + ",..."
+            if href:
+                try:
+                    if data_uri:
+                        real_w, real_h = probe_data_uri_size(data_uri) or (None, None)
+                    else:
+                        # 文件路径或URL（只尝试本地文件）
+                        img_path = os.path.join(svg_dir, href)
+                        if os.path.exists(img_path):
+                            with Image.open(img_path) as im:
+                                real_w, real_h = im.width, im.height
+                except Exception:
+                    real_w, real_h = None, None
+            result["images"].append({
+                "width": w,
+                "height": h,
+                "real_width": real_w,
+                "real_height": real_h,
+                "href": href
+            })
+        # All earlier siblings have already ended, so the parent can drop them
+        if stack:
+            del stack[-1][:]
+        elem.clear()
+
+    result["num_paths"] = counts.get("path", 0)
+    result["num_images"] = counts.get("image", 0)
     # Type determination
     if result["num_images"] > 0 and result["num_paths"] > 0:
         result["type"] = "mixed"
@@ -559,6 +982,7 @@ def svg_analyzer(svg_path: str) -> Dict[str, Any]:
         result["type"] = "vector"
     return result
 
+@traced()
 def trace_bmp_to_svg(
     in_path: str, 
     out_dir: str,
@@ -586,7 +1010,7 @@ def trace_bmp_to_svg(
         if confirm_overwrite(out_path):
             cmd = [potrace_exe, in_path, '-o', out_path, '-s']
             try:
-                subprocess.run(cmd, check=True)
+                run_tool(cmd, logger=logger)
                 logger.info(f'potrace.exe converted {os.path.basename(in_path)} to {os.path.basename(out_path)} successfully.') if logger else None
                 return out_path
             except Exception as e:
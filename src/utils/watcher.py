@@ -0,0 +1,301 @@
+"""Watch-folder mode.
+
+Input directories are monitored with inotify on Linux and by periodic scans
+elsewhere. A file is handed to the pipeline only once its size and mtime have
+been stable for the settle time, so partially written files are not picked up.
+Outputs go to the same relative location under the output directory.
+"""
+
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, List, Tuple
+
+import src.utils.converter as cv
+import src.utils.raster as rst
+import src.utils.transformer as sc
+from src.utils.logger import Logger
+from src.utils.result_cache import ResultCache, cached_convert
+from src.utils.commons import bitmap_formats, vector_formats, heif_formats
+
+# Names of files that are still being written by common tools, never processed
+ignored_suffixes = (".tmp", ".part", ".crdownload", ".imbridge-tmp", "~")
+
+# Submitted file versions remembered to skip repeated events; the oldest are forgotten first
+submitted_limit = 4096
+
+
+class PollingMonitor:
+    """Report new or modified files by comparing directory scans."""
+
+    def __init__(self, roots: List[str], interval: float = 2.0):
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root in self.roots:
+            for dir_path, _, names in os.walk(root):
+                for name in names:
+                    path = os.path.join(dir_path, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def existing(self) -> List[str]:
+        return list(self._snapshot)
+
+    def poll(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [p for p, sig in snapshot.items() if self._snapshot.get(p) != sig]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyMonitor:
+    """Report new or modified files through Linux inotify, watching subdirectories too."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    event_header = struct.Struct("iIII")
+
+    def __init__(self, roots: List[str]):
+        self.roots = roots
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_tree(self, root: str) -> List[str]:
+        found = []
+        for dir_path, _, names in os.walk(root):
+            mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), mask)
+            if wd >= 0:
+                self._dirs[wd] = dir_path
+            found.extend(os.path.join(dir_path, name) for name in names)
+        return found
+
+    def existing(self) -> List[str]:
+        found = []
+        for root in self.roots:
+            for dir_path, _, names in os.walk(root):
+                found.extend(os.path.join(dir_path, name) for name in names)
+        return found
+
+    def poll(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        changed = []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        pos = 0
+        while pos + self.event_header.size <= len(data):
+            wd, mask, _, length = self.event_header.unpack_from(data, pos)
+            pos += self.event_header.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped; fall back to a full listing
+                changed.extend(self.existing())
+                continue
+            dir_path = self._dirs.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    changed.extend(self._add_tree(path))
+            else:
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_monitor(roots: List[str], polling: bool = False, interval: float = 2.0):
+    """inotify on Linux unless polling is requested or unavailable, otherwise directory scans."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyMonitor(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingMonitor(roots, interval=interval)
+
+
+def convert_pipeline(in_path: str, out_dir: str, logger: Optional[Logger] = None, cache: Optional[ResultCache] = None, **kwargs):
+    out_fmt = kwargs.pop("out_fmt", ".png")
+    if cache is not None:
+        return cached_convert(cache, in_path, out_dir, out_fmt, logger=logger, **kwargs)
+    return cv.convert_file(in_path, out_dir, out_fmt, logger=logger, **kwargs)
+
+
+def transform_pipeline(in_path: str, out_dir: str, logger: Optional[Logger] = None, **kwargs):
+    kwargs.pop("cache", None)
+    ext = os.path.splitext(in_path)[1].lower()
+    if ext in bitmap_formats:
+        return sc.transform_image(in_path, out_dir, save_image=True, logger=logger, **kwargs)
+    elif ext == ".svg":
+        return sc.transform_svg(in_path, out_dir, save_image=True, logger=logger, **kwargs)
+    elif ext == ".pdf":
+        return sc.transform_pdf(in_path, out_dir, save_image=True, logger=logger, **kwargs)
+    elif ext in (".eps", ".ps"):
+        return sc.transform_script(in_path, out_dir, save_image=True, logger=logger, **kwargs)
+    logger.info(f"Unsupported file format for transform: {ext}") if logger else None
+
+
+def ink_pipeline(in_path: str, out_dir: str, logger: Optional[Logger] = None, **kwargs):
+    ext = os.path.splitext(in_path)[1].lower()
+    if ext not in bitmap_formats:
+        logger.info(f"Unsupported file format for ink: {ext}") if logger else None
+        return None
+    return rst.grayscale_image(in_path, out_dir, binarize=kwargs.get("binarize", False), save_image=True, logger=logger)
+
+
+pipelines = {
+    "convert": convert_pipeline,
+    "transform": transform_pipeline,
+    "ink": ink_pipeline,
+}
+
+
+class FolderWatcher:
+    """
+    Feed new or changed files under in_dirs into a pipeline on a worker pool.
+    Files are mapped to the same relative path under out_dir.
+    """
+
+    def __init__(
+        self,
+        in_dirs: List[str],
+        out_dir: str,
+        pipeline: Callable = convert_pipeline,
+        logger: Optional[Logger] = None,
+        workers: int = 4,
+        settle: float = 2.0,
+        polling: bool = False,
+        process_existing: bool = True,
+        **params,
+    ):
+        self.in_dirs = [os.path.abspath(d) for d in in_dirs]
+        self.out_dir = os.path.abspath(out_dir)
+        self.pipeline = pipeline
+        self.logger = logger
+        self.settle = settle
+        self.params = params
+        self.process_existing = process_existing
+        self.monitor = create_monitor(self.in_dirs, polling=polling, interval=min(settle, 2.0))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImBridgeWatch")
+        self._stop = threading.Event()
+        # path -> (size, mtime_ns, time the signature was first seen)
+        self._pending = {}
+        # path -> (size, mtime_ns) of the version already submitted, least recent first
+        self._submitted: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _wanted(self, path: str) -> bool:
+        name = os.path.basename(path)
+        if name.startswith(".") or name.lower().endswith(ignored_suffixes):
+            return False
+        if os.path.commonpath([self.out_dir, os.path.abspath(path)]) == self.out_dir:
+            # Never feed our own outputs back in
+            return False
+        ext = os.path.splitext(name)[1].lower()
+        return ext in bitmap_formats or ext in vector_formats or ext in heif_formats
+
+    def _target_dir(self, path: str) -> str:
+        path = os.path.abspath(path)
+        for root in self.in_dirs:
+            if os.path.commonpath([root, path]) == root:
+                rel_dir = os.path.relpath(os.path.dirname(path), root)
+                return os.path.normpath(os.path.join(self.out_dir, os.path.basename(root), rel_dir))
+        return self.out_dir
+
+    def _mark(self, paths: List[str]):
+        now = time.monotonic()
+        for path in paths:
+            if self._wanted(path):
+                self._pending[path] = (None, None, now)
+
+    def _collect_settled(self) -> List[Tuple[str, Tuple[int, int]]]:
+        now = time.monotonic()
+        settled = []
+        for path, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                settled.append((path, (st.st_size, st.st_mtime_ns)))
+        return settled
+
+    def _submit(self, path: str, signature: Tuple[int, int]):
+        with self._lock:
+            if self._submitted.get(path) == signature:
+                self._submitted.move_to_end(path)
+                return
+            self._submitted[path] = signature
+            self._submitted.move_to_end(path)
+            while len(self._submitted) > submitted_limit:
+                self._submitted.popitem(last=False)
+        self.executor.submit(self._process, path)
+
+    def _process(self, path: str):
+        out_dir = self._target_dir(path)
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            out_path = self.pipeline(path, out_dir, logger=self.logger, **dict(self.params))
+            if out_path:
+                self.logger.info(f"[watch] {path} -> {out_path}") if self.logger else None
+        except Exception as e:
+            self.logger.error(f"[watch] {os.path.basename(path)} failed: {e}") if self.logger else None
+            with self._lock:
+                # Allow a retry once the file changes again
+                self._submitted.pop(path, None)
+
+    def run(self):
+        """Watch until stop() is called; blocking."""
+        self.logger.info(f"[watch] watching {', '.join(self.in_dirs)} -> {self.out_dir}") if self.logger else None
+        if self.process_existing:
+            self._mark(self.monitor.existing())
+        try:
+            while not self._stop.is_set():
+                timeout = 0.5 if self._pending else 1.0
+                self._mark(self.monitor.poll(timeout))
+                for path, signature in self._collect_settled():
+                    self._submit(path, signature)
+        finally:
+            self.monitor.close()
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,88 @@
+"""Pages written by pdf_writer, read back through PyMuPDF."""
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+Image = pytest.importorskip("PIL.Image")
+
+from src.utils.pdf_writer import write_images_pdf
+
+WIDTH, HEIGHT = 64, 48
+LEFT, RIGHT = (200, 30, 30), (20, 60, 220)
+
+
+def two_tone(mode="RGB", left=LEFT, right=RIGHT):
+    """WIDTH x HEIGHT image, left half one colour and right half another."""
+    img = Image.new(mode, (WIDTH, HEIGHT), left)
+    img.paste(right, (WIDTH // 2, 0, WIDTH, HEIGHT))
+    return img
+
+
+def save_tiff(img, path, compression):
+    # A single strip, which the writer passes through
+    img.save(path, compression=compression, tiffinfo={278: img.height})
+
+
+# name -> (file name, writer, method, expected left and right colour, tolerance)
+cases = {
+    "jpeg": ("rgb.jpg", lambda p: two_tone().save(p, quality=95), "dct", (LEFT, RIGHT), 24),
+    "cmyk_jpeg": (
+        "cmyk.jpg",
+        lambda p: two_tone("CMYK", (0, 0, 0, 0), (0, 0, 0, 255)).save(p, quality=95),
+        "dct", ((255, 255, 255), (0, 0, 0)), 48,
+    ),
+    "gray_png": ("gray.png", lambda p: two_tone("L", 50, 200).save(p), "png", ((50,) * 3, (200,) * 3), 2),
+    "rgb_png": ("rgb.png", lambda p: two_tone().save(p), "png", (LEFT, RIGHT), 2),
+    "palette_png": ("palette.png", lambda p: two_tone().convert("P", palette=Image.ADAPTIVE).save(p), "png", (LEFT, RIGHT), 2),
+    "bilevel_png": ("bilevel.png", lambda p: two_tone("1", 0, 1).save(p), "png", ((0,) * 3, (255,) * 3), 2),
+    "rgba_png": (
+        "rgba.png",
+        # The transparent half shows the white page through the soft mask
+        lambda p: two_tone("RGBA", LEFT + (255,), RIGHT + (0,)).save(p),
+        "flate", (LEFT, (255, 255, 255)), 2,
+    ),
+    "deflate_tiff": ("deflate.tiff", lambda p: save_tiff(two_tone(), p, "tiff_adobe_deflate"), "tiff", (LEFT, RIGHT), 2),
+    "lzw_tiff": ("lzw.tiff", lambda p: save_tiff(two_tone(), p, "tiff_lzw"), "tiff", (LEFT, RIGHT), 2),
+    "g4_tiff": (
+        "g4.tiff",
+        lambda p: save_tiff(two_tone("1", 0, 1), p, "group4"),
+        "tiff", ((0,) * 3, (255,) * 3), 2,
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(cases))
+def test_page_shows_image(tmp_path, name):
+    file_name, write, method, (left, right), tolerance = cases[name]
+    in_path = str(tmp_path / file_name)
+    out_path = str(tmp_path / "out.pdf")
+    write(in_path)
+
+    assert write_images_pdf([in_path], out_path, dpi=72) == [method]
+
+    with fitz.open(out_path) as doc:
+        assert doc.page_count == 1
+        page = doc[0]
+        assert tuple(page.mediabox) == pytest.approx((0, 0, WIDTH, HEIGHT))
+        pix = page.get_pixmap(dpi=72, colorspace=fitz.csRGB, alpha=False)
+        assert (pix.width, pix.height) == (WIDTH, HEIGHT)
+        for x, expected in ((WIDTH // 4, left), (3 * WIDTH // 4, right)):
+            sampled = pix.pixel(x, HEIGHT // 2)
+            assert all(abs(a - b) <= tolerance for a, b in zip(sampled, expected)), (sampled, expected)
+
+
+def test_pages_follow_input_order(tmp_path):
+    paths = []
+    for i, size in enumerate([(WIDTH, HEIGHT), (HEIGHT, WIDTH)]):
+        path = str(tmp_path / f"page{i}.png")
+        Image.new("RGB", size, LEFT).save(path)
+        paths.append(path)
+    out_path = str(tmp_path / "out.pdf")
+
+    # The first file again is drawn from the image object already written
+    assert write_images_pdf(paths + paths[:1], out_path, dpi=144) == ["png"] * 3
+
+    with fitz.open(out_path) as doc:
+        assert doc.page_count == 3
+        sizes = [(page.rect.width, page.rect.height) for page in doc]
+    assert sizes == pytest.approx([(WIDTH / 2, HEIGHT / 2), (HEIGHT / 2, WIDTH / 2), (WIDTH / 2, HEIGHT / 2)])